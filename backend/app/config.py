@@ -13,12 +13,100 @@ class Settings(BaseSettings):
     PG_USER: str = os.getenv("PG_USER")
     PG_PASSWORD: str = os.getenv("PG_PASSWORD")
     PG_DB: str = os.getenv("PG_DB")
+    PG_POOL_MIN_SIZE: int = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+    PG_POOL_MAX_SIZE: int = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+    PG_POOL_ACQUIRE_TIMEOUT: float = float(os.getenv("PG_POOL_ACQUIRE_TIMEOUT", "5"))
+    PG_POOL_HEALTH_CHECK_AFTER: float = float(os.getenv("PG_POOL_HEALTH_CHECK_AFTER", "30"))
+
+    VECTOR_STORAGE_MODE: str = os.getenv("VECTOR_STORAGE_MODE", "float32")
+    VECTOR_RESCORE_FACTOR: int = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "100"))
+    HNSW_ITERATIVE_SCAN: str = os.getenv("HNSW_ITERATIVE_SCAN", "")
+    HNSW_MAX_SCAN_TUPLES: int = int(os.getenv("HNSW_MAX_SCAN_TUPLES", "0"))
+    SEARCH_BATCH_MAX_QUERIES: int = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "64"))
+    HOT_INDEX_MEMORY_MB: float = float(os.getenv("HOT_INDEX_MEMORY_MB", "0"))
+    HOT_INDEX_MAX_ROWS: int = int(os.getenv("HOT_INDEX_MAX_ROWS", "20000"))
+    HOT_INDEX_TTL: float = float(os.getenv("HOT_INDEX_TTL", "300"))
 
     MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT")
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY")
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY")
+    UPLOAD_PART_SIZE: int = int(os.getenv("UPLOAD_PART_SIZE", str(8 * 1024 * 1024)))
+    UPLOAD_BATCH_MAX_FILES: int = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "50"))
 
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+    OLLAMA_HOST: str = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    OLLAMA_MODEL: str = os.getenv("OLLAMA_MODEL", "phi4-mini")
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "80"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_ALLOW_STUB: bool = os.getenv("LLM_ALLOW_STUB", "false").lower() in ("1", "true", "yes")
+    LLM_STUB_FIRST_TOKEN_MS: float = float(os.getenv("LLM_STUB_FIRST_TOKEN_MS", "0"))
+    LLM_STUB_TOKEN_MS: float = float(os.getenv("LLM_STUB_TOKEN_MS", "0"))
+
+    INGEST_WORKER_BACKEND: str = os.getenv("INGEST_WORKER_BACKEND", "thread")
+    INGEST_MAX_WORKERS: int = int(os.getenv("INGEST_MAX_WORKERS", "2"))
+    INGEST_MAX_RETRIES: int = int(os.getenv("INGEST_MAX_RETRIES", "2"))
+    INGEST_RETRY_BACKOFF: float = float(os.getenv("INGEST_RETRY_BACKOFF", "2"))
+    INGEST_JOB_TTL: float = float(os.getenv("INGEST_JOB_TTL", "3600"))
+    INGEST_MAX_JOBS: int = int(os.getenv("INGEST_MAX_JOBS", "1000"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "32"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+    INGEST_PARSE_WORKERS: int = int(os.getenv("INGEST_PARSE_WORKERS", "0"))
+
+    QUERY_CACHE_SIZE: int = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+    QUERY_CACHE_TTL: float = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    QUERY_CACHE_DISK_PATH: str = os.getenv("QUERY_CACHE_DISK_PATH", "")
+
+    RAG_CONTEXT_TOKENS: int = int(os.getenv("RAG_CONTEXT_TOKENS", "3000"))
+    RAG_CACHE_SIZE: int = int(os.getenv("RAG_CACHE_SIZE", "512"))
+    RAG_CACHE_TTL: float = float(os.getenv("RAG_CACHE_TTL", "3600"))
+    RAG_CACHE_SIMILARITY: float = float(os.getenv("RAG_CACHE_SIMILARITY", "0.95"))
+
+    EXECUTOR_DB_WORKERS: int = int(os.getenv("EXECUTOR_DB_WORKERS", "0"))
+    EXECUTOR_INFERENCE_WORKERS: int = int(os.getenv("EXECUTOR_INFERENCE_WORKERS", "2"))
+    EXECUTOR_PDF_WORKERS: int = int(os.getenv("EXECUTOR_PDF_WORKERS", "2"))
+    EXECUTOR_STORAGE_WORKERS: int = int(os.getenv("EXECUTOR_STORAGE_WORKERS", "8"))
+    EXECUTOR_RANKING_WORKERS: int = int(os.getenv("EXECUTOR_RANKING_WORKERS", "16"))
+
+    PROFILE_SLOW_REQUEST_MS: float = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+    PROFILE_OUTPUT_DIR: str = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+
+    MODEL_WARMUP: bool = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+
+    INFERENCE_MODE: str = os.getenv("INFERENCE_MODE", "local")
+    INFERENCE_SOCKET: str = os.getenv("INFERENCE_SOCKET", "/tmp/sapirag-inference.sock")
+    INFERENCE_CLIENT_MAX_INFLIGHT: int = int(os.getenv("INFERENCE_CLIENT_MAX_INFLIGHT", "8"))
+    INFERENCE_CLIENT_TIMEOUT: float = float(os.getenv("INFERENCE_CLIENT_TIMEOUT", "60"))
+    INFERENCE_QUEUE_TIMEOUT: float = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "2"))
+    INFERENCE_SERVER_MAX_PENDING: int = int(os.getenv("INFERENCE_SERVER_MAX_PENDING", "4096"))
+    INFERENCE_SIDECAR_WAIT: float = float(os.getenv("INFERENCE_SIDECAR_WAIT", "120"))
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+    ONNX_MODEL_DIR: str = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+    ONNX_VARIANT: str = os.getenv("ONNX_VARIANT", "int8")
+    ONNX_QUANTIZATION: str = os.getenv("ONNX_QUANTIZATION", "")
+    ONNX_INTRA_OP_THREADS: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+    ONNX_EXPORT_IF_MISSING: bool = os.getenv("ONNX_EXPORT_IF_MISSING", "false").lower() in ("1", "true", "yes")
+    ONNX_VERIFY: bool = os.getenv("ONNX_VERIFY", "true").lower() in ("1", "true", "yes")
+    ONNX_MIN_COSINE: float = float(os.getenv("ONNX_MIN_COSINE", "0.98"))
+    ONNX_MIN_RANK_CORRELATION: float = float(os.getenv("ONNX_MIN_RANK_CORRELATION", "0.9"))
+
+    RERANK_BATCHING: bool = os.getenv("RERANK_BATCHING", "true").lower() in ("1", "true", "yes")
+    RERANK_MAX_BATCH_SIZE: int = int(os.getenv("RERANK_MAX_BATCH_SIZE", "64"))
+    RERANK_MAX_WAIT_MS: float = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))
+    RERANK_DEPTH: int = int(os.getenv("RERANK_DEPTH", "0"))
+    CASCADE_FAST_RERANKER: str = os.getenv("CASCADE_FAST_RERANKER", "")
+    CASCADE_FAST_FACTOR: int = int(os.getenv("CASCADE_FAST_FACTOR", "3"))
+    CASCADE_EARLY_EXIT_MARGIN: float = float(os.getenv("CASCADE_EARLY_EXIT_MARGIN", "0"))
+    CASCADE_PAIR_MS: float = float(os.getenv("CASCADE_PAIR_MS", "15"))
+    CASCADE_FAST_PAIR_MS: float = float(os.getenv("CASCADE_FAST_PAIR_MS", "4"))
+    ENCODE_BATCHING: bool = os.getenv("ENCODE_BATCHING", "false").lower() in ("1", "true", "yes")
+    ENCODE_MAX_BATCH_SIZE: int = int(os.getenv("ENCODE_MAX_BATCH_SIZE", "32"))
+    ENCODE_MAX_WAIT_MS: float = float(os.getenv("ENCODE_MAX_WAIT_MS", "3"))
 
     CORS_ORIGINS: List[str] = ["http://localhost:5173"]
 
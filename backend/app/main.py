@@ -1,7 +1,20 @@
-from fastapi import FastAPI
+import logging
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from routers import embedding_and_search,workspace,rag
+from routers import embedding_and_search,workspace,rag,health
+from services.model_registry import start_warm_up
+from services.ingestion_jobs import job_queue
+from services.executors import shutdown_executors
+from services.inference_client import InferenceBusy, InferenceError
+from services.llm_service import close_http_client
+from services.metrics import render_metrics, request_seconds, server_timing_header, start_request
+from services.profiling import slow_request_profiler
+from utils.db_pool import PoolTimeout, pool
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="SapiRagAPI")
 
@@ -13,6 +26,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    # Stage timings recorded while handling the request end up in the
+    # Server-Timing header; for streamed responses that covers the work done
+    # before the first byte.
+    timings = start_request()
+    profiler = slow_request_profiler.start()
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    request_seconds.observe(elapsed, request.method, route, str(response.status_code))
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    slow_request_profiler.finish(profiler, f"{request.method} {route}", elapsed)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 app.include_router(rag.router, prefix="/rag", tags=["rag"])
 app.include_router(embedding_and_search.router, prefix="/search", tags=["search"])
-app.include_router(workspace.router, prefix="/workspace", tags=["workspace"])
\ No newline at end of file
+app.include_router(workspace.router, prefix="/workspace", tags=["workspace"])
+app.include_router(health.router, prefix="/health", tags=["health"])
+
+@app.on_event("startup")
+def warm_up_models():
+    if settings.MODEL_WARMUP:
+        start_warm_up()
+
+@app.on_event("startup")
+def open_db_pool():
+    try:
+        pool.open()
+    except Exception:
+        logger.exception("Could not pre-open database connections")
+
+@app.on_event("shutdown")
+def close_db_pool():
+    job_queue.shutdown(wait=False)
+    shutdown_executors()
+    pool.close()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await close_http_client()
+
+@app.exception_handler(PoolTimeout)
+def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.exception_handler(InferenceBusy)
+def inference_busy_handler(request: Request, exc: InferenceBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(InferenceError)
+def inference_error_handler(request: Request, exc: InferenceError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
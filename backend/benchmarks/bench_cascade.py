@@ -0,0 +1,156 @@
+import argparse
+import json
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.bench_suite import environment, summarize
+from benchmarks.standins import QUERIES, OverlapCrossEncoder, install_stub_models, multilingual_text
+
+# Quality versus latency of the cascade reranker at each rerank depth and
+# latency budget. Runs offline on in-memory candidates built the way
+# hybrid_candidates builds them (vector top-n plus keyword top-n). Quality is
+# measured against reranking every candidate with the full cross-encoder.
+# With stub models, --stub-pair-ms makes the stub cross-encoder cost that much
+# per pair so the budgets behave as they would with the real model.
+#   python -m benchmarks.bench_cascade --depths 0,3,5,10,all --budgets 25,50,100
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class SlowCrossEncoder(OverlapCrossEncoder):
+    def __init__(self, pair_ms: float):
+        self.pair_seconds = pair_ms / 1000
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], **kwargs) -> np.ndarray:
+        time.sleep(self.pair_seconds * len(pairs))
+        return super().predict(pairs, **kwargs)
+
+
+def build_candidates(passages: List[str], embeddings: np.ndarray, query: str, q_emb: np.ndarray, limit: int):
+    vector = np.argsort(-(embeddings @ q_emb))[:limit]
+    terms = set(_TOKEN.findall(query.lower()))
+    overlap = np.array([len(terms & set(_TOKEN.findall(p.lower()))) for p in passages], dtype=np.float32)
+    keyword = [i for i in np.argsort(-overlap, kind="stable")[:limit] if overlap[i] > 0]
+    rows = [
+        (int(i), f"chunk-{i}", passages[i], "bench.pdf", "vector", float(embeddings[i] @ q_emb), rank + 1)
+        for rank, i in enumerate(vector)
+    ]
+    rows += [
+        (int(i), f"chunk-{i}", passages[i], "bench.pdf", "keyword", float(overlap[i]), rank + 1)
+        for rank, i in enumerate(keyword)
+    ]
+    return rows
+
+
+def ndcg(order: List[int], relevance: Dict[int, float], k: int) -> float:
+    ideal = sorted(relevance.values(), reverse=True)[:k]
+    idcg = sum(rel / math.log2(i + 2) for i, rel in enumerate(ideal))
+    dcg = sum(relevance.get(doc_id, 0.0) / math.log2(i + 2) for i, doc_id in enumerate(order[:k]))
+    return dcg / idcg if idcg > 0 else 1.0
+
+
+def run_setting(
+    cases: List[Dict[str, Any]],
+    depth: Optional[int],
+    budget: Optional[float],
+    top_k: int,
+    repeat: int,
+) -> Dict[str, Any]:
+    from services.cascade_rerank import cascade_rerank
+
+    latencies, overlaps, top1, ndcgs, exits, depths = [], [], [], [], {}, []
+    for _ in range(repeat):
+        for case in cases:
+            started = time.perf_counter()
+            if depth == 0:
+                ranked, info = case["fused"], {"depth": 0, "exit": "fused_only"}
+            else:
+                ranked, info = cascade_rerank(
+                    case["query"], case["fused"], case["passages"], depth=depth,
+                    latency_budget_ms=budget, started=started, agreement=case["agreement"],
+                )
+            latencies.append((time.perf_counter() - started) * 1000)
+            order = [doc_id for doc_id, _ in ranked[:top_k]]
+            reference = case["reference"][:top_k]
+            overlaps.append(len(set(order) & set(reference)) / max(len(reference), 1))
+            top1.append(int(bool(order) and order[0] == reference[0]))
+            ndcgs.append(ndcg(order, case["relevance"], top_k))
+            exits[str(info["exit"])] = exits.get(str(info["exit"]), 0) + 1
+            depths.append(info["depth"])
+    return {
+        "latency": summarize(latencies),
+        f"overlap_at_{top_k}": round(float(np.mean(overlaps)), 4),
+        "top1_agreement": round(float(np.mean(top1)), 4),
+        f"ndcg_at_{top_k}": round(float(np.mean(ndcgs)), 4),
+        "mean_reranked": round(float(np.mean(depths)), 2),
+        "exits": exits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade reranking: quality vs latency")
+    parser.add_argument("--passages", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=120)
+    parser.add_argument("--candidates", type=int, default=15, help="per retriever, like hybrid top_k")
+    parser.add_argument("--top-k", type=int, default=4, help="rows compared (RAG uses 4)")
+    parser.add_argument("--depths", default="0,3,5,10,all", help="0 = fused order only")
+    parser.add_argument("--budgets", default="25,50,100,200", help="latency_budget_ms values (depth=all)")
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--real-models", action="store_true")
+    parser.add_argument("--stub-pair-ms", type=float, default=8.0)
+    parser.add_argument("--output", default="bench_cascade.json")
+    args = parser.parse_args()
+
+    from services import model_registry
+    from services.cascade_rerank import cascade_costs, cascade_rerank
+    from services.search_service import _collect, _fused_scores
+    from utils.helpers import encode_texts
+
+    if not args.real_models:
+        install_stub_models()
+        model_registry._models[model_registry.CROSS_ENCODER_NAME] = SlowCrossEncoder(args.stub_pair_ms)
+
+    passages = [multilingual_text(args.words, seed=i) for i in range(args.passages)]
+    embeddings = np.asarray(model_registry.get_bi_encoder().encode(passages, normalize_embeddings=True))
+    cases = []
+    for query, q_emb in zip(QUERIES, encode_texts(QUERIES)):
+        docs, by_source = _collect(build_candidates(passages, embeddings, query, np.asarray(q_emb), args.candidates))
+        fused = sorted(_fused_scores(docs, by_source, "weighted", 0.5).items(), key=lambda x: x[1], reverse=True)
+        texts = {doc_id: f"{header}\n{body}" for doc_id, (header, body, _) in docs.items()}
+        # Reference: the cascade with every candidate reranked, i.e. the
+        # behaviour without a depth or budget (same tie-breaking).
+        reference, _ = cascade_rerank(query, fused, texts, early_exit_margin=0)
+        cases.append({
+            "query": query,
+            "fused": fused,
+            "passages": texts,
+            "agreement": by_source["vector"].keys() & by_source["keyword"].keys(),
+            "reference": [doc_id for doc_id, _ in reference],
+            "relevance": dict(reference),
+        })
+
+    results: Dict[str, Any] = {
+        "environment": environment(args.real_models),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "candidates_per_query": round(float(np.mean([len(c["fused"]) for c in cases])), 1),
+        "depth": {},
+        "latency_budget_ms": {},
+    }
+    for value in args.depths.split(","):
+        depth = None if value == "all" else int(value)
+        results["depth"][value] = run_setting(cases, depth, None, args.top_k, args.repeat)
+    for value in filter(None, args.budgets.split(",")):
+        results["latency_budget_ms"][value] = run_setting(cases, None, float(value), args.top_k, args.repeat)
+    results["pair_cost_ms"] = cascade_costs()
+
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+
+from services.chunking_service import (
+    MAX_TOKENS,
+    OVERLAP_TOKENS,
+    count_tokens,
+    split_into_chunks,
+)
+
+WORDS = [
+    "egyetem", "hallgató", "tantárgy", "félév", "vizsga", "szabályzat", "kredit",
+    "kötelező", "választható", "oktató", "záróvizsga", "szakdolgozat", "ösztöndíj",
+    "university", "student", "course", "semester", "examen", "studiu", "facultate",
+    "a", "az", "és", "hogy", "nem", "is", "egy", "kell", "lehet", "valamint",
+]
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    lines, line = [], []
+    for _ in range(n_words):
+        line.append(rng.choice(WORDS))
+        if len(line) >= rng.randint(8, 16):
+            lines.append(" ".join(line))
+            line = []
+    lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def legacy_split_into_chunks(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS) -> list[str]:
+    words = text.split()
+    chunks: list[str] = []
+    buffer: list[str] = []
+
+    for word in words:
+        buffer.append(word)
+        if count_tokens(" ".join(buffer)) > max_tokens:
+            chunks.append(" ".join(buffer[:-1]))
+            buffer = buffer[-overlap:]
+
+    if buffer:
+        chunks.append(" ".join(buffer))
+
+    return chunks
+
+
+def _timed(fn, text: str, repeat: int) -> tuple[float, list[str]]:
+    best = float("inf")
+    chunks: list[str] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="split_into_chunks micro-benchmark")
+    parser.add_argument("--words", type=int, default=150_000, help="~300 PDF pages")
+    parser.add_argument("--legacy-words", type=int, default=20_000,
+                        help="the legacy chunker is quadratic, keep its input smaller")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for label, fn, n_words in (
+        ("legacy", legacy_split_into_chunks, args.legacy_words),
+        ("token-window", split_into_chunks, args.legacy_words),
+        ("token-window", split_into_chunks, args.words),
+    ):
+        text = synthetic_text(n_words)
+        seconds, chunks = _timed(fn, text, args.repeat)
+        largest = max(count_tokens(c) for c in chunks)
+        print(
+            f"{label:>12} words={n_words:>8} chunks={len(chunks):>5} "
+            f"max_chunk_tokens={largest:>4} time={seconds * 1000:9.1f} ms "
+            f"words/s={n_words / seconds:,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
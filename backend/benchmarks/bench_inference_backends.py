@@ -0,0 +1,95 @@
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from app.config import settings
+from benchmarks.bench_suite import environment, summarize, timed_ms
+from benchmarks.standins import QUERIES, multilingual_text
+
+# Compares the PyTorch models with the ONNX fp32 and int8 exports on CPU:
+# encode throughput per batch size, single-query encode latency, rerank
+# throughput and the accuracy check against PyTorch. Needs the exported
+# models (python -m scripts.export_onnx) in --model-dir.
+#   python -m benchmarks.bench_inference_backends --output bench_inference.json
+
+BATCH_SIZES = (1, 8, 32, 64)
+
+
+def load_backends(model_dir: str, names: List[str]) -> Dict[str, Any]:
+    from services.model_registry import _torch_bi_encoder, _torch_cross_encoder
+    from services.onnx_backend import load_bi_encoder, load_cross_encoder
+
+    backends = {}
+    for name in names:
+        started = time.perf_counter()
+        if name == "torch":
+            models = (_torch_bi_encoder(), _torch_cross_encoder())
+        else:
+            settings.ONNX_VARIANT = name.split("-", 1)[1]
+            models = (load_bi_encoder(model_dir), load_cross_encoder(model_dir))
+        backends[name] = {"models": models, "load_seconds": round(time.perf_counter() - started, 2)}
+    return backends
+
+
+def throughput(fn: Callable[[], Any], items: int, repeat: int) -> float:
+    fn()
+    best = min(timed_ms(fn) for _ in range(repeat)) / 1000
+    return round(items / best, 1)
+
+
+def bench_backend(bi_encoder: Any, cross_encoder: Any, passages: List[str], repeat: int) -> Dict[str, Any]:
+    encode = {
+        f"batch_{size}": throughput(
+            lambda: bi_encoder.encode(passages, batch_size=size, normalize_embeddings=True), len(passages), repeat
+        )
+        for size in BATCH_SIZES
+    }
+    for query in QUERIES:
+        bi_encoder.encode([query], normalize_embeddings=True)
+    latency = [
+        timed_ms(lambda: bi_encoder.encode([query], normalize_embeddings=True))
+        for _ in range(repeat) for query in QUERIES
+    ]
+    pairs = [(QUERIES[i % len(QUERIES)], passage) for i, passage in enumerate(passages)]
+    return {
+        "encode_texts_per_sec": encode,
+        "query_encode_latency": summarize(latency),
+        "rerank_pairs_per_sec": throughput(lambda: cross_encoder.predict(pairs), len(pairs), repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch vs ONNX inference benchmark")
+    parser.add_argument("--model-dir", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--backends", default="torch,onnx-fp32,onnx-int8")
+    parser.add_argument("--passages", type=int, default=256)
+    parser.add_argument("--words", type=int, default=120, help="words per passage (~chunk size)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_inference.json")
+    args = parser.parse_args()
+
+    from services.onnx_backend import verify_backend
+
+    passages = [multilingual_text(args.words, seed=i) for i in range(args.passages)]
+    backends = load_backends(args.model_dir, args.backends.split(","))
+    reference = backends.get("torch")
+
+    results: Dict[str, Any] = {
+        "environment": {**environment(True), "onnx_intra_op_threads": settings.ONNX_INTRA_OP_THREADS},
+        "config": {"passages": args.passages, "words": args.words, "repeat": args.repeat},
+    }
+    for name, backend in backends.items():
+        bi_encoder, cross_encoder = backend["models"]
+        results[name] = {"load_seconds": backend["load_seconds"]}
+        results[name].update(bench_backend(bi_encoder, cross_encoder, passages, args.repeat))
+        if reference is not None and name != "torch":
+            results[name]["accuracy"] = verify_backend(bi_encoder, cross_encoder, *reference["models"])
+
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
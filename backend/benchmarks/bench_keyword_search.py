@@ -0,0 +1,182 @@
+import argparse
+import json
+import statistics
+
+from utils.helpers import build_ts_query, extract_terms, get_conn
+
+# Runs against a scratch table so the real ``documents`` table is untouched:
+#   python -m benchmarks.bench_keyword_search --rows 1000000
+#
+# Two baselines for the old query, which recomputed
+# to_tsvector(unaccent(...)) per row:
+# - baseline_seq_scan: the old query as deployed. The expression index in the
+#   original init.sql could never be created, because unaccent() is only
+#   STABLE and Postgres rejects it in an index expression.
+# - baseline_expression_index: the same query over the GIN expression index
+#   it was meant to use, built on a scratch IMMUTABLE wrapper (bench_unaccent)
+#   that only this benchmark creates.
+
+TABLE = "bench_documents"
+
+WORDS = [
+    "egyetem", "hallgató", "tantárgy", "félév", "vizsga", "szabályzat", "kredit",
+    "kötelező", "választható", "oktató", "záróvizsga", "szakdolgozat", "ösztöndíj",
+    "kollégium", "tandíj", "határidő", "beiratkozás", "órarend", "labor", "gyakorlat",
+    "előadás", "jegyzet", "minősítés", "kurzus", "diploma", "nyelvvizsga", "mesterképzés",
+    "university", "student", "course", "semester", "examen", "studiu", "facultate",
+]
+
+QUERIES = [
+    "vizsga határidő",
+    "szakdolgozat leadás",
+    "kredit tantárgy félév",
+    "ösztöndíj kollégium",
+    "nyelvvizsga diploma mesterképzés",
+]
+
+
+def baseline_sql(unaccent: str) -> str:
+    document = f"to_tsvector('hungarian', {unaccent}(header || ' ' || body))"
+    return (
+        f"SELECT header, body, filename, ts_rank_cd({document}, to_tsquery('hungarian', %s)) AS rank"
+        f" FROM {TABLE}"
+        f" WHERE workspace = %s AND {document} @@ to_tsquery('hungarian', %s)"
+        " ORDER BY rank DESC LIMIT 10"
+    )
+
+
+BASELINES = {
+    "baseline_seq_scan": baseline_sql("unaccent"),
+    "baseline_expression_index": baseline_sql("bench_unaccent"),
+}
+
+STORED_TSQUERY = {
+    "prefix": "to_tsquery('hungarian', immutable_unaccent(%s))",
+    "plain": "plainto_tsquery('hungarian', immutable_unaccent(%s))",
+    "websearch": "websearch_to_tsquery('hungarian', immutable_unaccent(%s))",
+    "or": "to_tsquery('hungarian', immutable_unaccent(%s))",
+}
+
+
+def stored_sql(mode: str) -> str:
+    tsq = STORED_TSQUERY[mode]
+    return (
+        f"SELECT header, body, filename, ts_rank_cd(tsv, {tsq}) AS rank"
+        f" FROM {TABLE}"
+        f" WHERE workspace = %s AND tsv @@ {tsq}"
+        " ORDER BY rank DESC LIMIT 10"
+    )
+
+
+def stored_param(query: str, mode: str) -> str:
+    if mode in ("plain", "websearch"):
+        return query
+    return build_ts_query(extract_terms(query), "or" if mode == "or" else "prefix")
+
+
+def build_corpus(conn, rows: int, words_per_chunk: int, workspaces: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(
+            f"CREATE TABLE {TABLE} ("
+            " id SERIAL PRIMARY KEY, filename TEXT NOT NULL, workspace TEXT,"
+            " header TEXT, body TEXT)"
+        )
+        cur.execute(
+            f"INSERT INTO {TABLE} (filename, workspace, header, body)"
+            " SELECT 'doc-' || (g %% 5000) || '.pdf', 'ws-' || (g %% %s), 'chunk-' || g,"
+            "  (SELECT string_agg(w[1 + floor(random() * array_length(w, 1))::int], ' ')"
+            "   FROM generate_series(1, %s + g * 0))"
+            " FROM generate_series(1, %s) AS g, (SELECT %s::text[] AS w) AS words",
+            (workspaces, words_per_chunk, rows, WORDS),
+        )
+        cur.execute(
+            "CREATE OR REPLACE FUNCTION bench_unaccent(text) RETURNS text"
+            " LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+            " AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+        )
+        cur.execute(
+            f"CREATE INDEX {TABLE}_fts ON {TABLE} USING gin ("
+            " to_tsvector('hungarian', bench_unaccent(header || ' ' || body)))"
+        )
+        cur.execute(
+            f"ALTER TABLE {TABLE} ADD COLUMN tsv tsvector GENERATED ALWAYS AS ("
+            " to_tsvector('hungarian', immutable_unaccent(coalesce(header, '') || ' ' || coalesce(body, '')))"
+            ") STORED"
+        )
+        cur.execute(f"CREATE INDEX {TABLE}_tsv ON {TABLE} USING gin (tsv)")
+        cur.execute(f"ANALYZE {TABLE}")
+    conn.commit()
+
+
+def explain(conn, sql: str, params: tuple) -> dict:
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+        plan = cur.fetchone()[0][0]
+    conn.rollback()
+    root = plan["Plan"]
+    return {
+        "execution_ms": plan["Execution Time"],
+        "planning_ms": plan["Planning Time"],
+        "shared_hit_blocks": root.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": root.get("Shared Read Blocks", 0),
+    }
+
+
+def summarize(samples: list) -> dict:
+    times = sorted(s["execution_ms"] for s in samples)
+    return {
+        "p50_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "mean_shared_blocks": round(
+            statistics.mean(s["shared_hit_blocks"] + s["shared_read_blocks"] for s in samples), 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword search EXPLAIN benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--words-per-chunk", type=int, default=80)
+    parser.add_argument("--workspaces", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="keep an existing bench table")
+    parser.add_argument("--skip-seq-scan", action="store_true", help="skip the (slow) unindexed old query")
+    parser.add_argument("--output", default="keyword_search_bench.json")
+    args = parser.parse_args()
+
+    conn = get_conn()
+    try:
+        if not args.reuse:
+            build_corpus(conn, args.rows, args.words_per_chunk, args.workspaces)
+
+        results = {"rows": args.rows, "modes": {}}
+        for name, sql in BASELINES.items():
+            if name == "baseline_seq_scan" and args.skip_seq_scan:
+                continue
+            samples = []
+            for _ in range(args.repeat):
+                for query in QUERIES:
+                    ts_query = build_ts_query(extract_terms(query))
+                    samples.append(explain(conn, sql, (ts_query, "ws-1", ts_query)))
+            results["modes"][name] = summarize(samples)
+
+        for mode in STORED_TSQUERY:
+            samples = []
+            for _ in range(args.repeat):
+                for query in QUERIES:
+                    param = stored_param(query, mode)
+                    samples.append(explain(conn, stored_sql(mode), (param, "ws-1", param)))
+            results["modes"][f"stored_{mode}"] = summarize(samples)
+    finally:
+        conn.close()
+
+    for name, summary in results["modes"].items():
+        print(f"{name:>28}  p50={summary['p50_ms']:9.3f} ms  p95={summary['p95_ms']:9.3f} ms"
+              f"  blocks={summary['mean_shared_blocks']}")
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
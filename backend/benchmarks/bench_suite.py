@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.standins import (
+    QUERIES,
+    InMemoryObjectStore,
+    install_object_store,
+    install_stub_models,
+    make_pdf,
+)
+
+# End-to-end benchmark suite. Runs offline: PDFs are generated, MinIO is
+# replaced by an in-memory store, the models by hashing stand-ins (unless
+# --real-models) and the LLM by the stub provider. The database sections need
+# a local PostgreSQL with init.sql applied (PG_* settings); use a scratch
+# database, the suite writes into ``documents`` under its own workspace and
+# removes those rows afterwards. Without a database they are reported as skipped.
+#   python -m benchmarks.bench_suite --files 8 --pages 20 --output bench_results.json
+
+SEARCH_MODES = ("keyword", "embedding", "hybrid")
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.mean(ordered), 3),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def timed_ms(fn: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def environment(real_models: bool) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "models": "real" if real_models else "stub",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def bench_chunking(texts: List[str], repeat: int) -> Dict[str, Any]:
+    from services.chunking_service import count_tokens, split_into_chunks
+
+    tokens = sum(count_tokens(text) for text in texts)
+    samples, chunks = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = sum(len(split_into_chunks(text)) for text in texts)
+        samples.append((time.perf_counter() - started) * 1000)
+    best = min(samples) / 1000
+    return {
+        "documents": len(texts),
+        "tokens": tokens,
+        "chunks": chunks,
+        "tokens_per_sec": round(tokens / best, 1),
+        "latency_per_corpus": summarize(samples),
+    }
+
+
+def bench_pdf_pipeline(pdfs: Dict[str, bytes], repeat: int) -> Dict[str, Any]:
+    from services.embedding_service import generate_embeddings_from_pdf
+
+    samples, chunks = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name, data in pdfs.items():
+            path = os.path.join(tmp, name)
+            with open(path, "wb") as out:
+                out.write(data)
+            paths.append(path)
+        for _ in range(repeat):
+            for path in paths:
+                started = time.perf_counter()
+                chunks += len(generate_embeddings_from_pdf(path))
+                samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "files": len(pdfs),
+        "chunks_per_sec": round(chunks / (sum(samples) / 1000), 1),
+        "latency_per_file": summarize(samples),
+    }
+
+
+def bench_insert(workspace: str, pdfs: Dict[str, bytes]) -> Dict[str, Any]:
+    from services.document_store import insert_documents, sync_file
+    from services.ingestion_pipeline import PdfIngestPipeline
+    from utils.db_pool import db_connection
+    from utils.helpers import fingerprint
+
+    rows, seconds, per_file = 0, 0.0, []
+    with db_connection() as conn:
+        for name, data in pdfs.items():
+            pipeline = PdfIngestPipeline(data)
+            records = list(pipeline.iter_records())
+            stats = insert_documents(
+                conn, name, workspace, records,
+                finalize=lambda cur: sync_file(cur, workspace, name, fingerprint(data), pipeline.chunk_headers),
+            )
+            rows += stats["rows"]
+            seconds += stats["seconds"]
+            per_file.append(stats["seconds"] * 1000)
+        with conn.cursor() as cur:
+            cur.execute("ANALYZE documents")
+        conn.commit()
+    return {
+        "rows": rows,
+        "rows_per_sec": round(rows / seconds, 1) if seconds else None,
+        "latency_per_file": summarize(per_file),
+    }
+
+
+def bench_search(workspace: str, filename: str, repeat: int) -> Dict[str, Any]:
+    from services import search_service
+    from utils.db_pool import db_connection
+
+    calls = {
+        ("keyword", "file"): lambda conn, q: search_service.keyword_search(conn, q, workspace, filename),
+        ("keyword", "workspace"): lambda conn, q: search_service.keyword_search_workspace(conn, q, workspace),
+        ("embedding", "file"): lambda conn, q: search_service.embedding_search(conn, q, workspace, filename),
+        ("embedding", "workspace"): lambda conn, q: search_service.embedding_search_workspace(conn, q, workspace),
+        ("hybrid", "file"): lambda conn, q: search_service.hybrid_search(conn, q, workspace, filename),
+        ("hybrid", "workspace"): lambda conn, q: search_service.hybrid_search_workspace(conn, q, workspace),
+    }
+    results = {}
+    with db_connection() as conn:
+        for (mode, scope), call in calls.items():
+            for query in QUERIES:
+                call(conn, query)
+            samples = [timed_ms(lambda: call(conn, query)) for _ in range(repeat) for query in QUERIES]
+            results[f"{mode}_{scope}"] = summarize(samples)
+    return results
+
+
+def bench_rag(workspace: str, repeat: int, first_token_ms: float, token_ms: float) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from services.answer_cache import answer_cache
+    from app.config import settings
+    from services.llm_service import StubProvider, register_provider
+
+    settings.LLM_ALLOW_STUB = True
+    register_provider(StubProvider(
+        "A záróvizsga jelentkezési határideje a félév tizedik hete.",
+        first_token_ms=first_token_ms, token_ms=token_ms,
+    ))
+    answer_cache.max_entries = 0  # measure the full path, not cache hits
+    client = TestClient(app)
+    results = {}
+    for mode in SEARCH_MODES:
+        total, first_token = [], []
+        for _ in range(repeat):
+            for query in QUERIES:
+                body = {"question": query, "workspace": workspace, "mode": mode, "provider": "stub"}
+                total.append(timed_ms(lambda: client.post("/rag/rag", json=body).raise_for_status()))
+
+                started = time.perf_counter()
+                with client.stream("POST", "/rag/rag", json={**body, "stream": True}) as resp:
+                    for line in resp.iter_lines():
+                        if line.startswith("event: token") and len(first_token) < len(total):
+                            first_token.append((time.perf_counter() - started) * 1000)
+        results[mode] = {"latency": summarize(total), "time_to_first_token": summarize(first_token)}
+    return results
+
+
+def cleanup(workspace: str) -> None:
+    from services.document_store import delete_file_records
+    from utils.db_pool import db_connection
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            delete_file_records(cur, workspace)
+        conn.commit()
+
+
+def database_available() -> str:
+    from utils.helpers import get_conn
+
+    try:
+        get_conn().close()
+        return ""
+    except Exception as e:
+        return f"{type(e).__name__}: {e}".strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SapiRAG benchmark suite")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workspace", default="bench-suite")
+    parser.add_argument("--real-models", action="store_true", help="load the real sentence-transformers models")
+    parser.add_argument("--skip-db", action="store_true")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-token-ms", type=float, default=20.0)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    if not args.real_models:
+        install_stub_models()
+    store = InMemoryObjectStore()
+    install_object_store(store)
+
+    pdfs = {f"bench-{i:03d}.pdf": make_pdf(args.pages, seed=i) for i in range(args.files)}
+    for name, data in pdfs.items():
+        store.upload_file(f"workspace-{args.workspace}", name, data)
+
+    from services.ingestion_pipeline import iter_page_texts
+    texts = ["\n".join(iter_page_texts(data)) for data in pdfs.values()]
+
+    results: Dict[str, Any] = {
+        "environment": environment(args.real_models),
+        "config": {"files": args.files, "pages": args.pages, "repeat": args.repeat},
+        "chunking": bench_chunking(texts, args.repeat),
+        "pdf_pipeline": bench_pdf_pipeline(pdfs, 1),
+    }
+
+    skipped = "--skip-db" if args.skip_db else database_available()
+    if skipped:
+        for section in ("insert", "search", "rag"):
+            results[section] = {"skipped": skipped}
+    else:
+        cleanup(args.workspace)
+        try:
+            results["insert"] = bench_insert(args.workspace, pdfs)
+            results["search"] = bench_search(args.workspace, next(iter(pdfs)), args.repeat)
+            results["rag"] = bench_rag(args.workspace, args.repeat, args.llm_first_token_ms, args.llm_token_ms)
+        finally:
+            cleanup(args.workspace)
+
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from services.vector_index_service import EMBEDDING_DIM, STORAGE_MODES, _MODES
+from utils.helpers import get_conn
+
+# Compares recall, latency and index footprint of the float32, halfvec and
+# binary HNSW indexes on a scratch table of synthetic clustered unit vectors.
+# Each mode is measured with only its own index, as deployed after migration 003:
+#   python -m benchmarks.bench_vector_storage --rows 200000 --rescore-factor 4
+
+TABLE = "bench_vectors"
+
+
+def make_vectors(rng, rows: int, clusters: int) -> np.ndarray:
+    # Real chunk embeddings are clustered by topic, which is what makes binary
+    # quantization usable; uniform random vectors would understate its recall.
+    centers = rng.standard_normal((clusters, EMBEDDING_DIM)).astype(np.float32)
+    assignment = rng.integers(0, clusters, rows)
+    vectors = centers[assignment] + 0.6 * rng.standard_normal((rows, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_table(conn, vectors: np.ndarray, batch_size: int = 2000) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cur.execute(f"CREATE TABLE {TABLE} (id INTEGER PRIMARY KEY, embedding vector({EMBEDDING_DIM}))")
+        for offset in range(0, len(vectors), batch_size):
+            execute_values(
+                cur,
+                f"INSERT INTO {TABLE} (id, embedding) VALUES %s",
+                [(offset + i, v) for i, v in enumerate(vectors[offset:offset + batch_size])],
+            )
+    conn.commit()
+
+
+def build_index(conn, mode: str) -> dict:
+    name = f"{TABLE}_{mode}"
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+        cur.execute(f"CREATE INDEX {name} ON {TABLE} USING hnsw ({_MODES[mode][1]})")
+        # Only this mode's index exists on the table, so pg_indexes_size is the
+        # mode's whole index footprint (HNSW plus primary key). The heap keeps
+        # the full-precision column in every mode for re-scoring.
+        cur.execute(
+            "SELECT pg_relation_size(%s), pg_indexes_size(%s), pg_table_size(%s)",
+            (name, TABLE, TABLE),
+        )
+        size, total, heap = cur.fetchone()
+    conn.commit()
+    return {
+        "build_seconds": round(time.perf_counter() - started, 2),
+        "index_mb": round(size / 2**20, 1),
+        "total_index_mb": round(total / 2**20, 1),
+        "heap_mb": round(heap / 2**20, 1),
+    }
+
+
+def search_sql(mode: str, fetch: int, top_k: int) -> tuple:
+    distance = _MODES[mode][2].format(vector="%s::vector")
+    if mode == "float32":
+        return f"SELECT id FROM {TABLE} ORDER BY {distance} LIMIT %s", (top_k,)
+    return (
+        f"SELECT id FROM ("
+        f" SELECT id, embedding FROM {TABLE} ORDER BY {distance} LIMIT %s"
+        f") AS approximate ORDER BY embedding <=> %s::vector LIMIT %s",
+        (fetch, top_k),
+    )
+
+
+def run_queries(conn, mode: str, queries: np.ndarray, truth: np.ndarray, top_k: int,
+                rescore_factor: int, ef_search: int) -> dict:
+    fetch = top_k * rescore_factor
+    sql, tail = search_sql(mode, fetch, top_k)
+    latencies, recalls = [], []
+    with conn.cursor() as cur:
+        for query, expected in zip(queries, truth):
+            params = (query, *tail) if mode == "float32" else (query, tail[0], query, tail[1])
+            cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(max(ef_search, fetch)),))
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            found = [row[0] for row in cur.fetchall()]
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(found) & set(expected.tolist())) / top_k)
+            conn.rollback()
+    latencies.sort()
+    return {
+        f"recall_at_{top_k}": round(statistics.mean(recalls), 4),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        "candidates": top_k if mode == "float32" else fetch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector storage mode benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--ef-search", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=list(STORAGE_MODES), choices=STORAGE_MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="vector_storage_bench.json")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = make_vectors(rng, args.rows, args.clusters)
+    queries = make_vectors(rng, args.queries, args.clusters)
+    # Exact ground truth: vectors are unit length, so cosine order is dot-product order.
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.top_k]
+
+    conn = get_conn()
+    try:
+        build_table(conn, vectors)
+        results = {"rows": args.rows, "dim": EMBEDDING_DIM, "top_k": args.top_k,
+                   "rescore_factor": args.rescore_factor, "modes": {}}
+        for mode in args.modes:
+            results["modes"][mode] = build_index(conn, mode)
+            results["modes"][mode].update(
+                run_queries(conn, mode, queries, truth, args.top_k, args.rescore_factor, args.ef_search)
+            )
+            with conn.cursor() as cur:
+                cur.execute(f"DROP INDEX {TABLE}_{mode}")
+            conn.commit()
+    finally:
+        conn.close()
+
+    for mode, summary in results["modes"].items():
+        print(f"{mode:>8}  recall@{args.top_k}={summary[f'recall_at_{args.top_k}']:.4f}"
+              f"  p50={summary['p50_ms']:8.3f} ms  p95={summary['p95_ms']:8.3f} ms"
+              f"  index={summary['index_mb']} MB  all indexes={summary['total_index_mb']} MB"
+              f"  heap={summary['heap_mb']} MB")
+    with open(args.output, "w") as out:
+        json.dump(results, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import random
+import re
+import zlib
+from typing import BinaryIO, Dict, List, Sequence, Tuple
+
+import fitz
+import numpy as np
+
+from services import ingestion_service, minio_service, model_registry
+
+# Offline stand-ins for the benchmark suite: a synthetic multilingual PDF
+# corpus, an in-memory object store and cheap deterministic models. They keep
+# the code under test unchanged and only replace what needs a network, a
+# MinIO server or model downloads.
+
+VOCABULARY = {
+    "hu": [
+        "egyetem", "hallgató", "tantárgy", "félév", "vizsga", "szabályzat", "kredit",
+        "kötelező", "választható", "oktató", "záróvizsga", "szakdolgozat", "ösztöndíj",
+        "kollégium", "határidő", "beiratkozás", "őszi", "tavaszi", "követelmény", "díjfizetés",
+        "a", "az", "és", "hogy", "nem", "is", "egy", "kell", "lehet", "valamint",
+    ],
+    "ro": [
+        "universitate", "student", "facultate", "examen", "semestru", "credite", "bursă",
+        "cămin", "taxă", "licență", "disciplină", "obligatoriu", "regulament", "sesiune",
+        "și", "în", "pentru", "este", "care", "să",
+    ],
+    "en": [
+        "university", "student", "course", "semester", "exam", "credit", "deadline",
+        "scholarship", "thesis", "enrollment", "requirement", "schedule",
+        "the", "and", "of", "to", "is", "for",
+    ],
+}
+
+QUERIES = [
+    "záróvizsga határidő",
+    "ösztöndíj kollégium díjfizetés",
+    "kötelező tantárgy kredit félév",
+    "szakdolgozat követelmény",
+    "bursă cămin taxă",
+    "examen sesiune regulament",
+    "scholarship deadline",
+    "thesis requirement semester",
+]
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def multilingual_text(n_words: int, seed: int = 0) -> str:
+    # Mostly Hungarian with Romanian and English passages, like the real corpus.
+    rng = random.Random(seed)
+    languages, weights = ["hu", "ro", "en"], [0.7, 0.2, 0.1]
+    lines, line, language = [], [], "hu"
+    for _ in range(n_words):
+        if not line:
+            language = rng.choices(languages, weights)[0]
+        line.append(rng.choice(VOCABULARY[language]))
+        if len(line) >= rng.randint(8, 16):
+            lines.append(" ".join(line))
+            line = []
+    lines.append(" ".join(line))
+    return "\n".join(lines)
+
+
+def make_pdf(pages: int, words_per_page: int = 350, seed: int = 0) -> bytes:
+    # insert_htmlbox embeds fonts covering ő/ű/ș/ț; the base-14 fonts of
+    # insert_textbox would turn them into '?'.
+    document = fitz.open()
+    for page_no in range(pages):
+        page = document.new_page()
+        text = multilingual_text(words_per_page, seed * 100_003 + page_no)
+        html = "".join(f"<p>{line}</p>" for line in text.split("\n"))
+        page.insert_htmlbox(fitz.Rect(36, 36, 560, 806), html, css="* {font-size: 8px;}")
+    return document.tobytes()
+
+
+class HashingEncoder:
+    # Bag-of-words feature hashing into the real embedding size, L2-normalized:
+    # deterministic, no download, and lexically similar texts stay close.
+
+    def __init__(self, dim: int = 768):
+        self.dim = dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            digest = zlib.crc32(token.encode("utf-8"))
+            vector[digest % self.dim] += 1.0 if digest & 1 else -1.0
+        return vector
+
+    def encode(self, texts: Sequence[str], normalize_embeddings: bool = False, **_) -> np.ndarray:
+        vectors = np.stack([self._vector(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+
+class OverlapCrossEncoder:
+    # Query-term recall of the passage, standing in for the cross-encoder score.
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], **_) -> np.ndarray:
+        scores = []
+        for query, passage in pairs:
+            terms = set(_TOKEN.findall(query.lower()))
+            words = set(_TOKEN.findall(passage.lower()))
+            scores.append(len(terms & words) / len(terms) if terms else 0.0)
+        return np.asarray(scores, dtype=np.float32)
+
+
+def install_stub_models() -> None:
+    model_registry._models[model_registry.BI_ENCODER_NAME] = HashingEncoder()
+    model_registry._models[model_registry.CROSS_ENCODER_NAME] = OverlapCrossEncoder()
+
+
+class InMemoryObjectStore:
+    def __init__(self):
+        self.buckets: Dict[str, Dict[str, bytes]] = {}
+
+    def ensure_bucket_exists(self, bucket: str) -> None:
+        self.buckets.setdefault(bucket, {})
+
+    def upload_file(self, bucket: str, object_name: str, data: bytes, content_type: str = "") -> None:
+        self.buckets.setdefault(bucket, {})[object_name] = bytes(data)
+
+    def upload_stream(self, bucket: str, object_name: str, stream: BinaryIO, content_type: str = "") -> None:
+        self.upload_file(bucket, object_name, stream.read())
+
+    def download_file_from_minio(self, bucket: str, object_name: str) -> bytes:
+        return self.buckets[bucket][object_name]
+
+    def list_pdfs(self, bucket: str) -> List[str]:
+        return [name for name in self.buckets.get(bucket, {}) if name.lower().endswith(".pdf")]
+
+
+def install_object_store(store: InMemoryObjectStore) -> None:
+    # ingestion_service imported the MinIO helpers by name, so patch both places.
+    for name in ("ensure_bucket_exists", "upload_stream", "download_file_from_minio", "list_pdfs"):
+        setattr(minio_service, name, getattr(store, name))
+        if hasattr(ingestion_service, name):
+            setattr(ingestion_service, name, getattr(store, name))
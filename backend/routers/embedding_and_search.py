@@ -1,98 +1,164 @@
-from typing import Optional
-from fastapi import Body, Form, Query
-from services.embedding_service import generate_embeddings_from_pdf
-from utils.helpers import get_conn
+import time
+from typing import List, Optional
+from fastapi import Body, Form, HTTPException, Query
+from pydantic import BaseModel
+from services.ingestion_jobs import job_queue
+from services.ingestion_service import ingest_pdf
+from services.executors import inference_executor, pdf_executor, ranking_executor, run_db, storage_executor
 from fastapi import APIRouter
-import tempfile
-from services.minio_service import ensure_bucket_exists, download_file_from_minio
-import os
+from services.minio_service import list_pdfs
+from services.vector_index_service import EF_SEARCH_MAX
+from utils.helpers import encode_text, encode_texts
+from app.config import settings
 from services.search_service import (
     keyword_search as util_keyword_search,
-    keyword_search_workspace,
     embedding_search as util_embedding_search,
-    embedding_search_workspace,
-    hybrid_search    as util_hybrid_search,
-    hybrid_search_workspace,
+    hybrid_candidates,
+    hybrid_candidates_batch,
+    fuse_candidates,
+    fuse_candidates_batch,
+    embedding_search_batch,
+    FUSION_MODES,
+    KEYWORD_MODES,
 )
 
 router= APIRouter()
 
 
 @router.post("/generate-embeddings")
-def generate_embeddings(filename: str = Form(...), workspace: str = Form(...)):
-    bucket = f"workspace-{workspace}"
-    ensure_bucket_exists(bucket)
-
-    file_data = download_file_from_minio(bucket, filename)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-        temp_file.write(file_data)
-        temp_file_path = temp_file.name
-
-    records = generate_embeddings_from_pdf(temp_file_path)
-    os.remove(temp_file_path)
-
-    conn = get_conn()
-    cursor = conn.cursor()
-    for item in records:
-        cursor.execute(
-            """
-            INSERT INTO documents (filename, workspace, header, body, embedding)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (filename, workspace, item["header"], item["body"], item["embedding"])
-        )
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    return {"message": f" Embeddings saved for {filename} in workspace {workspace}"}
+async def generate_embeddings(filename: str = Form(...), workspace: str = Form(...)):
+    stats = await pdf_executor.run(ingest_pdf, workspace, filename)
+    return {"message": f" Embeddings saved for {filename} in workspace {workspace}", "insert": stats}
+
+class IngestItem(BaseModel):
+    workspace: str
+    filename: str
+
+@router.post("/ingest-jobs")
+def submit_ingest_jobs(jobs: List[IngestItem] = Body(..., embed=True)):
+    job_ids = job_queue.submit_many([job.model_dump() for job in jobs])
+    return {"job_ids": job_ids}
+
+@router.post("/ingest-jobs/workspace")
+async def submit_workspace_ingest_jobs(workspace: str = Form(...)):
+    filenames = await storage_executor.run(list_pdfs, f"workspace-{workspace}")
+    if not filenames:
+        raise HTTPException(status_code=404, detail=f"No PDFs in workspace '{workspace}'")
+    job_ids = job_queue.submit_many([{"workspace": workspace, "filename": f} for f in filenames])
+    return {"job_ids": job_ids}
+
+@router.get("/ingest-jobs")
+def list_ingest_jobs(workspace: Optional[str] = Query(None)):
+    return {"jobs": job_queue.list_jobs(workspace)}
+
+@router.get("/ingest-jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
 
 @router.get("/keyword-search")
-def keyword_search_endpoint(
+async def keyword_search_endpoint(
     query: str = Query(...),
     top_k: int = Query(10),
     filename: Optional[str] = Query(None),
-    workspace: str = Query(...),):
-    print(workspace)
-    conn = get_conn()
-    try:
-        if filename:
-            rows = util_keyword_search(conn, query, workspace, filename, top_k)
-        else:
-            rows = keyword_search_workspace(conn, query, workspace, top_k)
-    finally:
-        conn.close()
+    workspace: str = Query(...),
+    mode: str = Query("prefix"),
+    min_match: int = Query(1),):
+    mode = mode.lower()
+    if mode not in KEYWORD_MODES:
+        raise HTTPException(400, f"mode must be one of {', '.join(KEYWORD_MODES)}")
+    rows = await run_db(util_keyword_search, query, workspace, filename, top_k, mode, min_match)
     return {"matches": [{"header": h, "body": b, "filename": f, "rank": r}for  h, b,f, r in rows]}
 
+def _check_ef_search(ef_search: Optional[int]):
+    if ef_search is not None and not 1 <= ef_search <= EF_SEARCH_MAX:
+        raise HTTPException(400, f"ef_search must be between 1 and {EF_SEARCH_MAX}")
+
 @router.post("/embedding-search")
-def embedding_search_endpoint(
+async def embedding_search_endpoint(
     query: str = Body(...),
     top_k: int = Body(10),
     filename: Optional[str] = Body(None),
-    workspace: str = Body(...),):
-    conn = get_conn()
-    try:
-        if filename:
-            rows = util_embedding_search(conn, query, workspace, filename, top_k)
-        else:
-            rows = embedding_search_workspace(conn, query, workspace, top_k)
-    finally:
-        conn.close()
+    workspace: str = Body(...),
+    ef_search: Optional[int] = Body(None),):
+    _check_ef_search(ef_search)
+    q_emb = await inference_executor.run(encode_text, query)
+    rows = await run_db(util_embedding_search, query, workspace, filename, top_k, ef_search, q_emb)
     return {"matches": [{"header": h, "body": b, "filename": f, "rank": r}for  h, b,f, r in rows]}
 
 @router.post("/search-hybrid")
-def hybrid_search_endpoint(
+async def hybrid_search_endpoint(
     query: str = Body(...),
     top_k: int = Body(10),
     filename: Optional[str] = Body(None),
-    workspace: str = Body(...),):
-    conn = get_conn()
-    try:
-        if filename:
-            rows = util_hybrid_search(conn, query, workspace, filename, top_k)
-        else:
-            rows = hybrid_search_workspace(conn, query, workspace, top_k)
-    finally:
-        conn.close()
-    return {"matches": [{"header": h, "body": b, "filename": f, "rank": r}for  h, b,f, r in rows]}
+    workspace: str = Body(...),
+    fusion: str = Body("rerank"),
+    vector_weight: float = Body(0.5),
+    ef_search: Optional[int] = Body(None),
+    rerank_depth: Optional[int] = Body(None),
+    latency_budget_ms: Optional[float] = Body(None),):
+    fusion = fusion.lower()
+    if fusion not in FUSION_MODES:
+        raise HTTPException(400, f"fusion must be one of {', '.join(FUSION_MODES)}")
+    _check_ef_search(ef_search)
+    started = time.perf_counter()
+    q_emb = await inference_executor.run(encode_text, query)
+    candidates = await run_db(hybrid_candidates, query, workspace, filename, top_k, ef_search, q_emb)
+    rows, stage = await ranking_executor.run(fuse_candidates, query, candidates, fusion, vector_weight,
+                                             rerank_depth, latency_budget_ms, started)
+    rows = rows[:top_k]
+    # "rank" is a cross-encoder score for the first "reranked" matches and a
+    # fused score otherwise; "score_stage" says which (see search_service.score_stage).
+    return {"matches": [{"header": h, "body": b, "filename": f, "rank": r}for  h, b,f, r in rows], **stage}
+
+def _check_batch(queries: List[str]):
+    if not queries:
+        raise HTTPException(400, "queries must not be empty")
+    if len(queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(400, f"at most {settings.SEARCH_BATCH_MAX_QUERIES} queries per request")
+
+def _batch_response(queries: List[str], results):
+    return {"results": [
+        {"query": query, "matches": [{"header": h, "body": b, "filename": f, "rank": r} for h, b, f, r in rows]}
+        for query, rows in zip(queries, results)
+    ]}
+
+@router.post("/embedding-search/batch")
+async def embedding_search_batch_endpoint(
+    queries: List[str] = Body(...),
+    top_k: int = Body(10),
+    filename: Optional[str] = Body(None),
+    workspace: str = Body(...),
+    ef_search: Optional[int] = Body(None),):
+    _check_batch(queries)
+    _check_ef_search(ef_search)
+    q_embs = await inference_executor.run(encode_texts, queries)
+    results = await run_db(embedding_search_batch, queries, workspace, filename, top_k, ef_search, q_embs)
+    return _batch_response(queries, results)
+
+@router.post("/search-hybrid/batch")
+async def hybrid_search_batch_endpoint(
+    queries: List[str] = Body(...),
+    top_k: int = Body(10),
+    filename: Optional[str] = Body(None),
+    workspace: str = Body(...),
+    fusion: str = Body("rerank"),
+    vector_weight: float = Body(0.5),
+    ef_search: Optional[int] = Body(None),
+    rerank_depth: Optional[int] = Body(None),):
+    fusion = fusion.lower()
+    if fusion not in FUSION_MODES:
+        raise HTTPException(400, f"fusion must be one of {', '.join(FUSION_MODES)}")
+    _check_batch(queries)
+    _check_ef_search(ef_search)
+    q_embs = await inference_executor.run(encode_texts, queries)
+    candidates = await run_db(hybrid_candidates_batch, queries, workspace, filename, top_k, ef_search, q_embs)
+    results = await ranking_executor.run(fuse_candidates_batch, queries, candidates, top_k, fusion, vector_weight,
+                                         rerank_depth)
+    # Each result carries its own score_stage, as in /search-hybrid.
+    response = _batch_response(queries, [rows for rows, _ in results])
+    for result, (_, stage) in zip(response["results"], results):
+        result.update(stage)
+    return response
@@ -0,0 +1,75 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.config import settings
+from services.model_registry import is_ready, readiness
+from services.answer_cache import answer_cache
+from services.embedding_cache import query_embedding_cache
+from services.executors import executor_stats
+from services.cascade_rerank import cascade_costs
+from services.inference_service import batching_stats
+from services.workspace_vectors import workspace_vectors
+from services.vector_index_service import workspace_indexes
+from utils.db_pool import pool
+
+router= APIRouter()
+
+@router.get("/live")
+def live():
+    return {"status": "ok"}
+
+@router.get("/ready")
+def ready():
+    status = readiness()
+    status["warmup_enabled"] = settings.MODEL_WARMUP
+    if not is_ready(settings.MODEL_WARMUP):
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@router.get("/db-pool")
+def db_pool_stats():
+    return pool.stats()
+
+@router.get("/query-cache")
+def query_cache_stats():
+    return query_embedding_cache.stats()
+
+@router.get("/answer-cache")
+def answer_cache_stats():
+    return answer_cache.stats()
+
+@router.get("/hot-index")
+def hot_index_stats():
+    return workspace_vectors.stats()
+
+@router.get("/workspace-indexes")
+def workspace_indexes_stats():
+    return workspace_indexes.stats()
+
+@router.get("/executors")
+def executors_stats():
+    return executor_stats()
+
+@router.get("/batching")
+def batching_metrics():
+    return batching_stats()
+
+@router.get("/inference")
+def inference_stats():
+    if settings.INFERENCE_MODE != "sidecar":
+        return {"mode": settings.INFERENCE_MODE, "batching": batching_stats()}
+    from services.inference_client import InferenceError, get_inference_client
+    client = get_inference_client()
+    try:
+        server = client.server_stats()
+    except InferenceError as e:
+        server = {"error": str(e)}
+    return {"mode": "sidecar", "client": client.stats(), "server": server}
+
+@router.get("/rerank-cascade")
+def rerank_cascade_stats():
+    return {
+        "pair_cost_ms": cascade_costs(),
+        "rerank_depth": settings.RERANK_DEPTH,
+        "fast_reranker": settings.CASCADE_FAST_RERANKER or None,
+        "early_exit_margin": settings.CASCADE_EARLY_EXIT_MARGIN,
+    }
@@ -1,197 +1,289 @@
-from typing import Optional
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import numpy as np
 from fastapi import Body, HTTPException
-from app.config import settings
-import requests
+from fastapi.responses import StreamingResponse
 from fastapi import APIRouter
-from utils.helpers import get_conn,count_tokens
+from psycopg2.extensions import connection as PGConnection
+from app.config import settings
+from utils.helpers import encode_text
+from services.answer_cache import answer_cache
+from services.context_packer import pack_context
+from services.document_store import get_token_counts
+from services.executors import inference_executor, ranking_executor, run_db
+from services.metrics import observe_stage, stage_timer
+from services.llm_service import LLMError, LLMProvider, get_provider, request_providers
 from services.search_service import (
     keyword_search as util_keyword_search,
     keyword_search_workspace,
     embedding_search as util_embedding_search,
     embedding_search_workspace,
-    hybrid_search    as util_hybrid_search,
-    hybrid_search_workspace,
+    hybrid_candidates,
+    fuse_candidates,
+    FUSION_MODES,
 )
 
 router= APIRouter()
+logger = logging.getLogger(__name__)
 
 
-BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+def _search(
+    conn: PGConnection,
+    question: str,
+    filename: Optional[str],
+    workspace: Optional[str],
+    mode: str,
+    top_k: int,
+    score_threshold: float,
+    q_emb: Optional[np.ndarray],
+) -> Tuple[List[Tuple[Any, ...]], Dict[Tuple[str, str], Optional[int]]]:
+    # The part of retrieval that needs a connection: the final rows, or the
+    # candidates for hybrid mode, plus the stored token counts of all of them.
+    if mode == "keyword":
+        rows = (
+            util_keyword_search(conn, question, workspace, filename, top_k)
+            if filename
+            else keyword_search_workspace(conn, question, workspace, top_k)
+        )
+    elif mode == "hybrid":
+        rows = hybrid_candidates(conn, question, workspace, filename, top_k, q_emb=q_emb)
+    else:
+        rows = (
+            util_embedding_search(conn, question, workspace, filename, top_k, q_emb=q_emb)
+            if filename
+            else embedding_search_workspace(conn, question, workspace, top_k, q_emb=q_emb)
+        )
 
-@router.post("/rag")
-def rag(
-    question:        str   = Body(...),    
-    filename:        Optional[str] = Body(None),
-    workspace:       Optional[str] = Body(None),
-    mode:            str   = Body("embedding"),
-    top_k:           int   = Body(10),
-    score_threshold: float = Body(0.0),
-):
-    if not (filename or workspace):
-        raise HTTPException(400, "Select workspace or file name")
-    mode = mode.lower()
-    if mode not in ("keyword", "embedding", "hybrid"):
-        raise HTTPException(400, "Not correct mode")
-    conn = get_conn()
-    try:
-        if mode == "keyword":
-            rows = (
-                util_keyword_search(conn, question, workspace, filename, top_k)
-                if filename
-                else keyword_search_workspace(conn, question, workspace, top_k)
-            )
-            print(rows)
-        elif mode == "hybrid":
-            rows = (
-                util_hybrid_search(conn, question, workspace, filename, top_k)
-                if filename
-                else hybrid_search_workspace(conn, question, workspace, top_k)
-            )
-        else:
-            rows = (
-                util_embedding_search(conn, question, workspace, filename, top_k)
-                if filename
-                else embedding_search_workspace(conn, question, workspace, top_k)
-            )
-
-    finally:
-        conn.close()
-    if mode == "embedding":
-        filtered = [(h, b, f, s) for h, b, f, s in rows if s >= score_threshold][:4]
+    if mode == "hybrid":
+        chunks = [(f, h) for _, h, _, f, *_ in rows]
+    elif mode == "embedding":
+        rows = [(h, b, f, s) for h, b, f, s in rows if s >= score_threshold][:4]
+        chunks = [(f, h) for h, _, f, _ in rows]
     else:
-        filtered = rows[:4]
-
-    context = ""
-    for header, body, filename, score in filtered:
-        snippet = f"[{header}] {body}\n\n"
-        if count_tokens(context + snippet) > 3000:
-            break
-        context += snippet
+        rows = rows[:4]
+        chunks = [(f, h) for h, _, f, _ in rows]
+    return rows, get_token_counts(conn, workspace, chunks)
+
+
+async def _retrieve(
+    question: str,
+    filename: Optional[str],
+    workspace: Optional[str],
+    mode: str,
+    top_k: int,
+    score_threshold: float,
+    fusion: str = "rerank",
+    rerank_depth: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+) -> Tuple[List[Tuple[str, str, str, float]], Dict[Tuple[str, str], Optional[int]], Dict[str, Any]]:
+    # Encode, query, then fuse/rerank, each on its own executor, so the pooled
+    # connection is only held for the queries. In hybrid mode also returns the
+    # stage that ranked the context (search_service.score_stage).
+    started = time.perf_counter()
+    q_emb = None if mode == "keyword" else await inference_executor.run(encode_text, question)
+    rows, token_counts = await run_db(_search, question, filename, workspace, mode, top_k, score_threshold, q_emb)
+    stage: Dict[str, Any] = {}
+    if mode == "hybrid":
+        rows, stage = await ranking_executor.run(fuse_candidates, question, rows, fusion,
+                                                 rerank_depth=rerank_depth, latency_budget_ms=latency_budget_ms,
+                                                 started=started)
+        rows = rows[:min(top_k, 4)]
+    return rows, token_counts, stage
+
+
+def _build_prompt(
+    question: str,
+    rows: List[Tuple[str, str, str, float]],
+    token_counts: Dict[Tuple[str, str], Optional[int]],
+    trim_last: bool = False,
+) -> str:
+    with stage_timer("pack_context"):
+        context = pack_context(rows, token_counts, settings.RAG_CONTEXT_TOKENS, trim_last)
     prompt = (
         f"Válaszolj a kérdésre az alábbi KONtextus alapján. "
         f"Ha nincs válasz, írd azt, hogy 'Nem található'.\n\n"
         f"KONtextus:\n{context}\n\n"
         f"Kérdés: {question}\nVálasz:"
     )
-    print("=== RAG PROMPT ===")
-    print(prompt)
-    print("==================")
-
-    payload = {
-        "contents": [
-            {
-                "parts": [
-                    {"text": prompt}
-                ]
-            }
-        ]
-    }
+    logger.debug("RAG prompt (%s chars, %s chunks)", len(prompt), len(rows))
+    return prompt
+
+
+def _validate(filename, workspace, mode, fusion, provider) -> Tuple[str, str, LLMProvider]:
+    if not (filename or workspace):
+        raise HTTPException(400, "Select workspace or file name")
+    mode = mode.lower()
+    if mode not in ("keyword", "embedding", "hybrid"):
+        raise HTTPException(400, "Not correct mode")
+    fusion = fusion.lower()
+    if fusion not in FUSION_MODES:
+        raise HTTPException(400, "Not correct fusion")
+    providers = request_providers()
+    if provider is not None and provider.lower() not in providers:
+        raise HTTPException(400, f"provider must be one of {', '.join(providers)}")
+    return mode, fusion, get_provider(provider)
+
 
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _answer(llm: LLMProvider, prompt: str, fallback: str) -> str:
     try:
-        resp = requests.post(
-            f"{BASE_URL}?key={settings.GEMINI_API_KEY}",
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=30,
-        )
-        resp.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Gemini API error: {e}")
+        with stage_timer("llm"):
+            answer = await llm.generate(prompt)
+    except LLMError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return answer.strip() or fallback
+
 
-    data = resp.json()
-    print(data)
-    texts = [
-        part["text"]
-        for cand in data["candidates"]
-        for part in cand["content"]["parts"]
-    ]
+async def _stream_answer(
+    llm: LLMProvider,
+    prompt: str,
+    fallback: str,
+    extra: Dict[str, Any],
+    on_done: Optional[Callable[[str], None]] = None,
+) -> StreamingResponse:
+    # Server-sent events: one "token" event per piece the LLM produces, then a
+    # "done" event with the full answer. The first piece is awaited before the
+    # response starts so a provider that is down still maps to an HTTP error.
+    started = time.perf_counter()
+    tokens = llm.stream(prompt)
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = ""
+    except LLMError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    observe_stage("llm_first_token", time.perf_counter() - started)
 
-    answer = "".join(texts).strip() or "Nincs válasz"
-    return {"answer": answer}
+    async def events():
+        pieces = [first]
+        try:
+            if first:
+                yield _sse("token", {"text": first})
+            async for token in tokens:
+                pieces.append(token)
+                yield _sse("token", {"text": token})
+        except LLMError as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+        finally:
+            await tokens.aclose()
+            observe_stage("llm", time.perf_counter() - started)
+        answer = "".join(pieces).strip() or fallback
+        if on_done is not None:
+            on_done(answer)
+        yield _sse("done", {"answer": answer, **extra, "cached": False})
 
-@router.post("/rag-ollama")
-def rag(
+    return _event_stream(events())
+
+
+def _event_stream(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _cached_events(answer: str, extra: Dict[str, Any]) -> AsyncIterator[str]:
+    yield _sse("token", {"text": answer})
+    yield _sse("done", {"answer": answer, **extra, "cached": True})
+
+
+async def _cache_lookup(
+    question: str,
+    workspace: Optional[str],
+    scope: Tuple[Any, ...],
+    rows: List[Tuple[str, str, str, float]],
+    generation: int,
+) -> Tuple[Optional[str], Optional[Callable[[str], None]]]:
+    # Returns a cached answer, or a callback that stores the fresh one.
+    if not answer_cache.enabled:
+        return None, None
+    vector = await inference_executor.run(encode_text, question)
+    key = answer_cache.make_key(scope, rows)
+    cached = answer_cache.get(key, vector)
+    if cached is not None:
+        return cached, None
+    return None, lambda answer: answer_cache.put(key, workspace, question, vector, answer, generation)
+
+
+async def _respond(
+    question: str,
+    workspace: Optional[str],
+    scope: Tuple[Any, ...],
+    rows: List[Tuple[str, str, str, float]],
+    token_counts: Dict[Tuple[str, str], Optional[int]],
+    trim_last: bool,
+    generation: int,
+    llm: LLMProvider,
+    fallback: str,
+    extra: Dict[str, Any],
+    stream: bool,
+):
+    cached, store = await _cache_lookup(question, workspace, scope, rows, generation)
+    if cached is not None:
+        if stream:
+            return _event_stream(_cached_events(cached, extra))
+        return {"answer": cached, **extra, "cached": True}
+
+    prompt = _build_prompt(question, rows, token_counts, trim_last)
+    if stream:
+        return await _stream_answer(llm, prompt, fallback, extra, on_done=store)
+    answer = await _answer(llm, prompt, fallback)
+    if store is not None:
+        store(answer)
+    return {"answer": answer, **extra, "cached": False}
+
+
+@router.post("/rag")
+async def rag(
     question:        str   = Body(...),    
     filename:        Optional[str] = Body(None),
     workspace:       Optional[str] = Body(None),
     mode:            str   = Body("embedding"),
     top_k:           int   = Body(10),
     score_threshold: float = Body(0.0),
+    fusion:          str   = Body("rerank"),
+    stream:          bool  = Body(False),
+    provider:        Optional[str] = Body(None),
+    trim_last_chunk: bool  = Body(False),
+    rerank_depth:    Optional[int] = Body(None),
+    latency_budget_ms: Optional[float] = Body(None),
 ):
-    mode = mode.lower()
-    if mode not in ("keyword", "embedding", "hybrid"):
-        raise HTTPException(400, "Invalid search mode")
-    conn = get_conn()
-    try:
-        if mode == "keyword":
-            rows = (
-                util_keyword_search(conn, question, filename, top_k)
-                if filename
-                else keyword_search_workspace(conn, question, workspace, top_k)
-            )
-        elif mode == "hybrid":
-            rows = (
-                util_hybrid_search(conn, question, filename, top_k)
-                if filename
-                else hybrid_search_workspace(conn, question, workspace, top_k)
-            )
-        else:
-            rows = (
-                util_embedding_search(conn, question, filename, top_k)
-                if filename
-                else embedding_search_workspace(conn, question, workspace, top_k)
-            )
-    finally:
-        conn.close()
-    if mode == "embedding":
-        filtered = [(h,b,s) for h,b,s in rows if s >= score_threshold][:4]
-    else:
-        filtered = rows[:4]
-
-    context = ""
-    for header, body, _ in filtered:
-        snippet = f"[{header}] {body}\n\n"
-        if count_tokens(context + snippet) > 3000:
-            break
-        context += snippet
-    prompt = (
-        f"Válaszolj a kérdésre az alábbi KONtextus alapján. "
-        f"Ha nincs válasz, írd azt, hogy 'Nem található'.\n\n"
-        f"KONtextus:\n{context}\n\n"
-        f"Kérdés: {question}\nVálasz:"
-    )
-    print("=== RAG PROMPT ===")
-    print(prompt)
-    print("==================")
-
-    resp = requests.post(
-        f"{settings.OLLAMA_HOST}/api/generate",
-        json={
-            "model":       "phi4-mini",
-            "prompt":      prompt,
-            "temperature": 0.1,
-            "max_tokens": 512,
-            "stream":      False,
-        },
-        timeout=80
-    )
+    mode, fusion, llm = _validate(filename, workspace, mode, fusion, provider)
+    generation = answer_cache.generation(workspace)
+    rows, token_counts, stage = await _retrieve(question, filename, workspace, mode, top_k, score_threshold,
+                                                fusion, rerank_depth, latency_budget_ms)
+    scope = ("rag", workspace, filename, mode, fusion, llm.name, trim_last_chunk)
+    # Hybrid mode reports whether the context was cross-encoder ranked or the
+    # cascade exited early on fused scores (score_stage, reranked, exit).
+    return await _respond(question, workspace, scope, rows, token_counts, trim_last_chunk, generation,
+                          llm, "Nincs válasz", stage, stream)
 
-    print(f"[rag] Ollama status: {resp.status_code}")
-    print(f"[rag] Ollama raw response:\n{resp.text}")
-    try:
-        payload = resp.json()
-        print(f"[rag] Parsed JSON keys: {list(payload.keys())}")
-        print(f"[rag] Full JSON payload: {payload}")
-    except ValueError as e:
-        print(f"[rag] JSON parse error: {e}")
-
-    if resp.status_code != 200:
-        return {"error": f"Ollama hiba: {resp.text}"}
-
-    answer = payload.get("response", "").strip() or "Nem található"
-    citations = " ".join(f"[{h}]" for h,_,_ in filtered)
-    return {
-        "answer":      answer,
-        "citations":   citations,
-        "used_chunks": [h for h,_,_ in filtered],
+@router.post("/rag-ollama")
+async def rag_ollama(
+    question:        str   = Body(...),    
+    filename:        Optional[str] = Body(None),
+    workspace:       Optional[str] = Body(None),
+    mode:            str   = Body("embedding"),
+    top_k:           int   = Body(10),
+    score_threshold: float = Body(0.0),
+    stream:          bool  = Body(False),
+    trim_last_chunk: bool  = Body(False),
+):
+    mode, fusion, llm = _validate(filename, workspace, mode, "rerank", "ollama")
+    generation = answer_cache.generation(workspace)
+    rows, token_counts, stage = await _retrieve(question, filename, workspace, mode, top_k, score_threshold, fusion)
+    sources = {
+        "citations":   " ".join(f"[{h}]" for h, _, _, _ in rows),
+        "used_chunks": [h for h, _, _, _ in rows],
+        **stage,
     }
+    scope = ("rag-ollama", workspace, filename, mode, fusion, llm.name, trim_last_chunk)
+    return await _respond(question, workspace, scope, rows, token_counts, trim_last_chunk, generation,
+                          llm, "Nem található", sources, stream)
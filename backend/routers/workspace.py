@@ -1,84 +1,129 @@
+import asyncio
+from typing import List, Optional
 from fastapi import File, Form, HTTPException, Query, UploadFile
 from fastapi import APIRouter
-from services.minio_service import list_buckets, delete_bucket_and_contents, _client, list_pdfs, delete_pdf, create_bucket, ensure_bucket_exists, upload_file
-from utils.helpers import get_conn
+from app.config import settings
+from services.minio_service import list_buckets, delete_bucket_and_contents, _client, list_pdfs, delete_pdf, delete_pdfs, create_bucket, ensure_bucket_exists, upload_stream
+from services.document_store import delete_records_chunked
+from services.vector_index_service import workspace_indexes
+from services.workspace_events import workspace_changed
+from services.executors import run_db, storage_executor
 
 router= APIRouter()
 
+
+def _delete_records(conn, workspace: str, filenames: Optional[List[str]] = None) -> int:
+    if filenames is None:
+        return delete_records_chunked(conn, workspace)
+    return sum(delete_records_chunked(conn, workspace, filename) for filename in filenames)
+
+
+async def _store_pdf(bucket: str, file: UploadFile) -> None:
+    # UploadFile spools to a temporary file past 1 MiB, and upload_stream
+    # reads it part by part, so no upload is ever held in memory whole.
+    await storage_executor.run(upload_stream, bucket, file.filename, file.file, "application/pdf")
+
+
 @router.get("/buckets")
-def get_buckets():
-    return {"buckets": list_buckets()}
+async def get_buckets():
+    return {"buckets": await storage_executor.run(list_buckets)}
 
 @router.delete("/delete-workspace")
-def delete_workspace(name: str = Form(...)):
+async def delete_workspace(name: str = Form(...)):
     bucket = f"workspace-{name}"
-    deleted = delete_bucket_and_contents(bucket)
+    deleted = await storage_executor.run(delete_bucket_and_contents, bucket)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket}' doesn't exists")
 
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM documents WHERE workspace = %s", (name,))
-    conn.commit()
-    cur.close()
-    conn.close()
+    await run_db(_delete_records, name)
+    workspace_indexes.schedule_drop(name)
+    workspace_changed(name)
 
     return {"message": f" Workspace '{name}' (and the bucket '{bucket}') deleted."}
 
 @router.get("/list-pdfs")
-def list_workspace_pdfs(workspace: str = Query(...)):
+async def list_workspace_pdfs(workspace: str = Query(...)):
 
     bucket = f"workspace-{workspace}"
-    if not _client.bucket_exists(bucket):
+    if not await storage_executor.run(_client.bucket_exists, bucket):
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket}' doesn't exists")
 
-    pdfs = list_pdfs(bucket)
+    pdfs = await storage_executor.run(list_pdfs, bucket)
     return {"pdfs": pdfs}
 
 @router.delete("/delete-pdf")
-def delete_pdf_endpoint(
+async def delete_pdf_endpoint(
     workspace: str = Form(...),
     filename:  str = Form(...)
 ):
     bucket = f"workspace-{workspace}"
     
-    ok = delete_pdf(bucket, filename)
+    ok = await storage_executor.run(delete_pdf, bucket, filename)
     if not ok:
         raise HTTPException(
             status_code=404,
             detail=f"'{filename}' is not in bucket {bucket}"
         )
 
-    conn = get_conn()
-    cur  = conn.cursor()
-    cur.execute(
-        "DELETE FROM documents WHERE workspace = %s AND filename = %s",
-        (workspace, filename)
-    )
-    conn.commit()
-    cur.close(); conn.close()
+    await run_db(_delete_records, workspace, [filename])
+    workspace_changed(workspace, filename)
 
     return {"message": f" {filename} deleted from {workspace} workspace"}
 
+@router.delete("/delete-pdfs")
+async def delete_pdfs_endpoint(
+    workspace: str = Form(...),
+    filenames: List[str] = Form(...)
+):
+    bucket = f"workspace-{workspace}"
+
+    deleted = await storage_executor.run(delete_pdfs, bucket, filenames)
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"None of the files are in bucket {bucket}")
+
+    await run_db(_delete_records, workspace, deleted)
+    for filename in deleted:
+        workspace_changed(workspace, filename)
+
+    return {"deleted": deleted, "missing": [f for f in filenames if f not in deleted]}
+
 @router.post("/create-bucket")
-def create_new_bucket(name: str = Form(...)):
-    created = create_bucket(name)
+async def create_new_bucket(name: str = Form(...)):
+    bucket = f"workspace-{name}"
+    created = await storage_executor.run(create_bucket, bucket)
     if created:
-        return {"message": f" Bucket '{name}' created."}
+        workspace_indexes.schedule_create(name)
+        return {"message": f" Bucket '{bucket}' created."}
     else:
-        return {"message": f" Bucket '{name}' already exists."}
+        return {"message": f" Bucket '{bucket}' already exists."}
     
 @router.post("/upload-pdf")
-def upload_pdf(
+async def upload_pdf(
     file: UploadFile = File(...),
     workspace: str = Form(...)):
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
     bucket = f"workspace-{workspace}"
-    (bucket)
+    await storage_executor.run(ensure_bucket_exists, bucket)
 
-    file_data = file.file.read()
-    upload_file(bucket, file.filename, file_data, content_type="application/pdf")
+    await _store_pdf(bucket, file)
 
     return {"filename": file.filename, "bucket": bucket}
+
+@router.post("/upload-pdfs")
+async def upload_pdfs(
+    files: List[UploadFile] = File(...),
+    workspace: str = Form(...)):
+    if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.UPLOAD_BATCH_MAX_FILES} files per request")
+    not_pdf = [file.filename for file in files if not file.filename.endswith(".pdf")]
+    if not_pdf:
+        raise HTTPException(status_code=400, detail=f"Only PDF files are supported: {', '.join(not_pdf)}")
+
+    bucket = f"workspace-{workspace}"
+    await storage_executor.run(ensure_bucket_exists, bucket)
+
+    await asyncio.gather(*(_store_pdf(bucket, file) for file in files))
+
+    return {"filenames": [file.filename for file in files], "bucket": bucket}
@@ -0,0 +1,47 @@
+import argparse
+
+from psycopg2.extras import execute_values
+
+from services.chunking_service import count_tokens
+from utils.helpers import get_conn
+
+# Fills documents.token_count for rows ingested before the column existed:
+#   python -m scripts.backfill_token_counts --batch-size 1000
+
+
+def backfill(conn, batch_size: int) -> int:
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, body FROM documents WHERE token_count IS NULL ORDER BY id LIMIT %s",
+                (batch_size,),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                return total
+            execute_values(
+                cur,
+                "UPDATE documents AS d SET token_count = v.token_count"
+                " FROM (VALUES %s) AS v(id, token_count) WHERE d.id = v.id",
+                [(doc_id, count_tokens(body or "")) for doc_id, body in rows],
+            )
+        conn.commit()
+        total += len(rows)
+        print(f"{total} rows updated")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill documents.token_count")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    conn = get_conn()
+    try:
+        backfill(conn, args.batch_size)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
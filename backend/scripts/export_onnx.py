@@ -0,0 +1,30 @@
+import argparse
+import json
+
+from app.config import settings
+from services.onnx_backend import export_models, verify_export
+
+# Exports both models to ONNX (fp32 and dynamically quantized int8) for
+# INFERENCE_BACKEND=onnx and checks them against PyTorch, writing the result
+# to sapirag_onnx_verify.json for the API to read at startup. Needs
+# optimum[onnxruntime] next to the usual stack:
+#   python -m scripts.export_onnx --output models/onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the SapiRAG models to ONNX")
+    parser.add_argument("--output", default=settings.ONNX_MODEL_DIR)
+    parser.add_argument("--quantization", default=None,
+                        help="optimum preset (avx2, avx512, avx512_vnni, arm64); detected by default")
+    parser.add_argument("--skip-verify", action="store_true",
+                        help="don't compare against PyTorch (the API then serves PyTorch while ONNX_VERIFY is on)")
+    args = parser.parse_args()
+
+    report = {"meta": export_models(args.output, args.quantization)}
+    if not args.skip_verify:
+        report["verify"] = verify_export(args.output)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from services.embedding_cache import normalize_query
+from services.workspace_events import on_workspace_change
+
+
+class AnswerCache:
+    # RAG answers keyed on the retrieval scope plus the exact list of chunks
+    # that went into the prompt. A lookup hits when one of the entries with
+    # that key has a question embedding within ``similarity`` (cosine) of the
+    # new question. Each workspace has a generation counter that is bumped on
+    # invalidation, so an answer computed from documents that changed while
+    # the request was running is not stored.
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600, similarity: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        # (key, normalized question) -> (workspace, vector, answer, created)
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[Optional[str], np.ndarray, Any, float]]" = OrderedDict()
+        self._by_key: Dict[Hashable, set] = {}
+        self._generations: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale_puts": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(scope: Sequence[Any], rows: Sequence[Tuple[str, str, str, float]]) -> Hashable:
+        return tuple(scope), tuple((filename, header) for header, _, filename, _ in rows)
+
+    def generation(self, workspace: Optional[str]) -> int:
+        with self._lock:
+            return self._generations.get(workspace, 0)
+
+    def _remove(self, entry_key: Tuple[Hashable, str]) -> None:
+        self._entries.pop(entry_key, None)
+        group = self._by_key.get(entry_key[0])
+        if group is not None:
+            group.discard(entry_key)
+            if not group:
+                del self._by_key[entry_key[0]]
+
+    def get(self, key: Hashable, vector: np.ndarray) -> Optional[Any]:
+        now = time.time()
+        best, best_score = None, self.similarity
+        with self._lock:
+            for entry_key in list(self._by_key.get(key, ())):
+                _, cached_vector, answer, created = self._entries[entry_key]
+                if now - created > self.ttl_seconds:
+                    self._remove(entry_key)
+                    self._stats["evictions"] += 1
+                    continue
+                score = float(np.dot(cached_vector, vector))
+                if score >= best_score:
+                    best, best_score = entry_key, score
+            if best is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best)
+            self._stats["hits"] += 1
+            return self._entries[best][2]
+
+    def put(
+        self,
+        key: Hashable,
+        workspace: Optional[str],
+        question: str,
+        vector: np.ndarray,
+        answer: Any,
+        generation: int,
+    ) -> None:
+        entry_key = (key, normalize_query(question))
+        with self._lock:
+            if self._generations.get(workspace, 0) != generation:
+                self._stats["stale_puts"] += 1
+                return
+            self._entries[entry_key] = (workspace, vector, answer, time.time())
+            self._entries.move_to_end(entry_key)
+            self._by_key.setdefault(key, set()).add(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, workspace: str, filename: Optional[str] = None) -> None:
+        # Answers are dropped per workspace (plus any stored without one): a
+        # changed file can alter what a workspace-wide retrieval returns.
+        with self._lock:
+            for ws in (workspace, None):
+                self._generations[ws] = self._generations.get(ws, 0) + 1
+            stale = [k for k, entry in self._entries.items() if entry[0] in (workspace, None)]
+            for entry_key in stale:
+                self._remove(entry_key)
+            self._stats["invalidations"] += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+            }
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.RAG_CACHE_SIZE,
+    ttl_seconds=settings.RAG_CACHE_TTL,
+    similarity=settings.RAG_CACHE_SIMILARITY,
+)
+on_workspace_change(answer_cache.invalidate)
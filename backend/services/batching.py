@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    # Gathers items submitted by concurrent callers into one call of ``process``,
+    # bounded by ``max_batch_size`` items and ``max_wait_ms`` after the first
+    # pending request, then routes each slice of the results back to its caller.
+
+    def __init__(
+        self,
+        name: str,
+        process: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._process = process
+        self._pending: deque = deque()
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stats = {
+            "requests": 0,
+            "items": 0,
+            "batches": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+            "batch_seconds_total": 0.0,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+            self._worker.start()
+
+    def submit(self, items: Sequence[Any]) -> Future:
+        future: Future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((list(items), future))
+            self._stats["requests"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._pending))
+            self._cond.notify()
+        return future
+
+    def run(self, items: Sequence[Any]) -> List[Any]:
+        return self.submit(items).result()
+
+    def _next_batch(self) -> List[tuple]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            batch = [self._pending.popleft()]
+            size = len(batch[0][0])
+            while size < self.max_batch_size:
+                if self._pending:
+                    if size + len(self._pending[0][0]) > self.max_batch_size:
+                        break
+                    request = self._pending.popleft()
+                    batch.append(request)
+                    size += len(request[0])
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            items = [item for request_items, _ in batch for item in request_items]
+            started = time.perf_counter()
+            calls = 0
+            try:
+                results = []
+                for offset in range(0, len(items), self.max_batch_size):
+                    results.extend(self._process(items[offset:offset + self.max_batch_size]))
+                    calls += 1
+            except Exception as e:
+                logger.exception("%s batch of %s items failed", self.name, len(items))
+                with self._cond:
+                    self._stats["errors"] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._cond:
+                self._stats["batches"] += calls
+                self._stats["items"] += len(items)
+                self._stats["batch_seconds_total"] += time.perf_counter() - started
+            offset = 0
+            for request_items, future in batch:
+                future.set_result(results[offset:offset + len(request_items)])
+                offset += len(request_items)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            batches = self._stats["batches"]
+            return {
+                **self._stats,
+                "batch_seconds_total": round(self._stats["batch_seconds_total"], 4),
+                "queue_depth": len(self._pending),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "avg_batch_size": round(self._stats["items"] / batches, 2) if batches else None,
+                "avg_batch_fill": round(self._stats["items"] / (batches * self.max_batch_size), 4)
+                if batches else None,
+            }
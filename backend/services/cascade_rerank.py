@@ -0,0 +1,180 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.config import settings
+from services.inference_service import rerank, rerank_fast, rerank_fast_many, rerank_many
+
+# Cascade reranking for hybrid search. The candidates arrive ordered by a
+# cheap fused score; an optional fast cross-encoder reorders the head of that
+# list, and the full cross-encoder only scores the top ``depth`` survivors.
+# Candidates below the depth keep their earlier order after the reranked ones;
+# their earlier-stage scores are on other scales, so they are rescaled to sit
+# just below the lowest cross-encoder score and the returned scores stay
+# ordered. A latency budget caps the depth using the observed cost per scored
+# pair of each model.
+
+_EWMA_ALPHA = 0.2
+
+
+class _PairCost:
+    # Exponentially weighted seconds per scored pair, per model.
+
+    def __init__(self, seconds: float):
+        self._seconds = seconds
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        return self._seconds
+
+    def observe(self, seconds: float, pairs: int) -> None:
+        if pairs:
+            with self._lock:
+                self._seconds += _EWMA_ALPHA * (seconds / pairs - self._seconds)
+
+
+_costs = {
+    "full": _PairCost(settings.CASCADE_PAIR_MS / 1000),
+    "fast": _PairCost(settings.CASCADE_FAST_PAIR_MS / 1000),
+}
+
+
+def _score(model: str, query: str, texts: List[str]) -> List[float]:
+    started = time.perf_counter()
+    scores = rerank(query, texts) if model == "full" else rerank_fast(query, texts)
+    _costs[model].observe(time.perf_counter() - started, len(texts))
+    return scores
+
+
+def _score_many(model: str, requests: List[Tuple[str, List[str]]]) -> List[List[float]]:
+    started = time.perf_counter()
+    scores = rerank_many(requests) if model == "full" else rerank_fast_many(requests)
+    _costs[model].observe(time.perf_counter() - started, sum(len(texts) for _, texts in requests))
+    return scores
+
+
+def _sorted(head: Sequence[Tuple[int, float]], scores: Sequence[float]) -> List[Tuple[int, float]]:
+    return sorted(((doc_id, float(score)) for (doc_id, _), score in zip(head, scores)),
+                  key=lambda x: x[1], reverse=True)
+
+
+def _below(head: List[Tuple[int, float]], tail: Sequence[Tuple[int, float]]) -> List[Tuple[int, float]]:
+    # Keeps the tail's order, with scores spread over the unit interval
+    # under the lowest reranked score.
+    if not head:
+        return list(tail)
+    floor = head[-1][1]
+    step = 1.0 / (len(tail) + 1)
+    return head + [(doc_id, floor - (i + 1) * step) for i, (doc_id, _) in enumerate(tail)]
+
+
+def _depth(depth: Optional[int], candidates: int) -> int:
+    return candidates if not depth or depth < 0 else min(depth, candidates)
+
+
+def _margin_exit(ranked: List[Tuple[int, float]], agreement: Set[int], margin: float) -> bool:
+    # A leader that both retrievers found and that is far ahead of the
+    # runner-up would not move under the cross-encoder: skip it.
+    return (
+        margin > 0 and len(ranked) > 1 and ranked[0][0] in agreement
+        and ranked[0][1] - ranked[1][1] >= margin
+    )
+
+
+def _affordable(model: str, remaining: float) -> int:
+    return int(remaining // _costs[model].seconds) if _costs[model].seconds > 0 else 1 << 30
+
+
+def cascade_rerank(
+    query: str,
+    ranked: Sequence[Tuple[int, float]],
+    passages: Dict[int, str],
+    depth: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    started: Optional[float] = None,
+    agreement: Set[int] = frozenset(),
+    early_exit_margin: Optional[float] = None,
+) -> Tuple[List[Tuple[int, float]], Dict[str, Any]]:
+    # ``ranked``: (doc id, fused score) best first, fused scores in [0, 1].
+    # ``agreement``: ids found by both retrievers. ``started``: perf_counter
+    # at the start of the request, which the budget is measured from.
+    ranked = list(ranked)
+    depth = _depth(depth, len(ranked))
+    margin = settings.CASCADE_EARLY_EXIT_MARGIN if early_exit_margin is None else early_exit_margin
+    info: Dict[str, Any] = {"candidates": len(ranked), "fast_depth": 0, "depth": 0, "exit": None}
+
+    if _margin_exit(ranked, agreement, margin):
+        info["exit"] = "margin"
+        return ranked, info
+
+    remaining = float("inf")
+    if latency_budget_ms is not None:
+        remaining = latency_budget_ms / 1000 - (time.perf_counter() - (started or time.perf_counter()))
+        depth = min(depth, max(_affordable("full", remaining), 0))
+        if depth <= 0:
+            info["exit"] = "budget"
+            return ranked, info
+
+    if settings.CASCADE_FAST_RERANKER:
+        fast_depth = min(len(ranked), depth * settings.CASCADE_FAST_FACTOR)
+        if latency_budget_ms is not None:
+            fast_depth = min(fast_depth, _affordable("fast", remaining - depth * _costs["full"].seconds))
+        if fast_depth > depth:
+            head = ranked[:fast_depth]
+            scores = _score("fast", query, [passages[doc_id] for doc_id, _ in head])
+            ranked = _sorted(head, scores) + ranked[fast_depth:]
+            info["fast_depth"] = fast_depth
+
+    head = ranked[:depth]
+    scores = _score("full", query, [passages[doc_id] for doc_id, _ in head])
+    info["depth"] = depth
+    return _below(_sorted(head, scores), ranked[depth:]), info
+
+
+def cascade_rerank_many(
+    requests: Sequence[Tuple[str, Sequence[Tuple[int, float]], Dict[int, str], Set[int]]],
+    depth: Optional[int] = None,
+    early_exit_margin: Optional[float] = None,
+) -> List[Tuple[List[Tuple[int, float]], Dict[str, Any]]]:
+    # cascade_rerank for several queries (query, ranked, passages, agreement)
+    # without a latency budget; each stage scores the pairs of every query in
+    # one pass.
+    margin = settings.CASCADE_EARLY_EXIT_MARGIN if early_exit_margin is None else early_exit_margin
+    results: List[Tuple[List[Tuple[int, float]], Dict[str, Any]]] = []
+    pending: List[Tuple[int, int]] = []
+    for i, (_, ranked, _, agreement) in enumerate(requests):
+        ranked = list(ranked)
+        info: Dict[str, Any] = {"candidates": len(ranked), "fast_depth": 0, "depth": 0, "exit": None}
+        results.append((ranked, info))
+        if _margin_exit(ranked, agreement, margin):
+            info["exit"] = "margin"
+        elif ranked:
+            pending.append((i, _depth(depth, len(ranked))))
+
+    def rescore(model: str, cuts: List[Tuple[int, int]]) -> None:
+        scores = _score_many(model, [
+            (requests[i][0], [requests[i][2][doc_id] for doc_id, _ in results[i][0][:cut]]) for i, cut in cuts
+        ])
+        for (i, cut), query_scores in zip(cuts, scores):
+            ranked, info = results[i]
+            head = _sorted(ranked[:cut], query_scores)
+            if model == "fast":
+                results[i] = (head + ranked[cut:], info)
+                info["fast_depth"] = cut
+            else:
+                results[i] = (_below(head, ranked[cut:]), info)
+                info["depth"] = cut
+
+    if settings.CASCADE_FAST_RERANKER:
+        fast = [(i, min(len(results[i][0]), cut * settings.CASCADE_FAST_FACTOR)) for i, cut in pending]
+        fast = [(i, fast_cut) for (i, fast_cut), (_, cut) in zip(fast, pending) if fast_cut > cut]
+        if fast:
+            rescore("fast", fast)
+    if pending:
+        rescore("full", pending)
+    return results
+
+
+def cascade_costs() -> Dict[str, float]:
+    return {model: round(cost.seconds * 1000, 3) for model, cost in _costs.items()}
@@ -0,0 +1,130 @@
+import re
+from functools import lru_cache
+from typing import Generator, Iterable, Iterator, List, Tuple
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+MAX_TOKENS = 600
+OVERLAP_TOKENS = 100
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = ENCODING_NAME) -> tiktoken.Encoding:
+    # tiktoken rebuilds its merge tables on every get_encoding call; keep one per process.
+    return tiktoken.get_encoding(name)
+
+
+tokenizer = get_encoding(ENCODING_NAME)
+
+def count_tokens(text: str) -> int:
+    return len(tokenizer.encode(text))
+
+
+def _is_word_boundary(text: str, pos: int) -> bool:
+    return pos <= 0 or pos >= len(text) or text[pos].isspace() or text[pos - 1].isspace()
+
+
+def _windows(
+    text: str,
+    tokens: List[int],
+    offsets: List[int],
+    max_tokens: int,
+    overlap: int,
+    final: bool = True) -> Generator[str, None, int]:
+    # Windows are cut on token offsets and mapped back to character spans,
+    # snapped to whitespace so no word is split. Unless ``final``, the window
+    # touching the end of the text is held back and the index of its first
+    # token returned so a caller can carry it over to the next piece.
+    n_tokens = len(tokens)
+    if not n_tokens:
+        return 0
+    offsets = offsets + [len(text)]
+
+    start = 0
+    while True:
+        end = min(start + max_tokens, n_tokens)
+        if end >= n_tokens and not final:
+            return start
+        if end < n_tokens:
+            cut = end
+            while cut > start and not _is_word_boundary(text, offsets[cut]):
+                cut -= 1
+            if cut > start:
+                end = cut
+
+        chunk = " ".join(text[offsets[start]:offsets[end]].split())
+        if chunk:
+            yield chunk
+        if end >= n_tokens:
+            return n_tokens
+
+        next_start = max(end - overlap, start + 1)
+        while next_start < end and not _is_word_boundary(text, offsets[next_start]):
+            next_start += 1
+        start = next_start
+
+
+def _tokenize(text: str) -> Tuple[List[int], List[int]]:
+    tokens = tokenizer.encode_ordinary(text)
+    if not tokens:
+        return [], []
+    _, offsets = tokenizer.decode_with_offsets(tokens)
+    return tokens, offsets
+
+
+def iter_chunks(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS) -> Iterator[str]:
+    # The text is tokenized exactly once.
+    tokens, offsets = _tokenize(text)
+    yield from _windows(text, tokens, offsets, max_tokens, overlap)
+
+
+# A newline followed by a non-space character always ends a pre-tokenizer
+# piece, so text split there tokenizes to the same tokens as a whole.
+_SAFE_SPLIT = re.compile(r"\n(?=\S)")
+
+
+def iter_chunks_stream(
+    texts: Iterable[str],
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS) -> Iterator[str]:
+    # Same windows as iter_chunks("\n".join(texts)) without holding the whole
+    # document: incoming text is tokenized up to its last safe split point,
+    # the finished windows are flushed, and the unfinished tail is carried
+    # over together with its tokens so it is never re-tokenized.
+    flush_chars = max_tokens * 16
+    buffer, tokens, offsets = "", [], []
+    untokenized, first = "", True
+    for text in texts:
+        untokenized = text if first else f"{untokenized}\n{text}"
+        first = False
+        if len(untokenized) < flush_chars:
+            continue
+        split = None
+        for split in _SAFE_SPLIT.finditer(untokenized):
+            pass
+        if split is None:
+            continue
+        piece, untokenized = untokenized[:split.end()], untokenized[split.end():]
+        piece_tokens, piece_offsets = _tokenize(piece)
+        tokens += piece_tokens
+        offsets += [len(buffer) + offset for offset in piece_offsets]
+        buffer += piece
+        done = yield from _windows(buffer, tokens, offsets, max_tokens, overlap, final=False)
+        if done:
+            consumed = offsets[done]
+            buffer, tokens = buffer[consumed:], tokens[done:]
+            offsets = [offset - consumed for offset in offsets[done:]]
+    piece_tokens, piece_offsets = _tokenize(untokenized)
+    tokens += piece_tokens
+    offsets += [len(buffer) + offset for offset in piece_offsets]
+    yield from _windows(buffer + untokenized, tokens, offsets, max_tokens, overlap)
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    overlap: int = OVERLAP_TOKENS) -> list[str]:
+    return list(iter_chunks(text, max_tokens, overlap))
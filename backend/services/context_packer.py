@@ -0,0 +1,51 @@
+from typing import Mapping, Optional, Sequence, Tuple
+
+from services.chunking_service import count_tokens, tokenizer
+
+CONTEXT_TOKENS = 3000
+
+
+def _snippet(header: str, body: str) -> str:
+    return f"[{header}] {body}\n\n"
+
+
+def _overhead(header: str) -> int:
+    # "[header] " plus the blank line separating snippets.
+    return count_tokens(f"[{header}] ") + 1
+
+
+def _trim(body: str, max_tokens: int) -> str:
+    tokens = tokenizer.encode_ordinary(body)
+    if len(tokens) <= max_tokens:
+        return body
+    text = tokenizer.decode(tokens[:max_tokens])
+    # Drop the partial word (or partial UTF-8 sequence) the cut may leave.
+    return text.rsplit(None, 1)[0] if " " in text else ""
+
+
+def pack_context(
+    rows: Sequence[Tuple[str, str, str, float]],
+    token_counts: Mapping[Tuple[str, str], Optional[int]],
+    budget: int = CONTEXT_TOKENS,
+    trim_last: bool = False,
+) -> str:
+    # Packs chunks in rank order by summing their stored token counts instead
+    # of re-tokenizing the growing context. The chunk that no longer fits is
+    # dropped, or with ``trim_last`` cut down to the remaining budget.
+    parts = []
+    used = 0
+    for header, body, filename, _ in rows:
+        count = token_counts.get((filename, header))
+        if count is None:
+            count = count_tokens(body)
+        overhead = _overhead(header)
+        if used + overhead + count > budget:
+            room = budget - used - overhead
+            if trim_last and room > 0:
+                trimmed = _trim(body, room)
+                if trimmed:
+                    parts.append(_snippet(header, trimmed))
+            break
+        parts.append(_snippet(header, body))
+        used += overhead + count
+    return "".join(parts)
@@ -0,0 +1,227 @@
+import io
+import logging
+import struct
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Mapping, MutableMapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from psycopg2.extensions import connection as PGConnection
+from utils.helpers import report_progress
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 5000
+COPY_COLUMNS = ("filename", "workspace", "header", "body", "content_hash", "token_count", "embedding")
+
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+
+
+def _text_field(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def _int_field(value: int) -> bytes:
+    return struct.pack(">ii", 4, value)
+
+
+def _vector_field(embedding: Iterable[float]) -> bytes:
+    # pgvector binary format: int16 dimensions, int16 unused, float4[] big-endian
+    values = np.asarray(embedding, dtype=">f4")
+    data = struct.pack(">hh", values.shape[0], 0) + values.tobytes()
+    return struct.pack(">i", len(data)) + data
+
+
+def encode_copy_rows(filename: str, workspace: str, records: List[Dict[str, Any]]) -> io.BytesIO:
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    file_field = _text_field(filename)
+    workspace_field = _text_field(workspace)
+    field_count = struct.pack(">h", len(COPY_COLUMNS))
+    for item in records:
+        buffer.write(field_count)
+        buffer.write(file_field)
+        buffer.write(workspace_field)
+        buffer.write(_text_field(item["header"]))
+        buffer.write(_text_field(item["body"]))
+        buffer.write(_text_field(item["content_hash"]))
+        buffer.write(_int_field(item["token_count"]))
+        buffer.write(_vector_field(item["embedding"]))
+    buffer.write(_PGCOPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def copy_documents(cursor, filename: str, workspace: str, records: List[Dict[str, Any]]) -> int:
+    if not records:
+        return 0
+    cursor.copy_expert(
+        f"COPY documents ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT binary)",
+        encode_copy_rows(filename, workspace, records),
+    )
+    return len(records)
+
+
+def insert_documents(
+    conn: PGConnection,
+    filename: str,
+    workspace: str,
+    records: Iterable[Dict[str, Any]],
+    batch_size: int = COPY_BATCH_SIZE,
+    progress: Optional[MutableMapping[str, int]] = None,
+    finalize: Optional[Callable[[Any], Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    # ``finalize`` runs on the same cursor after the last batch, before the
+    # commit, so its changes land in the same transaction as the new rows.
+    started = time.perf_counter()
+    rows = 0
+    records = iter(records)
+    try:
+        with conn.cursor() as cursor:
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    break
+                written = copy_documents(cursor, filename, workspace, batch)
+                rows += written
+                report_progress(progress, "rows_written", written)
+            extra = finalize(cursor) if finalize is not None else {}
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    seconds = time.perf_counter() - started
+    stats = {
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None,
+        **extra,
+    }
+    logger.info("Inserted %s chunks of %s/%s: %s", rows, workspace, filename, stats)
+    return stats
+
+
+def get_file_hash(conn: PGConnection, workspace: str, filename: str) -> Optional[str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT content_hash FROM document_files WHERE workspace = %s AND filename = %s",
+            (workspace, filename),
+        )
+        row = cur.fetchone()
+    conn.rollback()
+    return row[0] if row else None
+
+
+def get_chunk_hashes(conn: PGConnection, workspace: str, filename: str) -> Set[str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT content_hash FROM documents WHERE workspace = %s AND filename = %s",
+            (workspace, filename),
+        )
+        hashes = {row[0] for row in cur.fetchall()}
+    conn.rollback()
+    return hashes
+
+
+def get_token_counts(
+    conn: PGConnection,
+    workspace: str,
+    chunks: Sequence[Tuple[str, str]],
+) -> Dict[Tuple[str, str], Optional[int]]:
+    # (filename, header) -> stored token_count; NULL for rows ingested before
+    # the column existed.
+    if not chunks:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT filename, header, token_count FROM documents"
+            " WHERE workspace = %s"
+            "   AND (filename, header) IN (SELECT * FROM unnest(%s::text[], %s::text[]))",
+            (workspace, [f for f, _ in chunks], [h for _, h in chunks]),
+        )
+        return {(f, h): count for f, h, count in cur.fetchall()}
+
+
+def sync_file(
+    cursor,
+    workspace: str,
+    filename: str,
+    file_hash: str,
+    chunk_headers: Mapping[str, str],
+) -> Dict[str, Any]:
+    # Brings the stored chunks of a file in line with its latest version:
+    # chunks that are no longer produced are deleted, reused chunks take the
+    # header of their new position, and the file fingerprint is recorded.
+    hashes = list(chunk_headers)
+    cursor.execute(
+        "DELETE FROM documents WHERE workspace = %s AND filename = %s"
+        " AND (content_hash IS NULL OR NOT content_hash = ANY(%s::text[]))",
+        (workspace, filename, hashes),
+    )
+    deleted = cursor.rowcount
+    cursor.execute(
+        "UPDATE documents AS d SET header = v.header"
+        " FROM unnest(%s::text[], %s::text[]) AS v(content_hash, header)"
+        " WHERE d.workspace = %s AND d.filename = %s"
+        "   AND d.content_hash = v.content_hash AND d.header IS DISTINCT FROM v.header",
+        (hashes, [chunk_headers[h] for h in hashes], workspace, filename),
+    )
+    renumbered = cursor.rowcount
+    cursor.execute(
+        "INSERT INTO document_files (workspace, filename, content_hash, chunk_count)"
+        " VALUES (%s, %s, %s, %s)"
+        " ON CONFLICT (workspace, filename) DO UPDATE"
+        " SET content_hash = EXCLUDED.content_hash, chunk_count = EXCLUDED.chunk_count,"
+        "     ingested_at = now()",
+        (workspace, filename, file_hash, len(hashes)),
+    )
+    return {"chunks": len(hashes), "deleted": deleted, "renumbered": renumbered}
+
+
+def delete_records_chunked(
+    conn: PGConnection,
+    workspace: str,
+    filename: Optional[str] = None,
+    batch_size: int = DELETE_BATCH_SIZE,
+) -> int:
+    # Deletes a workspace or file in short transactions of ``batch_size`` rows,
+    # so row locks and the WAL burst stay small and concurrent ingest/search
+    # is not blocked behind one huge DELETE. Not atomic: an interrupted run
+    # leaves a prefix deleted and can simply be repeated.
+    scope_sql = "workspace = %s AND filename = %s" if filename is not None else "workspace = %s"
+    scope_params = (workspace, filename) if filename is not None else (workspace,)
+    total = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM documents WHERE id IN ("
+                f" SELECT id FROM documents WHERE {scope_sql} LIMIT %s"
+                ")",
+                (*scope_params, batch_size),
+            )
+            deleted = cur.rowcount
+        conn.commit()
+        total += deleted
+        if deleted == 0:
+            break
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM document_files WHERE {scope_sql}", scope_params)
+    conn.commit()
+    logger.info("Deleted %s rows of %s/%s", total, workspace, filename or "*")
+    return total
+
+
+def delete_file_records(cursor, workspace: str, filename: Optional[str] = None) -> int:
+    if filename is None:
+        cursor.execute("DELETE FROM documents WHERE workspace = %s", (workspace,))
+        deleted = cursor.rowcount
+        cursor.execute("DELETE FROM document_files WHERE workspace = %s", (workspace,))
+        return deleted
+    cursor.execute("DELETE FROM documents WHERE workspace = %s AND filename = %s", (workspace, filename))
+    deleted = cursor.rowcount
+    cursor.execute("DELETE FROM document_files WHERE workspace = %s AND filename = %s", (workspace, filename))
+    return deleted
@@ -0,0 +1,168 @@
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class _DiskTier:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            " model TEXT NOT NULL, query TEXT NOT NULL, created REAL NOT NULL,"
+            " vector BLOB NOT NULL, PRIMARY KEY (model, query))"
+        )
+        self._db.commit()
+
+    def get(self, key: Tuple[str, str], ttl: float) -> Optional[Tuple[np.ndarray, float]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT vector, created FROM query_embeddings WHERE model = ? AND query = ?", key
+            ).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32), row[1]
+
+    def put(self, key: Tuple[str, str], vector: np.ndarray, created: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings (model, query, created, vector)"
+                " VALUES (?, ?, ?, ?)",
+                (*key, created, np.asarray(vector, dtype=np.float32).tobytes()),
+            )
+            self._db.commit()
+
+    def purge_expired(self, ttl: float) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM query_embeddings WHERE created < ?", (time.time() - ttl,))
+            self._db.commit()
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        if self._disk is not None:
+            self._disk.purge_expired(ttl_seconds)
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _get_memory(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, created = entry
+            if time.time() - created > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["evictions"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return vector
+
+    def _put_memory(self, key: Tuple[str, str], vector: np.ndarray, created: float) -> None:
+        with self._lock:
+            self._entries[key] = (vector, created)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _lookup(self, key: Tuple[str, str]) -> Optional[np.ndarray]:
+        vector = self._get_memory(key)
+        if vector is not None:
+            return vector
+
+        if self._disk is not None:
+            stored = self._disk.get(key, self.ttl_seconds)
+            if stored is not None:
+                vector, created = stored
+                vector.setflags(write=False)
+                self._put_memory(key, vector, created)
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                return vector
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def _store(self, key: Tuple[str, str], vector: Any) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        created = time.time()
+        self._put_memory(key, vector, created)
+        if self._disk is not None:
+            try:
+                self._disk.put(key, vector, created)
+            except sqlite3.Error:
+                logger.warning("Could not persist query embedding", exc_info=True)
+        return vector
+
+    def get_or_compute(self, text: str, model_name: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        key = (model_name, normalize_query(text))
+        vector = self._lookup(key)
+        if vector is not None:
+            return vector
+        return self._store(key, compute(key[1]))
+
+    def get_or_compute_many(
+        self,
+        texts: Sequence[str],
+        model_name: str,
+        compute: Callable[[List[str]], Sequence[np.ndarray]],
+    ) -> List[np.ndarray]:
+        # Like get_or_compute, but all misses go to ``compute`` in one call.
+        keys = [(model_name, normalize_query(text)) for text in texts]
+        found: Dict[Tuple[str, str], np.ndarray] = {}
+        for key in keys:
+            if key not in found:
+                vector = self._lookup(key)
+                if vector is not None:
+                    found[key] = vector
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            for key, vector in zip(missing, compute([key[1] for key in missing])):
+                found[key] = self._store(key, vector)
+        return [found[key] for key in keys]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": self._disk is not None,
+                "hit_rate": round((self._stats["hits"] + self._stats["disk_hits"]) / lookups, 4)
+                if lookups else None,
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_CACHE_TTL,
+    disk_path=settings.QUERY_CACHE_DISK_PATH or None,
+)
@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+
+class BoundedExecutor:
+    # A named thread pool for one kind of blocking work. Async endpoints await
+    # it instead of the shared Starlette threadpool, so each kind of work is
+    # capped on its own: slow LLM/DB waits cannot use up the threads that CPU
+    # inference or fast keyword searches need, and vice versa.
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix=f"exec-{name}", initializer=self._mark_thread
+        )
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "max_in_flight": 0}
+        self._in_flight = 0
+
+    def _mark_thread(self) -> None:
+        _local.executor = self.name
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            failed = future.cancelled() or future.exception() is not None
+            self._stats["failed" if failed else "completed"] += 1
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._in_flight)
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # Blocking call from sync code; runs inline when already on this pool
+        # so nested calls cannot deadlock waiting for a free worker.
+        if getattr(_local, "executor", None) == self.name:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        context = contextvars.copy_context()
+        return await asyncio.wrap_future(self.submit(context.run, fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "in_flight": self._in_flight, "max_workers": self.max_workers}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+db_executor = BoundedExecutor("db", settings.EXECUTOR_DB_WORKERS or settings.PG_POOL_MAX_SIZE)
+# With the inference sidecar these threads only wait on its socket; twice the
+# client's in-flight cap leaves the client's slots and queue timeout, rather
+# than this pool's queue, to limit concurrent requests.
+inference_executor = BoundedExecutor(
+    "inference",
+    2 * settings.INFERENCE_CLIENT_MAX_INFLIGHT if settings.INFERENCE_MODE == "sidecar"
+    else settings.EXECUTOR_INFERENCE_WORKERS,
+)
+pdf_executor = BoundedExecutor("pdf", settings.EXECUTOR_PDF_WORKERS)
+storage_executor = BoundedExecutor("storage", settings.EXECUTOR_STORAGE_WORKERS)
+# Fusion and cascade reranking after the candidates are fetched. These threads
+# mostly wait on the cross-encoder, whose own concurrency stays capped by the
+# inference executor or the rerank batcher; keeping the waits here means DB
+# threads hand their connection back before any model runs.
+ranking_executor = BoundedExecutor("ranking", settings.EXECUTOR_RANKING_WORKERS)
+
+_executors = (db_executor, inference_executor, pdf_executor, storage_executor, ranking_executor)
+
+
+def _with_connection(fn: Callable[..., T], args: tuple, kwargs: dict) -> T:
+    # Imported here: utils.helpers -> inference_service -> executors would be circular.
+    from utils.db_pool import db_connection
+    with db_connection() as conn:
+        return fn(conn, *args, **kwargs)
+
+
+async def run_db(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Runs ``fn(conn, *args, **kwargs)`` with a pooled connection on the DB executor.
+    # ``fn`` should only query: encode before and rerank after (on the
+    # inference and ranking executors) so connections never wait on a model.
+    return await db_executor.run(_with_connection, fn, args, kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {executor.name: executor.stats() for executor in _executors}
+
+
+def shutdown_executors(wait: bool = False) -> None:
+    for executor in _executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Client side of the inference sidecar (services/inference_server.py). With
+# INFERENCE_MODE=sidecar the model registry hands out the Remote* proxies
+# below instead of loading models, so every API worker shares the one copy of
+# the models held by the sidecar.
+#
+# Wire format, both directions: two big-endian uint32 (header length, payload
+# length), a JSON header, then the payload. Results travel as raw float32
+# with their shape in the header.
+
+FRAME = struct.Struct(">II")
+
+
+class InferenceBusy(Exception):
+    # Backpressure: no free request slot in this worker, or the sidecar's
+    # queue is full. Mapped to 503 so clients back off.
+    pass
+
+
+class InferenceError(Exception):
+    pass
+
+
+def pack_frame(header: Dict[str, Any], payload: bytes = b"") -> bytes:
+    data = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return FRAME.pack(len(data), len(payload)) + data + payload
+
+
+def unpack_header(data: bytes) -> Dict[str, Any]:
+    return json.loads(data.decode("utf-8"))
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1 << 20))
+        if not chunk:
+            raise ConnectionError("inference server closed the connection")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def _recv_frame(sock: socket.socket) -> Tuple[Dict[str, Any], bytes]:
+    header_size, payload_size = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+    header = unpack_header(_recv_exactly(sock, header_size))
+    return header, _recv_exactly(sock, payload_size)
+
+
+class InferenceClient:
+    # Thread-safe; one request per connection at a time. At most
+    # ``max_inflight`` requests are outstanding per process; callers beyond
+    # that wait up to ``queue_timeout`` for a slot and then get InferenceBusy.
+
+    def __init__(self, path: str, max_inflight: int = 8, timeout: float = 30, queue_timeout: float = 2):
+        self.path = path
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_inflight = max_inflight
+        self.pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "busy": 0, "errors": 0, "reconnects": 0, "seconds_total": 0.0}
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _exchange(self, frame: bytes) -> Tuple[Dict[str, Any], bytes]:
+        # An idle connection may have been closed by a restarted sidecar; such
+        # a failure is retried once on a fresh connection.
+        try:
+            sock, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            sock, reused = self._connect(), False
+        try:
+            sock.sendall(frame)
+            response = _recv_frame(sock)
+        except socket.timeout:
+            sock.close()
+            raise
+        except OSError:
+            sock.close()
+            if not reused:
+                raise
+            with self._lock:
+                self._stats["reconnects"] += 1
+            return self._exchange(frame)
+        self._idle.put(sock)
+        return response
+
+    def request(self, header: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats["busy"] += 1
+            raise InferenceBusy(f"No inference slot free within {self.queue_timeout:.1f}s")
+        started = time.perf_counter()
+        try:
+            response, payload = self._exchange(pack_frame(header))
+        except OSError as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise InferenceError(f"Inference server at {self.path} unavailable: {e}") from e
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._stats["requests"] += 1
+                self._stats["seconds_total"] += time.perf_counter() - started
+        if not response.get("ok"):
+            if response.get("overloaded"):
+                with self._lock:
+                    self._stats["busy"] += 1
+                raise InferenceBusy(response.get("error", "inference server overloaded"))
+            raise InferenceError(response.get("error", "inference failed"))
+        return response, payload
+
+    def _array(self, header: Dict[str, Any]) -> np.ndarray:
+        response, payload = self.request(header)
+        return np.frombuffer(payload, dtype=np.float32).reshape(response["shape"])
+
+    def encode(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        return self._array({"op": "encode", "texts": texts, "normalize": normalize})
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], model: str = "full") -> np.ndarray:
+        return self._array({"op": "rerank", "pairs": [list(pair) for pair in pairs], "model": model})
+
+    def ping(self) -> Dict[str, Any]:
+        return self.request({"op": "ping"})[0]
+
+    def wait_ready(self, timeout: float) -> Dict[str, Any]:
+        # The sidecar only listens once its models are loaded.
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.ping()
+            except InferenceError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def server_stats(self) -> Dict[str, Any]:
+        return self.request({"op": "stats"})[0]["stats"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "seconds_total": round(self._stats["seconds_total"], 4),
+                "idle_connections": self._idle.qsize(),
+                "max_inflight": self.max_inflight,
+                "socket": self.path,
+            }
+
+
+class RemoteBiEncoder:
+    # The SentenceTransformer.encode subset used by the callers. The client is
+    # looked up per call, so proxies inherited by forked ingest workers don't
+    # share the parent's sockets.
+
+    def encode(self, texts: Union[str, Sequence[str]], normalize_embeddings: bool = False, **_) -> np.ndarray:
+        if isinstance(texts, str):
+            return get_inference_client().encode([texts], normalize_embeddings)[0]
+        return get_inference_client().encode(list(texts), normalize_embeddings)
+
+
+class RemoteCrossEncoder:
+    def __init__(self, model: str = "full"):
+        self.model = model
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], **_) -> np.ndarray:
+        return get_inference_client().predict(pairs, self.model)
+
+
+_client: Optional[InferenceClient] = None
+_client_lock = threading.Lock()
+
+
+def get_inference_client() -> InferenceClient:
+    global _client
+    with _client_lock:
+        if _client is None or _client.pid != os.getpid():
+            _client = InferenceClient(
+                settings.INFERENCE_SOCKET,
+                max_inflight=settings.INFERENCE_CLIENT_MAX_INFLIGHT,
+                timeout=settings.INFERENCE_CLIENT_TIMEOUT,
+                queue_timeout=settings.INFERENCE_QUEUE_TIMEOUT,
+            )
+        return _client
@@ -0,0 +1,158 @@
+import argparse
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from services.batching import MicroBatcher
+from services.inference_client import FRAME, pack_frame, unpack_header
+
+logger = logging.getLogger(__name__)
+
+# Inference sidecar: one process that owns the models and serves encode and
+# rerank requests from every API worker over a Unix socket, so memory does
+# not grow with the number of workers. Requests from all connections are
+# coalesced by MicroBatchers; large (ingest-sized) encode requests get their
+# own batcher so they don't hold up query encoding. When more than
+# INFERENCE_SERVER_MAX_PENDING items are queued, new requests are refused as
+# overloaded instead of queueing without bound.
+#   INFERENCE_MODE=sidecar on the API workers, and alongside them:
+#   python -m services.inference_server --socket /tmp/sapirag-inference.sock
+
+
+class InferenceServer:
+    def __init__(self, max_pending: int):
+        from services.model_registry import get_bi_encoder, get_cross_encoder, get_fast_cross_encoder
+
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {"connections": 0, "requests": 0, "overloaded": 0, "errors": 0}
+
+        def encoder(normalize: bool):
+            return lambda texts: list(get_bi_encoder().encode(texts, normalize_embeddings=normalize))
+
+        def predictor(get_model):
+            return lambda pairs: [float(score) for score in get_model().predict(pairs)]
+
+        self._batchers: Dict[Tuple[str, Any], MicroBatcher] = {}
+        for normalize in (True, False):
+            self._batchers[("encode", normalize)] = MicroBatcher(
+                f"encode{'-normalized' if normalize else ''}", encoder(normalize),
+                settings.ENCODE_MAX_BATCH_SIZE, settings.ENCODE_MAX_WAIT_MS,
+            )
+            self._batchers[("encode-bulk", normalize)] = MicroBatcher(
+                f"encode-bulk{'-normalized' if normalize else ''}", encoder(normalize),
+                settings.ENCODE_MAX_BATCH_SIZE, 0,
+            )
+        self._batchers[("rerank", "full")] = MicroBatcher(
+            "rerank", predictor(get_cross_encoder), settings.RERANK_MAX_BATCH_SIZE, settings.RERANK_MAX_WAIT_MS,
+        )
+        if settings.CASCADE_FAST_RERANKER:
+            self._batchers[("rerank", "fast")] = MicroBatcher(
+                "rerank-fast", predictor(get_fast_cross_encoder),
+                settings.RERANK_MAX_BATCH_SIZE, settings.RERANK_MAX_WAIT_MS,
+            )
+
+    def _batcher(self, header: Dict[str, Any]) -> Tuple[MicroBatcher, List[Any]]:
+        if header["op"] == "encode":
+            texts = header["texts"]
+            kind = "encode-bulk" if len(texts) > settings.ENCODE_MAX_BATCH_SIZE else "encode"
+            return self._batchers[(kind, bool(header.get("normalize")))], texts
+        if header["op"] == "rerank":
+            batcher = self._batchers.get(("rerank", header.get("model", "full")))
+            if batcher is None:
+                raise ValueError(f"Reranker '{header.get('model')}' is not loaded")
+            return batcher, [tuple(pair) for pair in header["pairs"]]
+        raise ValueError(f"Unknown op '{header['op']}'")
+
+    async def _handle(self, header: Dict[str, Any]) -> bytes:
+        op = header.get("op")
+        if op == "ping":
+            return pack_frame({"ok": True, "pid": os.getpid()})
+        if op == "stats":
+            return pack_frame({"ok": True, "stats": self.stats()})
+
+        batcher, items = self._batcher(header)
+        with self._lock:
+            if self._pending + len(items) > self.max_pending and self._pending:
+                self._stats["overloaded"] += 1
+                return pack_frame({"ok": False, "overloaded": True,
+                                   "error": f"inference queue full ({self._pending} items pending)"})
+            self._pending += len(items)
+        try:
+            results = await asyncio.wrap_future(batcher.submit(items))
+        finally:
+            with self._lock:
+                self._pending -= len(items)
+        array = np.asarray(results, dtype=np.float32)
+        if op == "encode" and not items:
+            array = array.reshape(0, 0)
+        return pack_frame({"ok": True, "shape": list(array.shape)}, array.tobytes())
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        with self._lock:
+            self._stats["connections"] += 1
+        try:
+            while True:
+                try:
+                    header_size, payload_size = FRAME.unpack(await reader.readexactly(FRAME.size))
+                    header = unpack_header(await reader.readexactly(header_size))
+                    await reader.readexactly(payload_size)
+                except asyncio.IncompleteReadError:
+                    return
+                with self._lock:
+                    self._stats["requests"] += 1
+                try:
+                    response = await self._handle(header)
+                except Exception as e:
+                    logger.exception("Inference request %s failed", header.get("op"))
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    response = pack_frame({"ok": False, "error": f"{type(e).__name__}: {e}"})
+                writer.write(response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        from services.model_registry import readiness
+
+        with self._lock:
+            stats = {**self._stats, "pending_items": self._pending, "max_pending": self.max_pending}
+        stats["batchers"] = {batcher.name: batcher.stats() for batcher in self._batchers.values()}
+        stats["models"] = readiness()
+        return stats
+
+
+async def serve(path: str, max_pending: int) -> None:
+    server = InferenceServer(max_pending)
+    if os.path.exists(path):
+        os.unlink(path)
+    unix_server = await asyncio.start_unix_server(server.serve_connection, path=path)
+    os.chmod(path, 0o660)
+    logger.info("Inference server listening on %s (pid %s)", path, os.getpid())
+    async with unix_server:
+        await unix_server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="SapiRAG inference sidecar")
+    parser.add_argument("--socket", default=settings.INFERENCE_SOCKET)
+    parser.add_argument("--max-pending", type=int, default=settings.INFERENCE_SERVER_MAX_PENDING)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # This process is the one that holds the models.
+    settings.INFERENCE_MODE = "local"
+    from services.model_registry import warm_up
+    logger.info("Loading models: %s", warm_up())
+    asyncio.run(serve(args.socket, args.max_pending))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from app.config import settings
+from services.batching import MicroBatcher
+from services.executors import inference_executor
+from services.metrics import stage_timer
+from services.model_registry import get_bi_encoder, get_cross_encoder, get_fast_cross_encoder
+
+T = TypeVar("T")
+
+
+def _predict_pairs(pairs: List[Tuple[str, str]]) -> List[float]:
+    return [float(score) for score in get_cross_encoder().predict(pairs)]
+
+
+def _predict_pairs_fast(pairs: List[Tuple[str, str]]) -> List[float]:
+    return [float(score) for score in get_fast_cross_encoder().predict(pairs)]
+
+
+def _encode_texts(texts: List[str]) -> List[np.ndarray]:
+    return list(get_bi_encoder().encode(texts, normalize_embeddings=True))
+
+
+# In sidecar mode the inference server batches across all workers, so the
+# per-process batchers are skipped, and the remote models are called straight
+# from the calling thread: the thread only waits on the socket, and the
+# client's in-flight cap (INFERENCE_CLIENT_MAX_INFLIGHT, with its queue
+# timeout) is what limits and pushes back, not the inference executor.
+_sidecar = settings.INFERENCE_MODE == "sidecar"
+_local_batching = not _sidecar
+
+
+def _infer(fn: Callable[..., T], *args: Any) -> T:
+    if _sidecar:
+        return fn(*args)
+    return inference_executor.call(fn, *args)
+
+
+rerank_batcher = MicroBatcher(
+    "rerank",
+    _predict_pairs,
+    max_batch_size=settings.RERANK_MAX_BATCH_SIZE,
+    max_wait_ms=settings.RERANK_MAX_WAIT_MS,
+) if settings.RERANK_BATCHING and _local_batching else None
+
+encode_batcher = MicroBatcher(
+    "encode",
+    _encode_texts,
+    max_batch_size=settings.ENCODE_MAX_BATCH_SIZE,
+    max_wait_ms=settings.ENCODE_MAX_WAIT_MS,
+) if settings.ENCODE_BATCHING and _local_batching else None
+
+
+def rerank(query: str, texts: Sequence[str]) -> List[float]:
+    pairs = [(query, text) for text in texts]
+    with stage_timer("rerank"):
+        if rerank_batcher is not None:
+            return rerank_batcher.run(pairs)
+        return _infer(_predict_pairs, pairs)
+
+
+def rerank_fast(query: str, texts: Sequence[str]) -> List[float]:
+    pairs = [(query, text) for text in texts]
+    with stage_timer("rerank_fast"):
+        return _infer(_predict_pairs_fast, pairs)
+
+
+def _split(requests: Sequence[Tuple[str, Sequence[str]]], scores: List[float]) -> List[List[float]]:
+    results, offset = [], 0
+    for _, texts in requests:
+        results.append(scores[offset:offset + len(texts)])
+        offset += len(texts)
+    return results
+
+
+def rerank_many(requests: Sequence[Tuple[str, Sequence[str]]]) -> List[List[float]]:
+    # Scores the passages of several queries in one cross-encoder pass and
+    # splits the scores back per query.
+    pairs = [(query, text) for query, texts in requests for text in texts]
+    if not pairs:
+        return [[] for _ in requests]
+    with stage_timer("rerank"):
+        if rerank_batcher is not None:
+            scores = rerank_batcher.run(pairs)
+        else:
+            scores = _infer(_predict_pairs, pairs)
+    return _split(requests, scores)
+
+
+def rerank_fast_many(requests: Sequence[Tuple[str, Sequence[str]]]) -> List[List[float]]:
+    pairs = [(query, text) for query, texts in requests for text in texts]
+    if not pairs:
+        return [[] for _ in requests]
+    with stage_timer("rerank_fast"):
+        scores = _infer(_predict_pairs_fast, pairs)
+    return _split(requests, scores)
+
+
+def encode_queries(texts: Sequence[str]) -> List[np.ndarray]:
+    if encode_batcher is not None:
+        return encode_batcher.run(list(texts))
+    return _infer(_encode_texts, list(texts))
+
+
+def batching_stats() -> Dict[str, Any]:
+    return {
+        name: batcher.stats() if batcher is not None else None
+        for name, batcher in (("rerank", rerank_batcher), ("encode", encode_batcher))
+    }
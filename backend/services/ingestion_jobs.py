@@ -0,0 +1,216 @@
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, MutableMapping, Optional
+
+from app.config import settings
+from services.workspace_events import workspace_changed
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, RETRYING, SUCCEEDED, FAILED = "queued", "running", "retrying", "succeeded", "failed"
+
+# S3 error codes MinIO returns for conditions that clear up on their own.
+_TRANSIENT_S3_CODES = {"SlowDown", "InternalError", "ServiceUnavailable", "RequestTimeout", "XMinioServerNotInitialized"}
+
+
+def _default_ingest(workspace: str, filename: str, progress: MutableMapping[str, Any]) -> Dict[str, Any]:
+    from services.ingestion_service import ingest_pdf
+    return ingest_pdf(workspace, filename, progress)
+
+
+def is_transient(error: BaseException) -> bool:
+    # Only failures a later attempt can fix are retried: lost connections,
+    # timeouts, an exhausted pool or a busy inference sidecar. A corrupt PDF or
+    # a missing object fails the same way every time.
+    import psycopg2
+    from minio.error import S3Error
+    from urllib3.exceptions import HTTPError as Urllib3Error
+
+    from services.inference_client import InferenceBusy
+    from utils.db_pool import PoolTimeout
+
+    while error is not None:
+        if isinstance(error, (ConnectionError, TimeoutError, psycopg2.OperationalError,
+                              PoolTimeout, InferenceBusy, Urllib3Error)):
+            return True
+        if isinstance(error, S3Error) and error.code in _TRANSIENT_S3_CODES:
+            return True
+        error = error.__cause__
+    return False
+
+
+def run_ingest_job(
+    ingest: Callable[[str, str, MutableMapping[str, Any]], Dict[str, Any]],
+    workspace: str,
+    filename: str,
+    progress: MutableMapping[str, Any],
+    max_retries: int,
+    retry_backoff: float,
+) -> Dict[str, Any]:
+    # Runs inside the worker (thread or process); all job state lives in the
+    # shared ``progress`` mapping so the queue can report it while it runs.
+    attempt = 0
+    while True:
+        attempt += 1
+        progress.update(state=RUNNING, attempts=attempt,
+                        pages_parsed=0, chunks_embedded=0, chunks_reused=0, rows_written=0)
+        try:
+            return ingest(workspace, filename, progress)
+        except Exception as e:
+            progress["error"] = f"{type(e).__name__}: {e}"
+            if attempt > max_retries or not is_transient(e):
+                raise
+            progress["state"] = RETRYING
+            time.sleep(retry_backoff * 2 ** (attempt - 1))
+
+
+class LocalJobQueue:
+    def __init__(
+        self,
+        worker_backend: str = "thread",
+        max_workers: int = 2,
+        max_retries: int = 2,
+        retry_backoff: float = 2.0,
+        job_ttl: float = 3600,
+        max_jobs: int = 1000,
+        ingest: Callable[[str, str, MutableMapping[str, Any]], Dict[str, Any]] = _default_ingest,
+    ):
+        if worker_backend not in ("thread", "process"):
+            raise ValueError(f"Unknown worker backend '{worker_backend}'")
+        self.worker_backend = worker_backend
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.job_ttl = job_ttl
+        self.max_jobs = max_jobs
+        self._ingest = ingest
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+        self._manager = None
+
+    def _ensure_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.worker_backend == "process":
+                    context = multiprocessing.get_context("spawn")
+                    self._manager = context.Manager()
+                    self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="ingest")
+            return self._executor
+
+    def _new_progress(self) -> MutableMapping[str, Any]:
+        progress = self._manager.dict() if self._manager is not None else {}
+        progress.update(state=QUEUED, attempts=0, error=None,
+                        pages_parsed=0, chunks_embedded=0, chunks_reused=0, rows_written=0)
+        return progress
+
+    def submit(self, workspace: str, filename: str) -> str:
+        executor = self._ensure_executor()
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "workspace": workspace,
+            "filename": filename,
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "result": None,
+            "progress": self._new_progress(),
+        }
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = job
+        future = executor.submit(
+            run_ingest_job, self._ingest, workspace, filename,
+            job["progress"], self.max_retries, self.retry_backoff,
+        )
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job_id
+
+    def submit_many(self, items: List[Dict[str, str]]) -> List[str]:
+        return [self.submit(item["workspace"], item["filename"]) for item in items]
+
+    def _finish(self, job: Dict[str, Any], future: Future) -> None:
+        job["finished_at"] = time.time()
+        try:
+            job["result"] = future.result()
+            job["progress"]["state"] = SUCCEEDED
+            job["progress"]["error"] = None
+            # Process workers notify their own interpreter; repeat it here so
+            # caches living in the API process see the change as well.
+            if self.worker_backend == "process" and not job["result"].get("skipped"):
+                workspace_changed(job["workspace"], job["filename"])
+        except Exception as e:
+            logger.warning("Ingest job %s failed: %s", job["job_id"], e)
+            job["progress"]["state"] = FAILED
+            if not job["progress"].get("error"):
+                job["progress"]["error"] = f"{type(e).__name__}: {e}"
+        # Detach finished jobs from the multiprocessing manager.
+        job["progress"] = dict(job["progress"])
+
+    def _prune(self) -> None:
+        # Caller holds the lock. Finished jobs stay pollable for ``job_ttl``
+        # seconds; beyond ``max_jobs`` the oldest finished ones go first.
+        # Queued and running jobs are never dropped.
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job["finished_at"] is not None]
+        expired = {job["job_id"] for job in finished if now - job["finished_at"] > self.job_ttl}
+        excess = len(self._jobs) - len(expired) - self.max_jobs + 1
+        if excess > 0:
+            remaining = sorted((job for job in finished if job["job_id"] not in expired),
+                               key=lambda job: job["finished_at"])
+            expired.update(job["job_id"] for job in remaining[:excess])
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        progress = dict(job["progress"])
+        return {
+            "job_id": job["job_id"],
+            "workspace": job["workspace"],
+            "filename": job["filename"],
+            "status": progress.pop("state"),
+            "attempts": progress.pop("attempts"),
+            "error": progress.pop("error"),
+            "progress": progress,
+            "result": job["result"],
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+        }
+
+    def list_jobs(self, workspace: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._prune()
+            job_ids = [j["job_id"] for j in self._jobs.values()
+                       if workspace is None or j["workspace"] == workspace]
+        return [job for job in map(self.get, job_ids) if job is not None]
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            manager, self._manager = self._manager, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        if manager is not None:
+            with self._lock:
+                for job in self._jobs.values():
+                    job["progress"] = dict(job["progress"])
+            manager.shutdown()
+
+
+job_queue = LocalJobQueue(
+    worker_backend=settings.INGEST_WORKER_BACKEND,
+    max_workers=settings.INGEST_MAX_WORKERS,
+    max_retries=settings.INGEST_MAX_RETRIES,
+    retry_backoff=settings.INGEST_RETRY_BACKOFF,
+    job_ttl=settings.INGEST_JOB_TTL,
+    max_jobs=settings.INGEST_MAX_JOBS,
+)
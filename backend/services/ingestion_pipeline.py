@@ -0,0 +1,250 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Collection, Dict, Iterable, Iterator, List, MutableMapping, Optional, Tuple
+
+import fitz
+
+from services.chunking_service import MAX_TOKENS, OVERLAP_TOKENS, count_tokens, iter_chunks_stream
+from services.model_registry import get_bi_encoder
+from utils.helpers import fingerprint, report_progress
+
+SKIP_PAGES = 2
+EMBED_BATCH_SIZE = 32
+QUEUE_SIZE = 8
+PAGES_PER_TASK = 16
+
+_DONE = object()
+_worker_document = None
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.started = None
+        self.finished = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "wall_seconds": round(wall, 4),
+            "items_per_sec": round(self.items / wall, 1) if wall > 0 else None,
+        }
+
+
+def _init_page_worker(pdf_bytes: bytes) -> None:
+    global _worker_document
+    _worker_document = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _extract_page_range(page_range: range) -> List[str]:
+    return [_worker_document[i].get_text() for i in page_range]
+
+
+def iter_page_texts(pdf_bytes: bytes, skip_pages: int = SKIP_PAGES, workers: int = 0) -> Iterator[str]:
+    document = fitz.open(stream=pdf_bytes, filetype="pdf")
+    page_count = document.page_count
+    if workers <= 1 or page_count - skip_pages <= PAGES_PER_TASK:
+        try:
+            for page_no in range(skip_pages, page_count):
+                yield document[page_no].get_text()
+        finally:
+            document.close()
+        return
+
+    document.close()
+    ranges = [range(i, min(i + PAGES_PER_TASK, page_count))
+              for i in range(skip_pages, page_count, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_page_worker,
+        initargs=(pdf_bytes,),
+    ) as executor:
+        for texts in executor.map(_extract_page_range, ranges):
+            yield from texts
+
+
+class PdfIngestPipeline:
+    # parse pages -> [page queue] -> chunk + embed -> [batch queue] -> consumer
+    #
+    # Parsing and embedding run on their own threads while the caller consumes
+    # record batches (typically writing them to the database), so the three
+    # phases overlap and the bounded queues cap how much is held in memory.
+    #
+    # Every chunk is fingerprinted before embedding; chunks whose hash is in
+    # ``known_hashes`` (already stored for this file) or repeated earlier in the
+    # document are not embedded again. ``chunk_headers`` maps the hash of every
+    # chunk of the document to its header once the batches are consumed.
+
+    def __init__(
+        self,
+        pdf_bytes: bytes,
+        skip_pages: int = SKIP_PAGES,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+        queue_size: int = QUEUE_SIZE,
+        parse_workers: int = 0,
+        max_tokens: int = MAX_TOKENS,
+        overlap: int = OVERLAP_TOKENS,
+        progress: Optional[MutableMapping[str, int]] = None,
+        known_hashes: Optional[Collection[str]] = None,
+    ):
+        self.pdf_bytes = pdf_bytes
+        self.skip_pages = skip_pages
+        self.embed_batch_size = embed_batch_size
+        self.parse_workers = parse_workers
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.progress = progress
+        self.known_hashes = known_hashes or ()
+        self.chunk_headers: Dict[str, str] = {}
+        self.reused = 0
+        self.stats = {name: StageStats(name) for name in ("parse", "chunk", "embed", "write")}
+        self._pages: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._batches: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+        self._page_wait = 0.0
+
+    def _put(self, q: queue.Queue, item: Any) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _drain(self, q: queue.Queue) -> Iterator[Any]:
+        while True:
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                if self._stop.is_set():
+                    return
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _run_stage(self, stage: StageStats, target: Callable[[], None], downstream: queue.Queue) -> None:
+        stage.started = time.perf_counter()
+        try:
+            target()
+        except BaseException as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            stage.finished = time.perf_counter()
+            self._put(downstream, _DONE)
+
+    def _parse(self) -> None:
+        stage = self.stats["parse"]
+        pages = iter_page_texts(self.pdf_bytes, self.skip_pages, self.parse_workers)
+        try:
+            while True:
+                started = time.perf_counter()
+                text = next(pages, None)
+                stage.busy_seconds += time.perf_counter() - started
+                if text is None:
+                    return
+                stage.items += 1
+                report_progress(self.progress, "pages_parsed")
+                if not self._put(self._pages, text):
+                    return
+        finally:
+            pages.close()
+
+    def _waited_pages(self) -> Iterator[str]:
+        # Pages as the chunker pulls them, keeping track of time spent blocked
+        # on the parser so it is not counted as chunking time.
+        pages = self._drain(self._pages)
+        while True:
+            started = time.perf_counter()
+            text = next(pages, None)
+            self._page_wait += time.perf_counter() - started
+            if text is None:
+                return
+            yield text
+
+    def _new_chunks(self, chunks: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+        for index, body in enumerate(chunks):
+            digest = fingerprint(body)
+            if digest in self.chunk_headers:
+                continue
+            header = f"chunk-{index}"
+            self.chunk_headers[digest] = header
+            if digest in self.known_hashes:
+                self.reused += 1
+                report_progress(self.progress, "chunks_reused")
+                continue
+            yield header, digest, body
+
+    def _embed(self) -> None:
+        stage = self.stats["embed"]
+        chunking = self.stats["chunk"]
+        chunking.started = time.perf_counter()
+        model = get_bi_encoder()
+        chunks = self._new_chunks(
+            iter_chunks_stream(self._waited_pages(), self.max_tokens, self.overlap)
+        )
+        while True:
+            started, waited = time.perf_counter(), self._page_wait
+            batch = list(islice(chunks, self.embed_batch_size))
+            chunking.busy_seconds += time.perf_counter() - started - (self._page_wait - waited)
+            if not batch:
+                chunking.finished = time.perf_counter()
+                return
+            chunking.items += len(batch)
+            started = time.perf_counter()
+            embeddings = model.encode([body for _, _, body in batch], normalize_embeddings=True)
+            stage.busy_seconds += time.perf_counter() - started
+            records = [
+                {"header": header, "body": body, "content_hash": digest,
+                 "token_count": count_tokens(body), "embedding": embedding}
+                for (header, digest, body), embedding in zip(batch, embeddings)
+            ]
+            stage.items += len(records)
+            report_progress(self.progress, "chunks_embedded", len(records))
+            if not self._put(self._batches, records):
+                return
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        threads = [
+            threading.Thread(target=self._run_stage, name="pdf-parse", daemon=True,
+                             args=(self.stats["parse"], self._parse, self._pages)),
+            threading.Thread(target=self._run_stage, name="pdf-embed", daemon=True,
+                             args=(self.stats["embed"], self._embed, self._batches)),
+        ]
+        for thread in threads:
+            thread.start()
+
+        write = self.stats["write"]
+        write.started = time.perf_counter()
+        try:
+            for batch in self._drain(self._batches):
+                started = time.perf_counter()
+                yield batch
+                write.busy_seconds += time.perf_counter() - started
+                write.items += len(batch)
+        finally:
+            write.finished = time.perf_counter()
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        for batch in self.iter_batches():
+            yield from batch
+
+    def stage_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stage.as_dict() for name, stage in self.stats.items()}
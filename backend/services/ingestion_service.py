@@ -0,0 +1,54 @@
+import logging
+from typing import Any, Dict, MutableMapping, Optional
+
+from app.config import settings
+from services.document_store import get_chunk_hashes, get_file_hash, insert_documents, sync_file
+from services.ingestion_pipeline import PdfIngestPipeline
+from services.metrics import observe_stage
+from services.minio_service import download_file_from_minio, ensure_bucket_exists
+from services.vector_index_service import workspace_indexes
+from services.workspace_events import workspace_changed
+from utils.db_pool import db_connection
+from utils.helpers import fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_pdf(
+    workspace: str,
+    filename: str,
+    progress: Optional[MutableMapping[str, int]] = None) -> Dict[str, Any]:
+    # Incremental: an unchanged file (same content hash) is skipped outright,
+    # and for a changed one only chunks that are not stored yet get embedded.
+    bucket = f"workspace-{workspace}"
+    ensure_bucket_exists(bucket)
+    pdf_bytes = download_file_from_minio(bucket, filename)
+    file_hash = fingerprint(pdf_bytes)
+
+    # Queued, not built here: the build waits for open transactions.
+    workspace_indexes.schedule_create(workspace)
+    with db_connection() as conn:
+        if get_file_hash(conn, workspace, filename) == file_hash:
+            logger.info("Skipping %s/%s: content unchanged", workspace, filename)
+            return {"rows": 0, "skipped": True, "content_hash": file_hash}
+
+        pipeline = PdfIngestPipeline(
+            pdf_bytes,
+            embed_batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+            queue_size=settings.INGEST_QUEUE_SIZE,
+            parse_workers=settings.INGEST_PARSE_WORKERS,
+            progress=progress,
+            known_hashes=get_chunk_hashes(conn, workspace, filename),
+        )
+        stats = insert_documents(
+            conn, filename, workspace, pipeline.iter_records(),
+            batch_size=settings.INGEST_EMBED_BATCH_SIZE,
+            progress=progress,
+            finalize=lambda cursor: sync_file(cursor, workspace, filename, file_hash, pipeline.chunk_headers),
+        )
+    workspace_changed(workspace, filename)
+    for stage, metric in (("parse", "pdf_parse"), ("chunk", "chunk"), ("embed", "embed"), ("write", "db_insert")):
+        observe_stage(metric, pipeline.stats[stage].busy_seconds)
+    stats.update(skipped=False, reused=pipeline.reused, content_hash=file_hash)
+    stats["stages"] = pipeline.stage_stats()
+    return stats
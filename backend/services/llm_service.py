@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+LLM_PROVIDERS = ("gemini", "ollama", "stub")
+
+_client: Optional[httpx.AsyncClient] = None
+_providers: Dict[str, "LLMProvider"] = {}
+
+
+class LLMError(Exception):
+    pass
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # One pooled client per process: connections (and their TLS sessions) are
+    # kept alive and reused across requests instead of a handshake per answer.
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class LLMProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def stream(self, prompt: str) -> AsyncIterator[str]:
+        ...
+
+    async def generate(self, prompt: str) -> str:
+        return "".join([token async for token in self.stream(prompt)])
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, model: str = "gemini-2.0-flash"):
+        self.api_key = api_key
+        self.model = model
+
+    def _payload(self, prompt: str) -> dict:
+        return {"contents": [{"parts": [{"text": prompt}]}]}
+
+    @staticmethod
+    def _texts(data: dict) -> str:
+        return "".join(
+            part.get("text", "")
+            for cand in data.get("candidates", [])
+            for part in cand.get("content", {}).get("parts", [])
+        )
+
+    async def generate(self, prompt: str) -> str:
+        try:
+            resp = await get_http_client().post(
+                f"{GEMINI_BASE_URL}/{self.model}:generateContent",
+                params={"key": self.api_key},
+                json=self._payload(prompt),
+            )
+            resp.raise_for_status()
+            return self._texts(resp.json())
+        except httpx.HTTPError as e:
+            raise LLMError(f"Gemini API error: {e}") from e
+        except ValueError as e:
+            raise LLMError(f"Gemini API returned invalid JSON: {e}") from e
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        try:
+            async with get_http_client().stream(
+                "POST",
+                f"{GEMINI_BASE_URL}/{self.model}:streamGenerateContent",
+                params={"key": self.api_key, "alt": "sse"},
+                json=self._payload(prompt),
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    text = self._texts(json.loads(line[len("data:"):]))
+                    if text:
+                        yield text
+        except httpx.HTTPError as e:
+            raise LLMError(f"Gemini API error: {e}") from e
+        except ValueError as e:
+            raise LLMError(f"Gemini API returned invalid JSON: {e}") from e
+
+
+class OllamaProvider(LLMProvider):
+    name = "ollama"
+
+    def __init__(self, host: str, model: str = "phi4-mini", temperature: float = 0.1, max_tokens: int = 512):
+        self.host = host.rstrip("/")
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {"temperature": self.temperature, "num_predict": self.max_tokens},
+        }
+
+    async def generate(self, prompt: str) -> str:
+        try:
+            resp = await get_http_client().post(f"{self.host}/api/generate", json=self._payload(prompt, False))
+            resp.raise_for_status()
+            return resp.json().get("response", "")
+        except httpx.HTTPError as e:
+            raise LLMError(f"Ollama error: {e}") from e
+        except ValueError as e:
+            raise LLMError(f"Ollama returned invalid JSON: {e}") from e
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Ollama streams newline-delimited JSON objects, one per generated piece.
+        try:
+            async with get_http_client().stream(
+                "POST", f"{self.host}/api/generate", json=self._payload(prompt, True)
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise LLMError(f"Ollama error: {data['error']}")
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        return
+        except httpx.HTTPError as e:
+            raise LLMError(f"Ollama error: {e}") from e
+        except ValueError as e:
+            raise LLMError(f"Ollama returned invalid JSON: {e}") from e
+
+
+class StubProvider(LLMProvider):
+    # Offline stand-in for tests and benchmarks: answers with a fixed text
+    # after a configurable time to first token and per-token delay.
+    name = "stub"
+
+    def __init__(self, answer: str = "Nem található", first_token_ms: float = 0.0, token_ms: float = 0.0):
+        self.answer = answer
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, word in enumerate(self.answer.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield word if i == 0 else f" {word}"
+
+
+def request_providers() -> Tuple[str, ...]:
+    # Providers a request may pick. The stub only answers with canned text, so
+    # it is offered only where it is the configured provider or explicitly
+    # enabled for tests and benchmarks (LLM_ALLOW_STUB).
+    if settings.LLM_ALLOW_STUB or settings.LLM_PROVIDER.lower() == "stub":
+        return LLM_PROVIDERS
+    return tuple(name for name in LLM_PROVIDERS if name != "stub")
+
+
+def get_provider(name: Optional[str] = None) -> LLMProvider:
+    name = (name or settings.LLM_PROVIDER).lower()
+    if name not in _providers:
+        if name == "gemini":
+            _providers[name] = GeminiProvider(settings.GEMINI_API_KEY, settings.GEMINI_MODEL)
+        elif name == "ollama":
+            _providers[name] = OllamaProvider(settings.OLLAMA_HOST, settings.OLLAMA_MODEL)
+        elif name == "stub":
+            _providers[name] = StubProvider(first_token_ms=settings.LLM_STUB_FIRST_TOKEN_MS,
+                                            token_ms=settings.LLM_STUB_TOKEN_MS)
+        else:
+            raise ValueError(f"Unknown LLM provider '{name}'")
+    return _providers[name]
+
+
+def register_provider(provider: LLMProvider) -> None:
+    _providers[provider.name] = provider
@@ -1,5 +1,7 @@
-import io
+from typing import BinaryIO, Iterable, List
 from minio import Minio
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
 from app.config import settings
 
 _client = Minio(
@@ -14,8 +16,20 @@ def ensure_bucket_exists(bucket: str):
         _client.make_bucket(bucket)
 
 
-def upload_file(bucket: str, object_name: str, data: bytes, content_type: str):
-    _client.put_object(bucket, object_name, io.BytesIO(data), len(data), content_type)
+def upload_stream(bucket: str, object_name: str, stream: BinaryIO, content_type: str):
+    # Unknown length: the client reads one part at a time and sends it as a
+    # multipart upload, so memory stays at about UPLOAD_PART_SIZE per upload.
+    # Sequential parts, because parallel uploads queue parts without a bound.
+    _client.put_object(
+        bucket, object_name, stream, -1, content_type,
+        part_size=settings.UPLOAD_PART_SIZE, num_parallel_uploads=1,
+    )
+
+def remove_objects(bucket: str, object_names: Iterable[str]) -> List[str]:
+    # Multi-object delete: the client sends up to 1000 keys per request. The
+    # result iterator is lazy and nothing is deleted until it is consumed.
+    errors = _client.remove_objects(bucket, (DeleteObject(name) for name in object_names))
+    return [f"{error.name}: {error.message}" for error in errors]
 
 def download_file_from_minio(bucket: str, object_name: str) -> bytes:
     response = _client.get_object(bucket, object_name)
@@ -34,13 +48,26 @@ def delete_pdf(bucket: str, object_name: str) -> bool:
     if not _client.bucket_exists(bucket):
         return False
 
-    objs = [o for o in _client.list_objects(bucket, prefix=object_name) 
-            if o.object_name == object_name]
-    if not objs:
-        return False
+    try:
+        _client.stat_object(bucket, object_name)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return False
+        raise
     _client.remove_object(bucket, object_name)
     return True
 
+def delete_pdfs(bucket: str, object_names: List[str]) -> List[str]:
+    # Returns the names that were removed; missing objects are skipped.
+    if not _client.bucket_exists(bucket):
+        return []
+    existing = set(list_pdfs(bucket))
+    found = [name for name in object_names if name in existing]
+    errors = remove_objects(bucket, found)
+    if errors:
+        raise RuntimeError(f"Could not delete from {bucket}: {'; '.join(errors)}")
+    return found
+
 def list_buckets():
     return [bucket.name for bucket in _client.list_buckets()]
 
@@ -55,8 +82,9 @@ def delete_bucket_and_contents(bucket: str) -> bool:
         return False
 
     objects_iter = _client.list_objects(bucket, recursive=True)
-    for obj in objects_iter:
-        _client.remove_object(bucket, obj.object_name)
+    errors = remove_objects(bucket, (obj.object_name for obj in objects_iter))
+    if errors:
+        raise RuntimeError(f"Could not empty bucket {bucket}: {'; '.join(errors)}")
 
     _client.remove_bucket(bucket)
     return True
\ No newline at end of file
@@ -0,0 +1,165 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BI_ENCODER_NAME = "paraphrase-multilingual-mpnet-base-v2"
+CROSS_ENCODER_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+_models: Dict[str, Any] = {}
+_lock = threading.Lock()
+_warmup: Dict[str, Any] = {
+    "state": "not_started",
+    "seconds": None,
+    "rss_mb_before": None,
+    "rss_mb_after": None,
+    "error": None,
+    "backend": None,
+    "onnx_check": None,
+    "sidecar": None,
+}
+
+
+def resident_memory_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load(name: str, factory: Callable[[], Any]) -> Any:
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _lock:
+        if name not in _models:
+            _models[name] = factory()
+        return _models[name]
+
+
+def _torch_bi_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(BI_ENCODER_NAME)
+
+
+def _torch_cross_encoder():
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(CROSS_ENCODER_NAME)
+
+
+def _use_onnx() -> bool:
+    return settings.INFERENCE_BACKEND == "onnx"
+
+
+def _use_sidecar() -> bool:
+    return settings.INFERENCE_MODE == "sidecar"
+
+
+def get_bi_encoder():
+    def factory():
+        if _use_sidecar():
+            from services.inference_client import RemoteBiEncoder
+            return RemoteBiEncoder()
+        if _use_onnx():
+            from services.onnx_backend import load_bi_encoder
+            return load_bi_encoder()
+        return _torch_bi_encoder()
+    return _load(BI_ENCODER_NAME, factory)
+
+
+def get_cross_encoder():
+    def factory():
+        if _use_sidecar():
+            from services.inference_client import RemoteCrossEncoder
+            return RemoteCrossEncoder()
+        if _use_onnx():
+            from services.onnx_backend import load_cross_encoder
+            return load_cross_encoder()
+        return _torch_cross_encoder()
+    return _load(CROSS_ENCODER_NAME, factory)
+
+
+def get_fast_cross_encoder():
+    # Optional first cascade stage (CASCADE_FAST_RERANKER); always PyTorch.
+    def factory():
+        if _use_sidecar():
+            from services.inference_client import RemoteCrossEncoder
+            return RemoteCrossEncoder("fast")
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(settings.CASCADE_FAST_RERANKER)
+    return _load(settings.CASCADE_FAST_RERANKER, factory)
+
+
+def _check_onnx() -> None:
+    # Quantization can drift too far for some models; rather than serve worse
+    # rankings, fall back to PyTorch unless scripts/export_onnx.py recorded a
+    # passing tolerance check for this variant.
+    from services.onnx_backend import read_verify_report, within_tolerance
+
+    report = read_verify_report()
+    _warmup["onnx_check"] = report
+    if report is not None and within_tolerance(report):
+        logger.info("ONNX backend within tolerance: %s", report)
+        return
+    if report is None:
+        logger.error("No ONNX verification report for variant %s, falling back to PyTorch", settings.ONNX_VARIANT)
+    else:
+        logger.error("ONNX backend outside tolerance, falling back to PyTorch: %s", report)
+    reference_bi, reference_cross = _torch_bi_encoder(), _torch_cross_encoder()
+    with _lock:
+        _models[BI_ENCODER_NAME] = reference_bi
+        _models[CROSS_ENCODER_NAME] = reference_cross
+    _warmup["backend"] = "torch"
+
+
+def warm_up() -> Dict[str, Any]:
+    _warmup.update(state="warming", rss_mb_before=round(resident_memory_mb(), 1))
+    started = time.perf_counter()
+    _warmup["backend"] = "sidecar" if _use_sidecar() else settings.INFERENCE_BACKEND
+    try:
+        get_bi_encoder()
+        get_cross_encoder()
+        if _use_sidecar():
+            from services.inference_client import get_inference_client
+            _warmup["sidecar"] = get_inference_client().wait_ready(settings.INFERENCE_SIDECAR_WAIT)
+        elif _use_onnx() and settings.ONNX_VERIFY:
+            _check_onnx()
+    except Exception as e:
+        _warmup.update(state="failed", error=str(e))
+        raise
+    finally:
+        _warmup.update(
+            seconds=round(time.perf_counter() - started, 3),
+            rss_mb_after=round(resident_memory_mb(), 1),
+        )
+    _warmup["state"] = "ready"
+    return readiness()
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, Any]:
+    return {
+        **_warmup,
+        "loaded_models": sorted(_models),
+        "rss_mb": round(resident_memory_mb(), 1),
+    }
+
+
+def is_ready(warmup_enabled: bool) -> bool:
+    if not warmup_enabled:
+        return _warmup["state"] != "failed"
+    return _warmup["state"] == "ready"
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import platform
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# CPU inference backend: both models exported to ONNX and dynamically
+# quantized to int8 (weights int8, activations quantized at run time), run
+# through onnxruntime. The classes mirror the parts of the SentenceTransformer
+# / CrossEncoder API the rest of the code uses (``encode`` and ``predict``).
+#
+# Layout of ONNX_MODEL_DIR:
+#   sapirag_onnx.json                  export metadata
+#   sapirag_onnx_verify.json           tolerance check against PyTorch, per variant
+#   bi_encoder/{fp32,int8}/            model.onnx | model_quantized.onnx + tokenizer
+#   cross_encoder/{fp32,int8}/
+
+META_FILE = "sapirag_onnx.json"
+VERIFY_FILE = "sapirag_onnx_verify.json"
+VARIANTS = ("int8", "fp32")
+_MODEL_FILES = {"fp32": "model.onnx", "int8": "model_quantized.onnx"}
+
+VERIFY_QUERIES = [
+    "Mikor van a záróvizsga jelentkezési határideje?",
+    "Hány kredit szükséges a diplomához?",
+    "Care este taxa de cămin pentru studenți?",
+    "How do I apply for a scholarship?",
+]
+VERIFY_PASSAGES = [
+    "A záróvizsgára a félév tizedik hetéig lehet jelentkezni a tanulmányi osztályon.",
+    "A diploma megszerzéséhez 180 kredit teljesítése szükséges, ebből 10 kredit szakmai gyakorlat.",
+    "Taxa de cămin este de 150 de lei pe lună și se achită până la data de 15.",
+    "Scholarship applications are submitted online before the end of the second week of the semester.",
+    "A kollégiumi férőhelyekre a nyári szünetben lehet pályázni.",
+    "Examenele restante se susțin în sesiunea de toamnă.",
+    "The library is open from 8 am to 8 pm on weekdays.",
+    "Az ösztöndíj összege a tanulmányi átlagtól függ.",
+]
+
+
+def _hub_id(name: str) -> str:
+    return name if "/" in name else f"sentence-transformers/{name}"
+
+
+def quantization_target() -> str:
+    # Picks the optimum quantization preset for this CPU unless configured.
+    if settings.ONNX_QUANTIZATION:
+        return settings.ONNX_QUANTIZATION
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            flags = cpuinfo.read()
+    except OSError:
+        flags = ""
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+
+def export_models(output_dir: str, quantization: Optional[str] = None) -> Dict[str, Any]:
+    # Export needs the heavy toolchain (optimum, torch); serving only needs
+    # onnxruntime and the tokenizers.
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTModelForSequenceClassification, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoTokenizer
+
+    from services.model_registry import BI_ENCODER_NAME, CROSS_ENCODER_NAME
+
+    target = quantization or quantization_target()
+    models = (
+        ("bi_encoder", _hub_id(BI_ENCODER_NAME), ORTModelForFeatureExtraction),
+        ("cross_encoder", CROSS_ENCODER_NAME, ORTModelForSequenceClassification),
+    )
+    for kind, name, model_cls in models:
+        fp32_dir = os.path.join(output_dir, kind, "fp32")
+        int8_dir = os.path.join(output_dir, kind, "int8")
+        logger.info("Exporting %s to %s", name, fp32_dir)
+        model_cls.from_pretrained(name, export=True).save_pretrained(fp32_dir)
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        tokenizer.save_pretrained(fp32_dir)
+
+        logger.info("Quantizing %s (%s, dynamic int8)", name, target)
+        config = getattr(AutoQuantizationConfig, target)(is_static=False, per_channel=False)
+        ORTQuantizer.from_pretrained(fp32_dir).quantize(save_dir=int8_dir, quantization_config=config)
+        tokenizer.save_pretrained(int8_dir)
+
+    meta = {
+        "bi_encoder": {
+            "model": BI_ENCODER_NAME,
+            "max_seq_length": SentenceTransformer(BI_ENCODER_NAME, device="cpu").max_seq_length,
+            "pooling": "mean",
+        },
+        "cross_encoder": {"model": CROSS_ENCODER_NAME, "max_length": 512, "activation": "sigmoid"},
+        "quantization": target,
+    }
+    with open(os.path.join(output_dir, META_FILE), "w") as out:
+        json.dump(meta, out, indent=2)
+    return meta
+
+
+def _read_meta(model_dir: str) -> Dict[str, Any]:
+    path = os.path.join(model_dir, META_FILE)
+    if not os.path.exists(path):
+        if not settings.ONNX_EXPORT_IF_MISSING:
+            raise FileNotFoundError(f"No exported ONNX models in {model_dir}; run scripts/export_onnx.py")
+        logger.warning("No exported ONNX models in %s; exporting now", model_dir)
+        meta = export_models(model_dir)
+        verify_export(model_dir)
+        return meta
+    with open(path) as meta:
+        return json.load(meta)
+
+
+def _session(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    if settings.ONNX_INTRA_OP_THREADS:
+        options.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class _OnnxModel:
+    def __init__(self, model_dir: str, max_length: int, batch_size: int = 32):
+        from transformers import AutoTokenizer
+
+        variant = os.path.basename(os.path.normpath(model_dir))
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = _session(os.path.join(model_dir, _MODEL_FILES[variant]))
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def _run(self, *texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = self.tokenizer(
+            *texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self._inputs}
+        return self.session.run(None, feeds)[0], encoded["attention_mask"]
+
+    def _batches(self, lengths: Sequence[int], batch_size: Optional[int]) -> List[np.ndarray]:
+        # Longest first, like sentence-transformers: similar lengths share a
+        # batch so little compute is spent on padding.
+        size = batch_size or self.batch_size
+        order = np.argsort([-length for length in lengths], kind="stable")
+        return [order[i:i + size] for i in range(0, len(order), size)]
+
+
+class OnnxBiEncoder(_OnnxModel):
+    def __init__(self, model_dir: str, max_length: int, batch_size: int = 32):
+        super().__init__(model_dir, max_length, batch_size)
+        self.dim = int(self._run(["dim"])[0].shape[-1])
+
+    def encode(
+        self,
+        texts: Union[str, Sequence[str]],
+        batch_size: Optional[int] = None,
+        normalize_embeddings: bool = False,
+        **_,
+    ) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for batch in self._batches([len(t) for t in texts], batch_size):
+            hidden, mask = self._run([texts[i] for i in batch])
+            mask = mask[..., None].astype(np.float32)
+            embeddings[batch] = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: Optional[int] = None, **_) -> np.ndarray:
+        pairs = list(pairs)
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for batch in self._batches([len(q) + len(p) for q, p in pairs], batch_size):
+            logits, _ = self._run([pairs[i][0] for i in batch], [pairs[i][1] for i in batch])
+            scores[batch] = logits[:, 0]
+        # CrossEncoder.predict applies a sigmoid to single-label models.
+        return 1 / (1 + np.exp(-scores))
+
+
+def _variant_dir(model_dir: str, kind: str, variant: Optional[str] = None) -> str:
+    variant = variant or settings.ONNX_VARIANT
+    if variant not in VARIANTS:
+        raise ValueError(f"Unknown ONNX variant '{variant}'")
+    return os.path.join(model_dir, kind, variant)
+
+
+def load_bi_encoder(model_dir: Optional[str] = None, variant: Optional[str] = None) -> OnnxBiEncoder:
+    model_dir = model_dir or settings.ONNX_MODEL_DIR
+    meta = _read_meta(model_dir)
+    return OnnxBiEncoder(_variant_dir(model_dir, "bi_encoder", variant), meta["bi_encoder"]["max_seq_length"])
+
+
+def load_cross_encoder(model_dir: Optional[str] = None, variant: Optional[str] = None) -> OnnxCrossEncoder:
+    model_dir = model_dir or settings.ONNX_MODEL_DIR
+    meta = _read_meta(model_dir)
+    return OnnxCrossEncoder(_variant_dir(model_dir, "cross_encoder", variant), meta["cross_encoder"]["max_length"])
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values), dtype=np.float64)
+    ranks[np.argsort(values)] = np.arange(len(values))
+    return ranks
+
+
+def verify_backend(bi_encoder: Any, cross_encoder: Any, reference_bi: Any, reference_cross: Any) -> Dict[str, Any]:
+    # Compares the ONNX models against the PyTorch ones on a fixed multilingual
+    # sample: cosine between embeddings, and per query the Spearman correlation
+    # and top-1 agreement of the rerank ordering.
+    texts = VERIFY_QUERIES + VERIFY_PASSAGES
+    ours = np.asarray(bi_encoder.encode(texts, normalize_embeddings=True))
+    reference = np.asarray(reference_bi.encode(texts, normalize_embeddings=True))
+    cosines = (ours * reference).sum(axis=1)
+
+    correlations, top1 = [], []
+    for query in VERIFY_QUERIES:
+        pairs = [(query, passage) for passage in VERIFY_PASSAGES]
+        a = np.asarray(cross_encoder.predict(pairs), dtype=np.float64)
+        b = np.asarray(reference_cross.predict(pairs), dtype=np.float64)
+        correlations.append(float(np.corrcoef(_ranks(a), _ranks(b))[0, 1]))
+        top1.append(int(np.argmax(a) == np.argmax(b)))
+
+    report = {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_rank_correlation": round(min(correlations), 4),
+        "top1_agreement": round(sum(top1) / len(top1), 4),
+        "thresholds": {
+            "min_cosine": settings.ONNX_MIN_COSINE,
+            "min_rank_correlation": settings.ONNX_MIN_RANK_CORRELATION,
+        },
+    }
+    report["passed"] = within_tolerance(report)
+    return report
+
+
+def within_tolerance(report: Dict[str, Any]) -> bool:
+    return (
+        report["min_cosine"] >= settings.ONNX_MIN_COSINE
+        and report["min_rank_correlation"] >= settings.ONNX_MIN_RANK_CORRELATION
+    )
+
+
+def verify_export(output_dir: str) -> Dict[str, Any]:
+    # Runs the tolerance check once per variant at export time, when PyTorch is
+    # already installed and loaded, and stores it next to the models so the API
+    # only reads the result at startup.
+    from services.model_registry import _torch_bi_encoder, _torch_cross_encoder
+
+    reference_bi, reference_cross = _torch_bi_encoder(), _torch_cross_encoder()
+    reports = {
+        variant: verify_backend(
+            load_bi_encoder(output_dir, variant),
+            load_cross_encoder(output_dir, variant),
+            reference_bi,
+            reference_cross,
+        )
+        for variant in VARIANTS
+    }
+    with open(os.path.join(output_dir, VERIFY_FILE), "w") as out:
+        json.dump(reports, out, indent=2)
+    return reports
+
+
+def read_verify_report(model_dir: Optional[str] = None, variant: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    path = os.path.join(model_dir or settings.ONNX_MODEL_DIR, VERIFY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as reports:
+        return json.load(reports).get(variant or settings.ONNX_VARIANT)
@@ -0,0 +1,63 @@
+import logging
+import os
+import random
+import re
+import time
+from typing import Any, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SlowRequestProfiler:
+    # Optional sampling profiler around HTTP requests. A sampled fraction of
+    # requests runs under pyinstrument (statistical, async-aware); the report
+    # is written only when the request turned out slower than the threshold.
+    # pyinstrument is an optional dependency; without it the hook stays off.
+
+    def __init__(self, threshold_ms: float, sample_rate: float, output_dir: str, interval_ms: float = 1.0):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.interval = interval_ms / 1000
+        self.enabled = threshold_ms > 0 and sample_rate > 0
+        self._profiler_cls = None
+        if self.enabled:
+            try:
+                from pyinstrument import Profiler
+                self._profiler_cls = Profiler
+            except ImportError:
+                logger.warning("PROFILE_SLOW_REQUEST_MS is set but pyinstrument is not installed")
+                self.enabled = False
+
+    def start(self) -> Optional[Any]:
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        profiler = self._profiler_cls(interval=self.interval, async_mode="enabled")
+        try:
+            profiler.start()
+        except RuntimeError:
+            # Only one profiler can run per thread; overlapping requests are skipped.
+            return None
+        return profiler
+
+    def finish(self, profiler: Optional[Any], label: str, seconds: float) -> None:
+        if profiler is None:
+            return
+        profiler.stop()
+        if seconds < self.threshold:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{seconds * 1000:.0f}ms.txt")
+        with open(path, "w") as out:
+            out.write(profiler.output_text(unicode=True))
+        logger.warning("Slow request %s took %.0f ms; profile written to %s", label, seconds * 1000, path)
+
+
+slow_request_profiler = SlowRequestProfiler(
+    threshold_ms=settings.PROFILE_SLOW_REQUEST_MS,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    output_dir=settings.PROFILE_OUTPUT_DIR,
+)
@@ -1,152 +1,451 @@
-from typing import Any, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
 from psycopg2.extensions import connection as PGConnection
-from sentence_transformers import CrossEncoder
-from utils.helpers import extract_terms ,encode_text ,build_ts_query
+from app.config import settings
+from services.cascade_rerank import cascade_rerank, cascade_rerank_many
+from services.metrics import stage_timer
+from services.vector_index_service import apply_search_settings, vector_candidates
+from services.workspace_vectors import workspace_vectors
+from utils.helpers import extract_terms ,encode_text ,encode_texts ,build_ts_query
+
+
+def _scope(workspace: str, filename: Optional[str]) -> Tuple[str, Tuple[Any, ...]]:
+    if filename:
+        return "workspace = %s AND filename = %s", (workspace, filename)
+    return "workspace = %s", (workspace,)
+
+
+KEYWORD_MODES = ("prefix", "plain", "websearch", "or")
+
+
+def _keyword_match(
+    query: str,
+    mode: str = "prefix",
+    min_match: int = 1,
+) -> Optional[Tuple[str, Tuple[Any, ...], str, Tuple[Any, ...]]]:
+    # Returns the tsquery expression and an extra filter (with their params),
+    # both written against the stored ``tsv`` column.
+    if mode == "plain":
+        return "plainto_tsquery('hungarian', immutable_unaccent(%s))", (query,), "", ()
+    if mode == "websearch":
+        return "websearch_to_tsquery('hungarian', immutable_unaccent(%s))", (query,), "", ()
+
+    terms = extract_terms(query)
+    if not terms:
+        return None
+    if mode == "prefix":
+        return "to_tsquery('hungarian', immutable_unaccent(%s))", (build_ts_query(terms),), "", ()
+    if mode == "or":
+        tsq = "to_tsquery('hungarian', immutable_unaccent(%s))", (build_ts_query(terms, "or"),)
+        if min_match <= 1:
+            return (*tsq, "", ())
+        extra = (
+            " AND (SELECT count(*) FROM unnest(%s::text[]) AS term"
+            "      WHERE tsv @@ plainto_tsquery('hungarian', immutable_unaccent(term))) >= %s"
+        )
+        return (*tsq, extra, (terms, min_match))
+    raise ValueError(f"Unknown keyword mode '{mode}'")
 
-reranker = CrossEncoder("cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
 
 def keyword_search(
         conn: PGConnection,
         query: str,
         workspace: str,
-        filename: str,
-        top_k: int = 10
+        filename: Optional[str] = None,
+        top_k: int = 10,
+        mode: str = "prefix",
+        min_match: int = 1,
 ) -> List[Tuple[str, str, str, float]]:
-    terms = extract_terms(query)
-    ts_query = build_ts_query(terms)
-    if not ts_query:
+    match = _keyword_match(query, mode, min_match)
+    if match is None:
         return []
+    tsq_sql, tsq_params, extra_sql, extra_params = match
+    scope_sql, scope_params = _scope(workspace, filename)
     sql = (
-        "SELECT header, body, filename,"
-        " ts_rank_cd("
-        "   to_tsvector('hungarian', unaccent(header || ' ' || body)),"
-        "   to_tsquery('hungarian', %s)"
-        " ) AS rank"
+        f"SELECT header, body, filename, ts_rank_cd(tsv, {tsq_sql}) AS rank"
         " FROM documents"
-        " WHERE filename = %s AND workspace= %s"
-        "   AND to_tsvector('hungarian', unaccent(header || ' ' || body))"
-        "       @@ to_tsquery('hungarian', %s)"
+        f" WHERE {scope_sql}"
+        f"   AND tsv @@ {tsq_sql}"
+        f"{extra_sql}"
         " ORDER BY rank DESC"
         " LIMIT %s;"
     )
-    params = (ts_query, filename, workspace, ts_query, top_k)
-    return _execute_query(conn, sql, params)
+    params = (*tsq_params, *scope_params, *tsq_params, *extra_params, top_k)
+    return _execute_query(conn, sql, params, stage="sql_keyword")
 
 
 def embedding_search(
     conn: PGConnection,
     query: str,
     workspace: str,
-    filename: str,
-    top_k: int = 10 
-) -> List[Tuple[str, str, str, float]]: 
-    q_emb = encode_text(query)
+    filename: Optional[str] = None,
+    top_k: int = 10,
+    ef_search: Optional[int] = None,
+    q_emb: Optional[np.ndarray] = None,
+) -> List[Tuple[str, str, str, float]]:
+    # Endpoints pass q_emb, encoded before a connection is taken, so the
+    # connection is not held while the model runs.
+    if q_emb is None:
+        q_emb = encode_text(query)
+    if workspace_vectors.enabled:
+        with stage_timer("hot_index"):
+            rows = workspace_vectors.search(conn, q_emb, workspace, filename, top_k)
+        if rows is not None:
+            return rows
+    scope_sql, scope_params = _scope(workspace, filename)
+    vec_sql, params, candidates = vector_candidates(q_emb, scope_sql, scope_params, top_k)
+    sql = f"SELECT header, body, filename, score FROM ({vec_sql}) AS vec;"
+    return _execute_query(conn, sql, params, hnsw=True, ef_search=ef_search, candidates=candidates,
+                          stage="sql_vector")
+
+def _group_by_query(rows: List[Tuple[Any, ...]], n_queries: int) -> List[List[Tuple[Any, ...]]]:
+    # Rows of the batched statements start with the query's position.
+    grouped: List[List[Tuple[Any, ...]]] = [[] for _ in range(n_queries)]
+    for qid, *row in rows:
+        grouped[qid].append(tuple(row))
+    return grouped
+
+
+def embedding_search_batch(
+    conn: PGConnection,
+    queries: List[str],
+    workspace: str,
+    filename: Optional[str] = None,
+    top_k: int = 10,
+    ef_search: Optional[int] = None,
+    q_embs: Optional[List[np.ndarray]] = None,
+) -> List[List[Tuple[str, str, str, float]]]:
+    # One encode call and one statement for all queries: the query vectors are
+    # a VALUES list and each one drives its own index scan through LATERAL.
+    if not queries:
+        return []
+    if q_embs is None:
+        q_embs = encode_texts(queries)
+    scope_sql, scope_params = _scope(workspace, filename)
+    vec_sql, vec_params, candidates = vector_candidates(None, scope_sql, scope_params, top_k, vector_sql="q.emb")
+    values = ", ".join(["(%s, %s::vector)"] * len(queries))
     sql = (
-        "SELECT header, body, filename,"
-        " 1 - (embedding <=> %s::vector) AS score"
-        " FROM documents"
-        " WHERE filename = %s AND workspace= %s"
-        " ORDER BY score DESC"
-        " LIMIT %s;"
+        "SELECT q.qid, vec.header, vec.body, vec.filename, vec.score"
+        f" FROM (VALUES {values}) AS q(qid, emb)"
+        f" CROSS JOIN LATERAL ({vec_sql}) AS vec"
+        " ORDER BY q.qid, vec.score DESC;"
     )
-    params = (q_emb, filename, workspace, top_k)
-    return _execute_query(conn, sql, params) 
+    params = (*(value for qid, emb in enumerate(q_embs) for value in (qid, emb)), *vec_params)
+    rows = _execute_query(conn, sql, params, hnsw=True, ef_search=ef_search, candidates=candidates,
+                          stage="sql_vector")
+    return _group_by_query(rows, len(queries))
 
-def hybrid_search(
+
+def keyword_search_workspace(
     conn: PGConnection,
     query: str,
     workspace: str,
-    filename: str,
-    top_k: int = 15
-) -> List[Tuple[str, str,str, float]]:
-    vec_results = embedding_search(conn, query, workspace, filename , top_k)
-    kw_results = keyword_search(conn, query,  workspace, filename, top_k)
+    top_k: int = 10,
+    mode: str = "prefix",
+    min_match: int = 1,
+) -> List[Tuple[str, str, str, float]]:
+    return keyword_search(conn, query, workspace, None, top_k, mode, min_match)
 
-    candidates = { (h, b, f): score for h, b, f, score in vec_results + kw_results }
 
-    texts = [f"{h}\n{b}" for (h, b, f) in candidates.keys()]
-    rerank_scores = reranker.predict([(query, t) for t in texts])
+def embedding_search_workspace(
+    conn: PGConnection,
+    query: str,
+    workspace: str,
+    top_k: int = 10,
+    ef_search: Optional[int] = None,
+    q_emb: Optional[np.ndarray] = None,
+) -> List[Tuple[str, str, str, float]]:
+    return embedding_search(conn, query, workspace, None, top_k, ef_search, q_emb)
 
-    combined = list(zip(candidates.items(), rerank_scores))
-    combined.sort(key=lambda x: x[1], reverse=True)
 
-    return [ (h, b, f, float(score))
-             for ((h, b, f), _), score in combined[:top_k] ]
+FUSION_MODES = ("rerank", "rrf", "weighted")
+RRF_K = 60
 
 
-def keyword_search_workspace(
+def hybrid_candidates(
     conn: PGConnection,
     query: str,
     workspace: str,
-    top_k: int = 10 
-) -> List[Tuple[str, str, float]]:
-    terms = extract_terms(query) 
-    ts_query = build_ts_query(terms) 
-    if not ts_query:
-        return []
-
-    sql = (
-        "SELECT header, body, filename,"
-        " ts_rank_cd("
-        "   to_tsvector('hungarian', unaccent(header || ' ' || body)),"
-        "   to_tsquery('hungarian', %s)"
-        " ) AS rank"
-        " FROM documents"
-        " WHERE workspace = %s"
-        "   AND to_tsvector('hungarian', unaccent(header || ' ' || body))"
-        "       @@ to_tsquery('hungarian', %s)"
-        " ORDER BY rank DESC"
-        " LIMIT %s;"
+    filename: Optional[str],
+    limit: int,
+    ef_search: Optional[int] = None,
+    q_emb: Optional[np.ndarray] = None,
+) -> List[Tuple[int, str, str, str, str, float, int]]:
+    # Both candidate sets come back from a single statement; each branch keeps
+    # its own score and its rank within that branch. Fusion and reranking
+    # (fuse_candidates) need no connection.
+    if q_emb is None:
+        q_emb = encode_text(query)
+    scope_sql, scope_params = _scope(workspace, filename)
+    vec_sql, params, candidates = vector_candidates(q_emb, scope_sql, scope_params, limit)
+    sql = f"WITH vec AS ({vec_sql})"
+    select = (
+        " SELECT id, header, body, filename, 'vector' AS source, score,"
+        "  row_number() OVER (ORDER BY score DESC) AS rnk FROM vec"
     )
-    params = (ts_query, workspace, ts_query, top_k)
-    return _execute_query(conn, sql, params)
 
+    match = _keyword_match(query)
+    if match is not None:
+        tsq_sql, tsq_params, _, _ = match
+        sql += (
+            ", kw AS ("
+            f" SELECT id, header, body, filename, ts_rank_cd(tsv, {tsq_sql}) AS score"
+            "  FROM documents"
+            f" WHERE {scope_sql}"
+            f"   AND tsv @@ {tsq_sql}"
+            "  ORDER BY score DESC"
+            "  LIMIT %s"
+            ")"
+        )
+        params += (*tsq_params, *scope_params, *tsq_params, limit)
+        select += (
+            " UNION ALL"
+            " SELECT id, header, body, filename, 'keyword' AS source, score,"
+            "  row_number() OVER (ORDER BY score DESC) AS rnk FROM kw"
+        )
+    return _execute_query(conn, sql + select + ";", params, hnsw=True, ef_search=ef_search,
+                          candidates=candidates, stage="sql_hybrid")
 
-def embedding_search_workspace(
+
+def hybrid_candidates_batch(
     conn: PGConnection,
-    query: str,
+    queries: List[str],
     workspace: str,
-    top_k: int = 10
-) -> List[Tuple[str, str, float]]:
-    q_emb = encode_text(query)
+    filename: Optional[str],
+    limit: int,
+    ef_search: Optional[int] = None,
+    q_embs: Optional[List[np.ndarray]] = None,
+) -> List[List[Tuple[int, str, str, str, str, float, int]]]:
+    # Same candidate sets as hybrid_candidates, for all queries in one
+    # statement. Queries without terms get a NULL tsquery and no keyword rows.
+    if q_embs is None:
+        q_embs = encode_texts(queries)
+    scope_sql, scope_params = _scope(workspace, filename)
+    vec_sql, vec_params, candidates = vector_candidates(None, scope_sql, scope_params, limit, vector_sql="q.emb")
+    values = ", ".join(["(%s, %s::vector, to_tsquery('hungarian', immutable_unaccent(%s)))"] * len(queries))
+    values_params: List[Any] = []
+    for qid, (query, q_emb) in enumerate(zip(queries, q_embs)):
+        terms = extract_terms(query)
+        values_params += [qid, q_emb, build_ts_query(terms) if terms else None]
     sql = (
-        "SELECT header, body, filename,"
-        " 1 - (embedding <=> %s::vector) AS score"
-        " FROM documents"
-        " WHERE workspace = %s"
-        " ORDER BY score DESC"
-        " LIMIT %s;"
+        f"WITH q(qid, emb, tsq) AS (VALUES {values})"
+        " SELECT q.qid, vec.id, vec.header, vec.body, vec.filename, 'vector' AS source, vec.score,"
+        "  row_number() OVER (PARTITION BY q.qid ORDER BY vec.score DESC) AS rnk"
+        f" FROM q CROSS JOIN LATERAL ({vec_sql}) AS vec"
+        " UNION ALL"
+        " SELECT q.qid, kw.id, kw.header, kw.body, kw.filename, 'keyword' AS source, kw.score,"
+        "  row_number() OVER (PARTITION BY q.qid ORDER BY kw.score DESC) AS rnk"
+        " FROM q CROSS JOIN LATERAL ("
+        "  SELECT id, header, body, filename, ts_rank_cd(tsv, q.tsq) AS score"
+        "  FROM documents"
+        f" WHERE {scope_sql}"
+        "    AND tsv @@ q.tsq"
+        "  ORDER BY score DESC"
+        "  LIMIT %s"
+        " ) AS kw;"
     )
-    params = (q_emb, workspace, top_k)
-    return _execute_query(conn, sql, params)
+    params = (*values_params, *vec_params, *scope_params, limit)
+    rows = _execute_query(conn, sql, params, hnsw=True, ef_search=ef_search, candidates=candidates,
+                          stage="sql_hybrid")
+    return _group_by_query(rows, len(queries))
 
 
-def hybrid_search_workspace(
+def _min_max(scores: Dict[int, float]) -> Dict[int, float]:
+    if not scores:
+        return {}
+    low, high = min(scores.values()), max(scores.values())
+    if high == low:
+        return {key: 1.0 for key in scores}
+    return {key: (value - low) / (high - low) for key, value in scores.items()}
+
+
+def _collect(
+    rows: List[Tuple[int, str, str, str, str, float, int]],
+) -> Tuple[Dict[int, Tuple[str, str, str]], Dict[str, Dict[int, Tuple[float, int]]]]:
+    docs: Dict[int, Tuple[str, str, str]] = {}
+    by_source: Dict[str, Dict[int, Tuple[float, int]]] = {"vector": {}, "keyword": {}}
+    for doc_id, header, body, filename, source, score, rnk in rows:
+        docs[doc_id] = (header, body, filename)
+        by_source[source][doc_id] = (float(score), int(rnk))
+    return docs, by_source
+
+
+def fuse_candidates(
+    query: str,
+    rows: List[Tuple[int, str, str, str, str, float, int]],
+    fusion: str = "rerank",
+    vector_weight: float = 0.5,
+    rerank_depth: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    started: Optional[float] = None,
+) -> Tuple[List[Tuple[str, str, str, float]], Dict[str, Any]]:
+    # Returns the rows and which stage produced their scores (score_stage).
+    docs, by_source = _collect(rows)
+    if fusion != "rerank":
+        return _fuse(docs, by_source, fusion, vector_weight), score_stage(fusion)
+    # By default every candidate reaches the cross-encoder.
+    query, ranked, passages, agreement = _cascade_request(query, docs, by_source, vector_weight)
+    ranked, info = cascade_rerank(
+        query,
+        ranked,
+        passages,
+        depth=rerank_depth if rerank_depth is not None else settings.RERANK_DEPTH,
+        latency_budget_ms=latency_budget_ms,
+        started=started,
+        agreement=agreement,
+    )
+    return [(*docs[doc_id], float(score)) for doc_id, score in ranked], score_stage(fusion, info)
+
+
+def score_stage(fusion: str, info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Cross-encoder and fused scores are on different scales and are not
+    # mapped onto one; instead the response says which one it carries. With
+    # "rerank" the first ``reranked`` matches have cross-encoder scores and the
+    # rest follow below them in fused order. A cascade that exits early
+    # (``exit``: margin or budget) returns the weighted fused scores in [0, 1].
+    if info is None:
+        return {"score_stage": fusion, "reranked": 0}
+    stage = "rerank" if info["depth"] else "weighted"
+    return {"score_stage": stage, "reranked": info["depth"], "exit": info["exit"]}
+
+
+def _fuse(
+    docs: Dict[int, Tuple[str, str, str]],
+    by_source: Dict[str, Dict[int, Tuple[float, int]]],
+    fusion: str,
+    vector_weight: float,
+) -> List[Tuple[str, str, str, float]]:
+    fused = _fused_scores(docs, by_source, fusion, vector_weight)
+    ranked = sorted(fused.items(), key=lambda x: x[1], reverse=True)
+    return [(*docs[doc_id], float(score)) for doc_id, score in ranked]
+
+
+def _fused_scores(
+    docs: Dict[int, Tuple[str, str, str]],
+    by_source: Dict[str, Dict[int, Tuple[float, int]]],
+    fusion: str,
+    vector_weight: float,
+) -> Dict[int, float]:
+    if fusion == "rrf":
+        fused = {
+            doc_id: sum(1.0 / (RRF_K + hits[doc_id][1]) for hits in by_source.values() if doc_id in hits)
+            for doc_id in docs
+        }
+    elif fusion == "weighted":
+        vec = _min_max({k: v[0] for k, v in by_source["vector"].items()})
+        kw = _min_max({k: v[0] for k, v in by_source["keyword"].items()})
+        fused = {
+            doc_id: vector_weight * vec.get(doc_id, 0.0) + (1 - vector_weight) * kw.get(doc_id, 0.0)
+            for doc_id in docs
+        }
+    else:
+        raise ValueError(f"Unknown fusion mode '{fusion}'")
+    return fused
+
+
+def hybrid_search(
     conn: PGConnection,
     query: str,
     workspace: str,
-    top_k: int = 10
-) -> List[Tuple[str, str, float]]:
-    kw_results = keyword_search_workspace(conn, query, workspace, top_k)
-    emb_results = embedding_search_workspace(conn, query, workspace, top_k)
+    filename: Optional[str] = None,
+    top_k: int = 15,
+    fusion: str = "rerank",
+    vector_weight: float = 0.5,
+    ef_search: Optional[int] = None,
+    rerank_depth: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+    q_emb: Optional[np.ndarray] = None,
+) -> List[Tuple[str, str, str, float]]:
+    started = time.perf_counter()
+    rows = hybrid_candidates(conn, query, workspace, filename, top_k, ef_search, q_emb)
+    ranked, _ = fuse_candidates(query, rows, fusion, vector_weight, rerank_depth, latency_budget_ms, started)
+    return ranked[:top_k]
+
+
+def _cascade_request(
+    query: str,
+    docs: Dict[int, Tuple[str, str, str]],
+    by_source: Dict[str, Dict[int, Tuple[float, int]]],
+    vector_weight: float,
+) -> Tuple[str, List[Tuple[int, float]], Dict[int, str], Set[int]]:
+    # The cross-encoder runs as the last stages of a cascade that starts from
+    # the weighted fused order.
+    ranked = sorted(_fused_scores(docs, by_source, "weighted", vector_weight).items(),
+                    key=lambda x: x[1], reverse=True)
+    passages = {doc_id: f"{header}\n{body}" for doc_id, (header, body, _) in docs.items()}
+    return query, ranked, passages, by_source["vector"].keys() & by_source["keyword"].keys()
+
+
+def fuse_candidates_batch(
+    queries: List[str],
+    candidate_rows: List[List[Tuple[int, str, str, str, str, float, int]]],
+    top_k: int = 15,
+    fusion: str = "rerank",
+    vector_weight: float = 0.5,
+    rerank_depth: Optional[int] = None,
+) -> List[Tuple[List[Tuple[str, str, str, float]], Dict[str, Any]]]:
+    # Same ranking as fuse_candidates (without a latency budget); each cascade
+    # stage scores the candidates of every query in one pass.
+    candidates = [_collect(rows) for rows in candidate_rows]
+    if fusion != "rerank":
+        return [(_fuse(docs, by_source, fusion, vector_weight)[:top_k], score_stage(fusion))
+                for docs, by_source in candidates]
+    reranked = cascade_rerank_many(
+        [_cascade_request(query, docs, by_source, vector_weight)
+         for query, (docs, by_source) in zip(queries, candidates)],
+        depth=rerank_depth if rerank_depth is not None else settings.RERANK_DEPTH,
+    )
+    return [
+        ([(*docs[doc_id], float(score)) for doc_id, score in ranked[:top_k]], score_stage(fusion, info))
+        for (docs, _), (ranked, info) in zip(candidates, reranked)
+    ]
 
-    candidates = { (h, b, f): score for h, b, f, score in emb_results + kw_results }
 
-    texts = [f"{h}\n{b}" for (h, b, f) in candidates.keys()]
-    rerank_scores = reranker.predict([(query, t) for t in texts])
+def hybrid_search_batch(
+    conn: PGConnection,
+    queries: List[str],
+    workspace: str,
+    filename: Optional[str] = None,
+    top_k: int = 15,
+    fusion: str = "rerank",
+    vector_weight: float = 0.5,
+    ef_search: Optional[int] = None,
+    rerank_depth: Optional[int] = None,
+) -> List[List[Tuple[str, str, str, float]]]:
+    if not queries:
+        return []
+    candidate_rows = hybrid_candidates_batch(conn, queries, workspace, filename, top_k, ef_search)
+    results = fuse_candidates_batch(queries, candidate_rows, top_k, fusion, vector_weight, rerank_depth)
+    return [rows for rows, _ in results]
 
-    combined = list(zip(candidates.items(), rerank_scores))
-    combined.sort(key=lambda x: x[1], reverse=True)
 
-    return [ (h, b, f, float(score))
-             for ((h, b, f), _), score in combined[:top_k] ]
+def hybrid_search_workspace(
+    conn: PGConnection,
+    query: str,
+    workspace: str,
+    top_k: int = 10,
+    fusion: str = "rerank",
+    vector_weight: float = 0.5,
+    ef_search: Optional[int] = None,
+    rerank_depth: Optional[int] = None,
+    latency_budget_ms: Optional[float] = None,
+) -> List[Tuple[str, str, str, float]]:
+    return hybrid_search(conn, query, workspace, None, top_k, fusion, vector_weight, ef_search,
+                         rerank_depth, latency_budget_ms)
 
 
 def _execute_query(
     conn: PGConnection,
     sql: str,
-    params: Tuple[Any, ...]
+    params: Tuple[Any, ...],
+    hnsw: bool = False,
+    ef_search: Optional[int] = None,
+    candidates: int = 0,
+    stage: str = "sql",
 ) -> List[Tuple[str, str, float]]:
-    with conn.cursor() as cur:
+    with stage_timer(stage), conn.cursor() as cur:
+        if hnsw:
+            apply_search_settings(cur, ef_search, candidates)
         cur.execute(sql, params)
         return cur.fetchall()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import hashlib
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from psycopg2 import sql
+from psycopg2.extensions import connection as PGConnection
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 768
+STORAGE_MODES = ("float32", "halfvec", "binary")
+EF_SEARCH_MAX = 1000
+
+# mode -> (index name prefix, indexed expression + operator class, distance expression)
+# where ``{vector}`` in the distance stands for the query vector expression.
+# The table always keeps the full-precision ``embedding``; quantized modes only
+# index a half-precision or binary projection of it and re-score with the original.
+_MODES = {
+    "float32": (
+        "idx_documents_hnsw",
+        "embedding vector_cosine_ops",
+        "embedding <=> {vector}",
+    ),
+    "halfvec": (
+        "idx_documents_hnsw_half",
+        f"(embedding::halfvec({EMBEDDING_DIM})) halfvec_cosine_ops",
+        f"embedding::halfvec({EMBEDDING_DIM}) <=> {{vector}}::halfvec({EMBEDDING_DIM})",
+    ),
+    "binary": (
+        "idx_documents_hnsw_bit",
+        f"(binary_quantize(embedding)::bit({EMBEDDING_DIM})) bit_hamming_ops",
+        f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize({{vector}})",
+    ),
+}
+
+_indexed_workspaces: Set[Tuple[str, str]] = set()
+
+
+def _mode(mode: Optional[str]) -> str:
+    mode = mode or settings.VECTOR_STORAGE_MODE
+    if mode not in _MODES:
+        raise ValueError(f"Unknown vector storage mode '{mode}'")
+    return mode
+
+
+def workspace_index_name(workspace: str, mode: Optional[str] = None) -> str:
+    # Must match the naming used by migrations/002 and 003.
+    prefix = _MODES[_mode(mode)][0]
+    return f"{prefix}_ws_" + hashlib.md5(workspace.encode("utf-8")).hexdigest()[:16]
+
+
+def vector_candidates(
+    q_emb: Any,
+    scope_sql: str,
+    scope_params: Tuple[Any, ...],
+    limit: int,
+    mode: Optional[str] = None,
+    vector_sql: Optional[str] = None,
+) -> Tuple[str, Tuple[Any, ...], int]:
+    # SELECT id, header, body, filename, score ordered by score, plus the number
+    # of index candidates the HNSW scan must return (for ef_search).
+    # ``vector_sql`` replaces the bound query vector with an SQL expression,
+    # e.g. a column of an outer query when used inside a LATERAL join.
+    mode = _mode(mode)
+    vector = vector_sql or "%s::vector"
+    vec_params = () if vector_sql else (q_emb,)
+    distance = _MODES[mode][2].format(vector=vector)
+    if mode == "float32":
+        query = (
+            f"SELECT id, header, body, filename, 1 - (embedding <=> {vector}) AS score"
+            " FROM documents"
+            f" WHERE {scope_sql}"
+            f" ORDER BY {distance}"
+            " LIMIT %s"
+        )
+        return query, (*vec_params, *scope_params, *vec_params, limit), limit
+
+    fetch = limit * settings.VECTOR_RESCORE_FACTOR
+    query = (
+        "SELECT id, header, body, filename, score FROM ("
+        f"  SELECT id, header, body, filename, 1 - (embedding <=> {vector}) AS score"
+        "  FROM ("
+        "    SELECT id, header, body, filename, embedding FROM documents"
+        f"   WHERE {scope_sql}"
+        f"   ORDER BY {distance}"
+        "    LIMIT %s"
+        "  ) AS approximate"
+        ") AS rescored"
+        " ORDER BY score DESC"
+        " LIMIT %s"
+    )
+    return query, (*vec_params, *scope_params, *vec_params, fetch, limit), fetch
+
+
+def _run_autocommit(conn: PGConnection, statement: sql.Composable) -> None:
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    conn.rollback()
+    previous = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(statement)
+    finally:
+        conn.autocommit = previous
+
+
+def create_workspace_index(conn: PGConnection, workspace: str, mode: Optional[str] = None) -> None:
+    mode = _mode(mode)
+    _run_autocommit(conn, sql.SQL(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS {} ON documents"
+        " USING hnsw ({}) WHERE workspace = {}"
+    ).format(
+        sql.Identifier(workspace_index_name(workspace, mode)),
+        sql.SQL(_MODES[mode][1]),
+        sql.Literal(workspace),
+    ))
+    _indexed_workspaces.add((workspace, mode))
+
+
+def _drop_index(conn: PGConnection, name: str) -> None:
+    _run_autocommit(conn, sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+
+
+def ensure_workspace_index(conn: PGConnection, workspace: str, mode: Optional[str] = None) -> None:
+    mode = _mode(mode)
+    if (workspace, mode) in _indexed_workspaces:
+        return
+    name = workspace_index_name(workspace, mode)
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = %s",
+            (name,),
+        )
+        row = cur.fetchone()
+    conn.rollback()
+    if row is not None and row[0]:
+        _indexed_workspaces.add((workspace, mode))
+        return
+    if row is not None:
+        # Left INVALID by an interrupted concurrent build.
+        _drop_index(conn, name)
+    create_workspace_index(conn, workspace, mode)
+    if mode != "float32":
+        # Quantized search re-scores from the heap; a float32 index left over
+        # from an earlier mode only costs space and write amplification.
+        _drop_index(conn, workspace_index_name(workspace, "float32"))
+
+
+def drop_workspace_index(conn: PGConnection, workspace: str) -> None:
+    for mode in STORAGE_MODES:
+        _drop_index(conn, workspace_index_name(workspace, mode))
+        _indexed_workspaces.discard((workspace, mode))
+
+
+class WorkspaceIndexBuilder:
+    # CREATE/DROP INDEX CONCURRENTLY waits for every older transaction, such
+    # as a running ingest, so it never runs on a request or ingest thread.
+    # Builds and drops are queued to one background thread with its own
+    # connection (not a pool slot), in order. Until a workspace's index is
+    # valid, its searches use the fallback plan.
+
+    def __init__(self, connect: Optional[Callable[[], PGConnection]] = None):
+        self._connect = connect
+        self._queue: "queue.Queue[Tuple[str, str, Optional[str]]]" = queue.Queue()
+        self._pending: Set[Tuple[str, str, Optional[str]]] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"created": 0, "dropped": 0, "failed": 0}
+
+    def schedule_create(self, workspace: str, mode: Optional[str] = None) -> None:
+        mode = _mode(mode)
+        if (workspace, mode) not in _indexed_workspaces:
+            self._put(("create", workspace, mode))
+
+    def schedule_drop(self, workspace: str) -> None:
+        self._put(("drop", workspace, None))
+
+    def _put(self, task: Tuple[str, str, Optional[str]]) -> None:
+        with self._lock:
+            if task in self._pending:
+                return
+            self._pending.add(task)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="workspace-index", daemon=True)
+                self._thread.start()
+        self._queue.put(task)
+
+    def _open(self) -> PGConnection:
+        if self._connect is not None:
+            return self._connect()
+        # Imported here: utils.helpers pulls in the inference stack.
+        from utils.helpers import get_conn
+        return get_conn()
+
+    def _run(self) -> None:
+        conn = None
+        while True:
+            task = self._queue.get()
+            action, workspace, mode = task
+            try:
+                if conn is None or conn.closed:
+                    conn = self._open()
+                if action == "create":
+                    ensure_workspace_index(conn, workspace, mode)
+                else:
+                    drop_workspace_index(conn, workspace)
+                with self._lock:
+                    self._stats["created" if action == "create" else "dropped"] += 1
+            except Exception:
+                logger.exception("Workspace index %s failed for %s", action, workspace)
+                with self._lock:
+                    self._stats["failed"] += 1
+                if conn is not None:
+                    conn.close()
+                conn = None
+            finally:
+                with self._lock:
+                    self._pending.discard(task)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending)}
+
+
+workspace_indexes = WorkspaceIndexBuilder()
+
+
+def apply_search_settings(cur, ef_search: Optional[int] = None, candidates: int = 0) -> None:
+    # Transaction-local, so pooled connections return to the server defaults.
+    # ef_search bounds how many rows an HNSW scan returns, so it has to cover
+    # the over-fetched candidates of the quantized modes.
+    # pgvector rejects values outside 1..1000; large rescore over-fetches are
+    # capped rather than failing the query.
+    ef_search = min(max(ef_search or settings.HNSW_EF_SEARCH, candidates), EF_SEARCH_MAX)
+    if ef_search:
+        cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+    if settings.HNSW_ITERATIVE_SCAN:
+        cur.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", (settings.HNSW_ITERATIVE_SCAN,))
+        if settings.HNSW_MAX_SCAN_TUPLES:
+            cur.execute("SELECT set_config('hnsw.max_scan_tuples', %s, true)",
+                        (str(settings.HNSW_MAX_SCAN_TUPLES),))
@@ -0,0 +1,23 @@
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WorkspaceListener = Callable[[str, Optional[str]], None]
+
+_listeners: List[WorkspaceListener] = []
+
+
+def on_workspace_change(listener: WorkspaceListener) -> WorkspaceListener:
+    # Called with (workspace, filename) whenever a workspace's documents change;
+    # filename is None when the whole workspace was affected.
+    _listeners.append(listener)
+    return listener
+
+
+def workspace_changed(workspace: str, filename: Optional[str] = None) -> None:
+    for listener in list(_listeners):
+        try:
+            listener(workspace, filename)
+        except Exception:
+            logger.exception("Workspace change listener %r failed", listener)
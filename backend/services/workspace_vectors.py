@@ -0,0 +1,220 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from psycopg2.extensions import connection as PGConnection
+
+from app.config import settings
+from services.workspace_events import on_workspace_change
+
+logger = logging.getLogger(__name__)
+
+
+class _Vectors:
+    __slots__ = ("embeddings", "headers", "bodies", "filenames", "file_codes", "nbytes", "loaded")
+
+    def __init__(self, rows: List[Tuple[str, str, str, Any]]):
+        names = sorted({filename for _, _, filename, _ in rows})
+        codes = {name: i for i, name in enumerate(names)}
+        self.headers = [header for header, _, _, _ in rows]
+        self.bodies = [body for _, body, _, _ in rows]
+        self.filenames = names
+        self.file_codes = np.fromiter((codes[filename] for _, _, filename, _ in rows), dtype=np.int32, count=len(rows))
+        embeddings = np.empty((len(rows), len(rows[0][3]) if rows else 0), dtype=np.float32)
+        for i, (_, _, _, embedding) in enumerate(rows):
+            embeddings[i] = embedding
+        # Normalized once, so a dot product is the same cosine similarity the
+        # database computes as 1 - (embedding <=> query).
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        self.embeddings = embeddings
+        self.nbytes = (
+            embeddings.nbytes + self.file_codes.nbytes
+            + sum(sys.getsizeof(text) for text in self.headers)
+            + sum(sys.getsizeof(text) for text in self.bodies)
+        )
+        self.loaded = time.time()
+
+    def search(self, q_emb: np.ndarray, filename: Optional[str], top_k: int) -> List[Tuple[str, str, str, float]]:
+        if not self.headers or top_k <= 0:
+            return []
+        if filename is None:
+            candidates = None
+            scores = self.embeddings @ q_emb
+        else:
+            if filename not in self.filenames:
+                return []
+            candidates = np.flatnonzero(self.file_codes == self.filenames.index(filename))
+            scores = self.embeddings[candidates] @ q_emb
+        if top_k < len(scores):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = top if candidates is None else candidates[top]
+        return [
+            (self.headers[i], self.bodies[i], self.filenames[self.file_codes[i]], float(score))
+            for i, score in zip(rows, scores[top])
+        ]
+
+
+class WorkspaceVectorCache:
+    # Exact in-process search for small, hot workspaces: a workspace's
+    # embeddings are loaded into one contiguous float32 matrix on first use and
+    # queries become a matrix-vector product plus argpartition, with no
+    # database round trip. Workspaces above ``max_rows`` stay on the HNSW
+    # path. Entries are evicted least-recently-used to stay within the memory
+    # budget, dropped when the workspace changes in this process, and reloaded
+    # after ``ttl_seconds`` to pick up changes made by other processes.
+    # Off by default (HOT_INDEX_MEMORY_MB=0): with several API workers, a
+    # worker can serve deleted or missing chunks for up to ``ttl_seconds``, so
+    # enable it for single-worker deployments or where that staleness is
+    # acceptable.
+
+    def __init__(self, memory_budget_mb: float = 256, max_rows: int = 20000, ttl_seconds: float = 300):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Vectors]" = OrderedDict()
+        # Workspaces over max_rows or the whole budget: row count, when checked.
+        self._too_large: Dict[str, Tuple[int, float]] = {}
+        self._generations: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stats = {
+            "hits": 0, "loads": 0, "too_large_checks": 0, "evictions": 0, "invalidations": 0, "stale_loads": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_budget > 0 and self.max_rows > 0
+
+    def _get(self, workspace: str) -> Optional[_Vectors]:
+        with self._lock:
+            entry = self._entries.get(workspace)
+            if entry is None:
+                return None
+            if time.time() - entry.loaded > self.ttl_seconds:
+                self._drop(workspace)
+                return None
+            self._entries.move_to_end(workspace)
+            self._stats["hits"] += 1
+            return entry
+
+    def _drop(self, workspace: str) -> None:
+        entry = self._entries.pop(workspace, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _is_too_large(self, workspace: str) -> bool:
+        with self._lock:
+            checked = self._too_large.get(workspace)
+            if checked is None:
+                return False
+            if time.time() - checked[1] > self.ttl_seconds:
+                del self._too_large[workspace]
+                return False
+            return True
+
+    def _load(self, conn: PGConnection, workspace: str) -> Optional[_Vectors]:
+        with self._lock:
+            generation = self._generations.get(workspace, 0)
+            load_lock = self._load_locks.setdefault(workspace, threading.Lock())
+        # One loader per workspace; concurrent requests wait for its result.
+        with load_lock:
+            entry = self._get(workspace)
+            if entry is not None or self._is_too_large(workspace):
+                return entry
+            with conn.cursor() as cur:
+                cur.execute("SELECT count(*) FROM documents WHERE workspace = %s", (workspace,))
+                count = cur.fetchone()[0]
+                if count > self.max_rows:
+                    with self._lock:
+                        self._too_large[workspace] = (count, time.time())
+                        self._stats["too_large_checks"] += 1
+                    return None
+                cur.execute(
+                    "SELECT header, body, filename, embedding FROM documents"
+                    " WHERE workspace = %s AND embedding IS NOT NULL",
+                    (workspace,),
+                )
+                rows = cur.fetchall()
+            conn.rollback()
+            entry = _Vectors(rows)
+
+            with self._lock:
+                self._stats["loads"] += 1
+                if self._generations.get(workspace, 0) != generation:
+                    # Changed while loading: answer from it once, don't keep it.
+                    self._stats["stale_loads"] += 1
+                    return entry
+                if entry.nbytes > self.memory_budget:
+                    self._too_large[workspace] = (len(rows), time.time())
+                    return entry
+                self._drop(workspace)
+                self._entries[workspace] = entry
+                self._bytes += entry.nbytes
+                while self._bytes > self.memory_budget:
+                    oldest = next(iter(self._entries))
+                    self._drop(oldest)
+                    self._stats["evictions"] += 1
+            logger.info("Loaded %s vectors of workspace %s (%.1f MB)", len(rows), workspace, entry.nbytes / 2**20)
+            return entry
+
+    def search(
+        self,
+        conn: PGConnection,
+        q_emb: np.ndarray,
+        workspace: str,
+        filename: Optional[str],
+        top_k: int,
+    ) -> Optional[List[Tuple[str, str, str, float]]]:
+        # None means "not served from memory", and the caller queries the database.
+        if not self.enabled or self._is_too_large(workspace):
+            return None
+        entry = self._get(workspace) or self._load(conn, workspace)
+        if entry is None:
+            return None
+        return entry.search(np.asarray(q_emb, dtype=np.float32), filename, top_k)
+
+    def invalidate(self, workspace: str, filename: Optional[str] = None) -> None:
+        # The whole workspace is reloaded: row positions shift on any change.
+        with self._lock:
+            self._generations[workspace] = self._generations.get(workspace, 0) + 1
+            self._too_large.pop(workspace, None)
+            if workspace in self._entries:
+                self._drop(workspace)
+                self._stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._too_large.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "enabled": self.enabled,
+                "workspaces": {ws: {"rows": len(e.headers), "mb": round(e.nbytes / 2**20, 2)}
+                               for ws, e in self._entries.items()},
+                "too_large": {ws: rows for ws, (rows, _) in self._too_large.items()},
+                "memory_mb": round(self._bytes / 2**20, 2),
+                "memory_budget_mb": round(self.memory_budget / 2**20, 2),
+                "max_rows": self.max_rows,
+                "ttl_seconds": self.ttl_seconds,
+            }
+
+
+workspace_vectors = WorkspaceVectorCache(
+    memory_budget_mb=settings.HOT_INDEX_MEMORY_MB,
+    max_rows=settings.HOT_INDEX_MAX_ROWS,
+    ttl_seconds=settings.HOT_INDEX_TTL,
+)
+on_workspace_change(workspace_vectors.invalidate)
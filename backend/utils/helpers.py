@@ -1,35 +1,60 @@
+import hashlib
 import re
-from typing import List
+from typing import List, MutableMapping, Optional, Union
+import numpy as np
 import psycopg2
-from sentence_transformers import SentenceTransformer
-from sentence_transformers.cross_encoder import CrossEncoder
+from pgvector.psycopg2 import register_vector
 from app.config import settings
-import tiktoken
+from services.embedding_cache import query_embedding_cache
+from services.chunking_service import get_encoding
+from services.inference_service import encode_queries
+from services.metrics import stage_timer
+from services.model_registry import BI_ENCODER_NAME
 
-bi_model = SentenceTransformer("paraphrase-multilingual-mpnet-base-v2")
-reranker = CrossEncoder("cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+def _encode_uncached(text: str) -> np.ndarray:
+    return encode_queries([text])[0]
 
-def encode_text(text: str) -> List[float]:
-    return bi_model.encode([text], normalize_embeddings=True)[0].tolist()
+def encode_text(text: str) -> np.ndarray:
+    with stage_timer("encode"):
+        return query_embedding_cache.get_or_compute(text, BI_ENCODER_NAME, _encode_uncached)
+
+def encode_texts(texts: List[str]) -> List[np.ndarray]:
+    # One model call for all the texts missing from the query cache.
+    with stage_timer("encode"):
+        return query_embedding_cache.get_or_compute_many(texts, BI_ENCODER_NAME, encode_queries)
 
 def extract_terms(query: str) -> List[str]:
     return re.findall(r"\w+", query.lower(), flags=re.UNICODE)
 
-def build_ts_query(terms: List[str]) -> str:
+def build_ts_query(terms: List[str], mode: str = "prefix") -> str:
+    if mode == "or":
+        return " | ".join(terms)
     return " & ".join(f"{t}:*" for t in terms)
 
 def get_conn():
-    return psycopg2.connect(
+    conn = psycopg2.connect(
         host=settings.PG_HOST,
         port=settings.PG_PORT,
         user=settings.PG_USER,
         password=settings.PG_PASSWORD,
         dbname=settings.PG_DB,
     )
+    register_vector(conn)
+    conn.commit()
+    return conn
+
+def encode_query(text: str) -> np.ndarray:
+    return encode_text(text)
+
+def report_progress(progress: Optional[MutableMapping[str, int]], key: str, amount: int = 1):
+    if progress is not None:
+        progress[key] = progress.get(key, 0) + amount
 
-def encode_query(text: str) -> list[float]:
-    return bi_model.encode([text], normalize_embeddings=True)[0].tolist()
+def fingerprint(data: Union[bytes, str]) -> str:
+    # Same digest as encode(sha256(convert_to(body, 'UTF8')), 'hex') in SQL.
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
 
 def count_tokens(text: str, enc_name: str = "cl100k_base") -> int:
-    enc = tiktoken.get_encoding(enc_name)
-    return len(enc.encode(text))
\ No newline at end of file
+    return len(get_encoding(enc_name).encode(text))
\ No newline at end of file
@@ -2,20 +2,46 @@
 CREATE EXTENSION IF NOT EXISTS unaccent;
 CREATE EXTENSION IF NOT EXISTS vector;
 
+CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+  RETURNS text
+  LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+  AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
 CREATE TABLE IF NOT EXISTS documents (
   id SERIAL PRIMARY KEY,
   filename TEXT NOT NULL,
   header TEXT,
   workspace TEXT,
   body TEXT,
-  embedding VECTOR(768)
+  content_hash TEXT NOT NULL,
+  token_count INTEGER,
+  embedding VECTOR(768),
+  tsv tsvector GENERATED ALWAYS AS (
+    to_tsvector('hungarian', immutable_unaccent(coalesce(header, '') || ' ' || coalesce(body, '')))
+  ) STORED
 );
 
-CREATE INDEX IF NOT EXISTS idx_documents_fts
-  ON documents USING gin (
-    to_tsvector('hungarian', unaccent(header || ' ' || body))
-  );
+CREATE INDEX IF NOT EXISTS idx_documents_tsv
+  ON documents USING gin (tsv);
+
+CREATE INDEX IF NOT EXISTS idx_documents_workspace_filename
+  ON documents (workspace, filename);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_content_hash
+  ON documents (workspace, filename, content_hash);
+
+CREATE TABLE IF NOT EXISTS document_files (
+  workspace TEXT NOT NULL,
+  filename TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  chunk_count INTEGER NOT NULL DEFAULT 0,
+  ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (workspace, filename)
+);
 
 
+-- Fallback only: each workspace gets its own partial HNSW index
+-- (services/vector_index_service.py, migrations/002_workspace_hnsw_indexes.sql).
+-- Quantized storage modes drop it (migrations/003_quantized_vector_indexes.sql).
 CREATE INDEX IF NOT EXISTS idx_documents_embedding_hnsw
   ON documents USING hnsw (embedding vector_cosine_ops);
\ No newline at end of file
@@ -0,0 +1,25 @@
+-- Stored full-text column for keyword search.
+-- unaccent() is only STABLE, so generated columns go through an IMMUTABLE wrapper
+-- that pins the dictionary.
+
+CREATE OR REPLACE FUNCTION immutable_unaccent(text)
+  RETURNS text
+  LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+  AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+ALTER TABLE documents
+  ADD COLUMN IF NOT EXISTS tsv tsvector
+    GENERATED ALWAYS AS (
+      to_tsvector('hungarian', immutable_unaccent(coalesce(header, '') || ' ' || coalesce(body, '')))
+    ) STORED;
+
+-- An earlier revision of this migration also stored a lexeme count that
+-- nothing read; it doubled the to_tsvector work on every write.
+ALTER TABLE documents DROP COLUMN IF EXISTS lexeme_count;
+
+CREATE INDEX IF NOT EXISTS idx_documents_tsv
+  ON documents USING gin (tsv);
+
+DROP INDEX IF EXISTS idx_documents_fts;
+
+ANALYZE documents;
@@ -0,0 +1,24 @@
+-- Per-workspace partial HNSW indexes. Every vector query filters on workspace,
+-- so a partial index returns neighbours from that workspace only instead of
+-- ef_search global neighbours that are mostly filtered away afterwards.
+-- New workspaces get their index from /workspace/create-bucket (or on first
+-- ingest); this backfills the ones that already have documents.
+-- Index names must match services/vector_index_service.workspace_index_name.
+
+CREATE INDEX IF NOT EXISTS idx_documents_workspace_filename
+  ON documents (workspace, filename);
+
+DO $$
+DECLARE
+  ws TEXT;
+BEGIN
+  FOR ws IN SELECT DISTINCT workspace FROM documents WHERE workspace IS NOT NULL LOOP
+    EXECUTE format(
+      'CREATE INDEX IF NOT EXISTS %I ON documents USING hnsw (embedding vector_cosine_ops) WHERE workspace = %L',
+      'idx_documents_hnsw_ws_' || left(md5(ws), 16),
+      ws
+    );
+  END LOOP;
+END $$;
+
+ANALYZE documents;
@@ -0,0 +1,48 @@
+-- Quantized per-workspace HNSW indexes (VECTOR_STORAGE_MODE=halfvec|binary).
+-- The documents table keeps the full-precision embedding column; these indexes
+-- only cover a half-precision or binary projection of it, and search re-scores
+-- the over-fetched candidates with the original vectors (a heap read, so no
+-- float32 index is needed). Once the quantized indexes exist, the float32
+-- per-workspace indexes and the global fallback index are dropped; every
+-- query filters on workspace, so the global index only served workspaces
+-- whose own index was still being built, which now scan their rows instead.
+-- Run with the mode the API is configured for, e.g.
+--   PGOPTIONS="-c sapirag.vector_storage_mode=binary" psql -f migrations/003_quantized_vector_indexes.sql
+-- Index names must match services/vector_index_service.workspace_index_name.
+
+DO $$
+DECLARE
+  mode TEXT := coalesce(nullif(current_setting('sapirag.vector_storage_mode', true), ''), 'halfvec');
+  prefix TEXT;
+  expr TEXT;
+  ws TEXT;
+  idx TEXT;
+BEGIN
+  IF mode = 'halfvec' THEN
+    prefix := 'idx_documents_hnsw_half_ws_';
+    expr := '(embedding::halfvec(768)) halfvec_cosine_ops';
+  ELSIF mode = 'binary' THEN
+    prefix := 'idx_documents_hnsw_bit_ws_';
+    expr := '(binary_quantize(embedding)::bit(768)) bit_hamming_ops';
+  ELSE
+    RAISE EXCEPTION 'unknown vector storage mode %', mode;
+  END IF;
+
+  FOR ws IN SELECT DISTINCT workspace FROM documents WHERE workspace IS NOT NULL LOOP
+    EXECUTE format(
+      'CREATE INDEX IF NOT EXISTS %I ON documents USING hnsw (%s) WHERE workspace = %L',
+      prefix || left(md5(ws), 16),
+      expr,
+      ws
+    );
+  END LOOP;
+
+  FOR idx IN SELECT indexname FROM pg_indexes
+            WHERE tablename = 'documents' AND indexname LIKE 'idx\_documents\_hnsw\_ws\_%' LOOP
+    EXECUTE format('DROP INDEX IF EXISTS %I', idx);
+  END LOOP;
+END $$;
+
+DROP INDEX IF EXISTS idx_documents_embedding_hnsw;
+
+ANALYZE documents;
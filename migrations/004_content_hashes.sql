@@ -0,0 +1,35 @@
+-- Content fingerprints for incremental re-ingestion.
+-- documents.content_hash is the sha256 of the chunk body (utils/helpers.fingerprint)
+-- and is unique per file, so ingesting the same file twice can no longer
+-- duplicate chunks; document_files keeps the hash of the whole PDF so an
+-- unchanged upload is skipped without parsing it.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+UPDATE documents
+   SET content_hash = encode(sha256(convert_to(coalesce(body, ''), 'UTF8')), 'hex')
+ WHERE content_hash IS NULL;
+
+-- Earlier re-ingests inserted every chunk again; keep the oldest copy.
+DELETE FROM documents AS d
+ USING documents AS keep
+ WHERE d.workspace IS NOT DISTINCT FROM keep.workspace
+   AND d.filename = keep.filename
+   AND d.content_hash = keep.content_hash
+   AND d.id > keep.id;
+
+ALTER TABLE documents ALTER COLUMN content_hash SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_content_hash
+  ON documents (workspace, filename, content_hash);
+
+CREATE TABLE IF NOT EXISTS document_files (
+  workspace TEXT NOT NULL,
+  filename TEXT NOT NULL,
+  content_hash TEXT NOT NULL,
+  chunk_count INTEGER NOT NULL DEFAULT 0,
+  ingested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (workspace, filename)
+);
+
+ANALYZE documents;
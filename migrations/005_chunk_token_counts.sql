@@ -0,0 +1,7 @@
+-- Token count (cl100k_base) of each chunk body, written at ingest so /rag can
+-- pack its context budget without re-tokenizing. Tokenization happens in
+-- Python, so existing rows stay NULL until backfilled:
+--   cd backend && python -m scripts.backfill_token_counts
+-- /rag counts NULL rows on the fly in the meantime.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS token_count INTEGER;
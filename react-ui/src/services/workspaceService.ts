@@ -8,7 +8,7 @@ export const getBuckets = async (): Promise<string[]> => {
 
 export const createBucket = async (name: string) => {
   const form = new FormData();
-  form.append("name", `workspace-${name.toLowerCase()}`);
+  form.append("name", name.toLowerCase());
   const res = await fetch(`${API}/workspace/create-bucket`, {
     method: "POST",
     body: form,